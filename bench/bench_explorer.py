@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Benchmark github-repo-explorer.py against synthetic repository trees.
+
+Trees are generated once per (shape, size) under a tmpfs directory when one is
+available, then every case is run in a fresh interpreter so peak RSS and I/O
+counters belong to that case alone. Results are written as JSON lines tagged
+with the current git commit, and can be compared against an earlier run:
+
+    python bench/bench_explorer.py --shapes wide,deep --sizes 10000,100000 -o base.jsonl
+    python bench/bench_explorer.py --shapes wide,deep --sizes 10000,100000 --compare base.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import importlib.util
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPLORER_PATH = os.path.join(os.path.dirname(BENCH_DIR), 'github-repo-explorer.py')
+
+SHAPES = ['wide', 'deep', 'tiny', 'index', 'indicators']
+DEFAULT_SIZES = [10000]
+DEFAULT_REPEAT = 3
+
+# Bumped whenever generate_tree changes, so stale trees are rebuilt
+TREE_VERSION = 1
+
+INDEX_CONTENT = "# Section\n\n" + "Some words about this section of the project.\n" * 40
+
+INDICATOR_FILES = {
+    'package.json': '{\n  "name": "app",\n  "dependencies": {"react": "^18.0.0"}\n}\n',
+    'requirements.txt': 'django==4.2\nrequests\n',
+    'Dockerfile': 'FROM python:3.11\n',
+    'tsconfig.json': '{}\n',
+    '.eslintrc': '{}\n',
+}
+
+def default_tree_root():
+    """Prefer tmpfs so the benchmark measures the explorer, not the disk."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return os.path.join('/dev/shm', 'explorer-bench')
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), 'explorer-bench')
+
+def plan_tree(shape, entries):
+    """
+    Describe a synthetic tree of roughly `entries` files.
+
+    :param shape: One of SHAPES
+    :param entries: Approximate number of files to create
+    :return: Iterator of (relative directory, [(file name, content)]) pairs
+    """
+    if shape == 'wide':
+        # Few very large directories directly under the root
+        per_dir = min(5000, entries)
+        for d in range(max(1, entries // per_dir)):
+            yield f"dir{d:04d}", [(f"file{i:05d}.txt", '') for i in range(per_dir)]
+    elif shape == 'deep':
+        # Long chains of single-child directories with a few files at each level
+        depth, per_dir = 100, 5
+        chains = max(1, entries // (depth * per_dir))
+        for c in range(chains):
+            path = f"chain{c:04d}"
+            for level in range(depth):
+                path = os.path.join(path, f"d{level}") if level else path
+                yield path, [(f"f{i}.py", '') for i in range(per_dir)]
+    elif shape in ('tiny', 'index', 'indicators'):
+        # Balanced tree with a fan-out of 16 and small files in every directory
+        per_dir, fanout = 16, 16
+        dirs = max(1, entries // per_dir)
+        rng = random.Random(entries)
+        extensions = ['.py', '.js', '.md', '.c', '.h', '.txt', '.json', '']
+        for n in range(dirs):
+            parts = []
+            m = n
+            while m:
+                m, rest = divmod(m - 1, fanout)
+                parts.append(f"n{rest:02d}")
+            path = os.path.join('tree', *reversed(parts))
+            files = [(f"f{i:02d}{rng.choice(extensions)}", 'x\n') for i in range(per_dir)]
+            if shape == 'index':
+                files[:2] = [('index.md', INDEX_CONTENT), ('README.md', INDEX_CONTENT)]
+            elif shape == 'indicators':
+                files[:len(INDICATOR_FILES)] = list(INDICATOR_FILES.items())
+            yield path, files
+        if shape == 'indicators':
+            yield os.path.join('.github', 'workflows'), [('ci.yml', 'on: push\n')]
+    else:
+        raise ValueError(f"unknown shape: {shape}")
+
+def generate_tree(root, shape, entries):
+    """
+    Create (or reuse) the synthetic tree for one shape and size.
+
+    :return: Path to the generated tree
+    """
+    tree = os.path.join(root, f"{shape}-{entries}")
+    marker = os.path.join(tree, '.bench-complete')
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            if json.load(f) == {'version': TREE_VERSION}:
+                return tree
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(tree, ignore_errors=True)
+    for rel_dir, files in plan_tree(shape, entries):
+        dir_path = os.path.join(tree, rel_dir)
+        os.makedirs(dir_path, exist_ok=True)
+        for name, content in files:
+            with open(os.path.join(dir_path, name), 'w', encoding='utf-8') as f:
+                f.write(content)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump({'version': TREE_VERSION}, f)
+    return tree
+
+def read_proc_io():
+    """Return this process's /proc I/O counters, or an empty dict off Linux."""
+    counters = {}
+    try:
+        with open('/proc/self/io', 'r', encoding='ascii') as f:
+            for line in f:
+                key, value = line.split(':')
+                counters[key.strip()] = int(value)
+    except OSError:
+        pass
+    return counters
+
+def run_case(tree, jobs):
+    """
+    Time one scan and report of `tree` inside the current process.
+
+    Runs in a child interpreter started by run_case_subprocess.
+
+    :return: Dictionary of measurements
+    """
+    spec = importlib.util.spec_from_file_location('explorer', EXPLORER_PATH)
+    explorer = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(explorer)
+
+    io_before = read_proc_io()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+
+    start = time.perf_counter()
+    repo_info = explorer.explore_repository(tree, jobs=jobs)
+    scan_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # The report prints a confirmation line; keep stdout for our result
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as sys.stdout:
+        try:
+            explorer.generate_repository_report(repo_info, os.devnull)
+        finally:
+            sys.stdout = stdout
+    report_seconds = time.perf_counter() - start
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    io_after = read_proc_io()
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss_scale = 1 if sys.platform == 'darwin' else 1024
+    return {
+        'scan_seconds': scan_seconds,
+        'report_seconds': report_seconds,
+        'peak_rss_bytes': usage.ru_maxrss * rss_scale,
+        'user_seconds': usage.ru_utime - usage_before.ru_utime,
+        'system_seconds': usage.ru_stime - usage_before.ru_stime,
+        'voluntary_switches': usage.ru_nvcsw - usage_before.ru_nvcsw,
+        'involuntary_switches': usage.ru_nivcsw - usage_before.ru_nivcsw,
+        'read_syscalls': io_after.get('syscr', 0) - io_before.get('syscr', 0),
+        'write_syscalls': io_after.get('syscw', 0) - io_before.get('syscw', 0),
+        'read_chars': io_after.get('rchar', 0) - io_before.get('rchar', 0),
+        'directories': repo_info['summary']['total_directories'],
+        'files': repo_info['summary']['total_files'],
+    }
+
+def run_case_subprocess(tree, jobs):
+    """Run one case in a fresh interpreter and return its measurements."""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-case', tree, '--jobs', str(jobs)],
+        check=True, stdout=subprocess.PIPE, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def git_commit():
+    """Return the explorer's current commit, marked dirty if the tree has local changes."""
+    cwd = os.path.dirname(EXPLORER_PATH)
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, check=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', EXPLORER_PATH], cwd=cwd, check=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+def summarize(samples):
+    """Reduce repeated samples to a single result: medians for timings, maxima for memory."""
+    result = dict(samples[0])
+    for key in ('scan_seconds', 'report_seconds', 'user_seconds', 'system_seconds'):
+        values = [sample[key] for sample in samples]
+        result[key] = statistics.median(values)
+        result[key.replace('_seconds', '_min_seconds')] = min(values)
+    result['peak_rss_bytes'] = max(sample['peak_rss_bytes'] for sample in samples)
+    result['repeat'] = len(samples)
+    return result
+
+def load_results(path):
+    """Load a JSON lines results file, keyed by (shape, entries, jobs)."""
+    results = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                results[(result['shape'], result['entries'], result['jobs'])] = result
+    return results
+
+def compare_results(baseline, results, threshold):
+    """
+    Print the change of each case against a baseline.
+
+    :param threshold: Fractional slowdown of the scan or report phase counted as a regression
+    :return: Number of regressed cases
+    """
+    regressions = 0
+    print(f"{'case':<28} {'scan':>18} {'report':>18} {'peak rss':>18}", file=sys.stderr)
+    for result in results:
+        key = (result['shape'], result['entries'], result['jobs'])
+        base = baseline.get(key)
+        if base is None:
+            continue
+        columns = []
+        regressed = False
+        for field in ('scan_seconds', 'report_seconds', 'peak_rss_bytes'):
+            ratio = result[field] / base[field] if base[field] else 1.0
+            columns.append(f"{ratio:>17.2f}x")
+            if field != 'peak_rss_bytes' and ratio > 1 + threshold:
+                regressed = True
+        regressions += regressed
+        label = f"{key[0]}/{key[1]}/j{key[2]}"
+        print(f"{label:<28} {' '.join(columns)}{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the repository explorer on synthetic trees.")
+    parser.add_argument('--shapes', default=','.join(SHAPES),
+                        help=f"Comma-separated tree shapes (default: {','.join(SHAPES)})")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated approximate file counts per tree")
+    parser.add_argument('--jobs', default='8',
+                        help="Comma-separated explorer thread counts to benchmark")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f"Runs per case; timings report the median (default: {DEFAULT_REPEAT})")
+    parser.add_argument('--tree-root', default=default_tree_root(),
+                        help="Where synthetic trees are generated (default: tmpfs if available)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="Append JSON lines results to this file (default: standard output)")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="Compare against an earlier results file and exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Slowdown counted as a regression by --compare (default: 0.10)")
+    parser.add_argument('--run-case', metavar='TREE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, int(args.jobs))))
+        return 0
+
+    commit = git_commit()
+    results = []
+    for shape in args.shapes.split(','):
+        for entries in map(int, args.sizes.split(',')):
+            start = time.perf_counter()
+            tree = generate_tree(args.tree_root, shape, entries)
+            print(f"{shape}/{entries}: tree ready in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+            for jobs in map(int, args.jobs.split(',')):
+                samples = [run_case_subprocess(tree, jobs) for _ in range(max(1, args.repeat))]
+                result = {
+                    'shape': shape,
+                    'entries': entries,
+                    'jobs': jobs,
+                    'commit': commit,
+                    'python': platform.python_version(),
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                }
+                result.update(summarize(samples))
+                results.append(result)
+                print(f"  j{jobs}: scan {result['scan_seconds']:.3f}s, "
+                      f"report {result['report_seconds']:.3f}s, "
+                      f"peak rss {result['peak_rss_bytes'] / 2**20:.1f} MiB", file=sys.stderr)
+
+    lines = ''.join(json.dumps(result) + '\n' for result in results)
+    if args.output == '-':
+        sys.stdout.write(lines)
+    else:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    if args.compare:
+        if compare_results(load_results(args.compare), results, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,225 +1,2859 @@
 #!/usr/bin/env python3
 import os
+import re
+import sys
 import json
+import asyncio
+import time
+import heapq
+import ctypes
+import ctypes.util
+import codecs
+import tarfile
+import zipfile
+import posixpath
+import stat
+import select
+import struct
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import threading
+import functools
+import contextlib
+import subprocess
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-def explore_repository(repo_path):
+# Default number of worker threads for the directory walker. Listing is
+# I/O-bound, so this follows ThreadPoolExecutor's default of cpu_count + 4.
+DEFAULT_JOBS = min(32, (os.cpu_count() or 1) + 4)
+
+# Snapshot cache settings. Bump CACHE_VERSION whenever the shape of a
+# directory record or of its stamps changes so stale caches are discarded on load.
+CACHE_VERSION = 5
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'github-repo-explorer'
+)
+DEFAULT_CACHE_SIZE = 200000
+
+# Directories modified this recently are not cached: a change landing in the
+# same mtime tick as the scan would otherwise go unnoticed on the next run.
+RACY_WINDOW_NS = 2 * 10**9
+
+# Predefined lists of configuration files and directories to track.
+#
+# Each indicator is either a plain string or a dict. Plain strings name a
+# file ('pom.xml'), a directory when they end in '/' ('.idea/'), and may be
+# anchored under parent directories ('.circleci/config.yml'). Dicts add a
+# 'contains' needle that must appear (case-insensitively) in the first
+# RULE_SNIFF_BYTES of the file, for generic names such as main.py.
+FRAMEWORK_INDICATORS = {
+    'react': ['react-config.js', 'next.config.js', '.reactrc'],
+    'vue': ['vue.config.js', '.vuerc'],
+    'angular': ['angular.json', '.angular-cli.json'],
+    'svelte': ['svelte.config.js'],
+    'django': [{'name': 'manage.py', 'contains': 'django'},
+               {'name': 'settings.py', 'contains': 'django'}],
+    'flask': [{'name': 'app.py', 'contains': 'flask'},
+              {'name': 'config.py', 'contains': 'flask'}],
+    'express': [{'name': 'app.js', 'contains': 'express'},
+                {'name': 'server.js', 'contains': 'express'}],
+    'fastapi': [{'name': 'main.py', 'contains': 'fastapi'}],
+    'spring_boot': ['pom.xml', 'mvnw', 'mvnw.cmd', 'build.gradle']
+}
+
+PACKAGE_MANAGER_INDICATORS = {
+    'npm': ['package.json', 'package-lock.json'],
+    'yarn': ['yarn.lock'],
+    'pip': ['requirements.txt', 'Pipfile'],
+    'poetry': ['pyproject.toml'],
+    'maven': ['pom.xml'],
+    'gradle': ['build.gradle', 'gradle.properties']
+}
+
+DEVELOPMENT_CONFIG_INDICATORS = {
+    'docker': ['Dockerfile', 'docker-compose.yml'],
+    'kubernetes': ['deployment.yaml', 'service.yaml', 'ingress.yaml'],
+    'vscode': ['.vscode/'],
+    'jetbrains': ['.idea/'],
+    'env_configs': ['.env', '.env.local', '.env.development']
+}
+
+CI_CD_INDICATORS = {
+    'github_actions': ['.github/workflows/'],
+    'travis_ci': ['.travis.yml'],
+    'gitlab_ci': ['.gitlab-ci.yml'],
+    'jenkins': ['Jenkinsfile'],
+    'circleci': ['.circleci/config.yml']
+}
+
+# Indicator categories in report order, with the key naming the label in each hit
+INDICATOR_CATEGORIES = {
+    'frameworks': 'framework',
+    'package_managers': 'manager',
+    'development_configs': 'type',
+    'ci_cd_configs': 'type'
+}
+
+DEFAULT_RULES = {
+    'frameworks': FRAMEWORK_INDICATORS,
+    'package_managers': PACKAGE_MANAGER_INDICATORS,
+    'development_configs': DEVELOPMENT_CONFIG_INDICATORS,
+    'ci_cd_configs': CI_CD_INDICATORS
+}
+
+# How much of a file 'contains' rules look at
+RULE_SNIFF_BYTES = 8192
+
+# Index file detection
+INDEX_CANDIDATES = [
+    'index.md', 'README.md', 'readme.md',  # Markdown files
+    'index.txt', 'readme.txt',  # Text files
+    'index.html', 'readme.html',  # HTML files
+    'index.rst'  # ReStructuredText files
+]
+
+# Index file previews keep the first PREVIEW_CHARS characters. At most
+# DEFAULT_PREVIEW_BYTES are read per file (enough for PREVIEW_CHARS of any
+# UTF-8 text) and DEFAULT_PREVIEW_BUDGET bytes across the whole scan.
+PREVIEW_CHARS = 1000
+DEFAULT_PREVIEW_BYTES = 4096
+DEFAULT_PREVIEW_BUDGET = 64 * 1024 * 1024
+
+# Duplicate detection hashes the first DUPLICATE_BLOCK_BYTES of same-size
+# files, then reads the survivors in full in DUPLICATE_CHUNK_BYTES chunks
+DUPLICATE_BLOCK_BYTES = 64 * 1024
+DUPLICATE_CHUNK_BYTES = 1024 * 1024
+
+# Line counting reads files in LINE_COUNT_CHUNK_BYTES chunks into a reused
+# buffer; a NUL byte in the first chunk marks the file as binary
+LINE_COUNT_CHUNK_BYTES = 1024 * 1024
+
+# The async API hands events to the event loop in batches of up to
+# ASYNC_BATCH_EVENTS, holding a partial batch for at most ASYNC_FLUSH_SECONDS;
+# the scan pauses while ASYNC_QUEUE_BATCHES batches are waiting
+ASYNC_BATCH_EVENTS = 256
+ASYNC_FLUSH_SECONDS = 0.05
+ASYNC_QUEUE_BATCHES = 4
+
+# Number of slowest directories kept by ScanStats
+DEFAULT_SLOWEST_DIRS = 10
+
+# First line of the index.md written by a multi-repository run; an existing
+# index.md without it is not overwritten
+BATCH_INDEX_TITLE = "# Repository Scan Index"
+
+def file_stamp(path):
+    """
+    Return the (mtime_ns, size) pair used to detect changes to a file.
+
+    :param path: Path to the file
+    :return: List of [mtime_ns, size], or None if the file cannot be stat'ed
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+class SnapshotCache:
+    """
+    On-disk cache of directory records, keyed by relative directory path.
+
+    An entry is reused when the directory's mtime and inode are unchanged and
+    every file whose contents went into the record (sniffed by content rules)
+    or directory probed for anchored patterns still has the same mtime and
+    size. Adding, removing or renaming an entry bumps the directory mtime, so
+    a hit skips the scandir call and all per-directory matching. Index file previews and the content hashes used
+    for duplicate detection are cached separately by file path and stamp.
+    All three are kept in least-recently-used order and trimmed to
+    max_entries when saved.
+    """
+
+    def __init__(self, cache_file, max_entries=DEFAULT_CACHE_SIZE, fingerprint=''):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.fingerprint = f"{CACHE_VERSION}:{fingerprint}"
+        self.entries = OrderedDict()
+        self.previews = OrderedDict()
+        self.hashes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, repo_path, cache_dir=DEFAULT_CACHE_DIR, max_entries=DEFAULT_CACHE_SIZE, fingerprint=''):
+        """
+        Load the cache for a repository, starting empty if none can be read.
+
+        :param repo_path: Path to the local repository
+        :param cache_dir: Directory holding one cache file per repository
+        :param max_entries: Maximum number of directory records to keep
+        :param fingerprint: Scan settings that invalidate the cache when changed
+        :return: SnapshotCache instance
+        """
+        repo_key = hashlib.sha1(os.path.abspath(repo_path).encode('utf-8')).hexdigest()
+        cache = cls(os.path.join(cache_dir, f"{repo_key}.json"), max_entries, fingerprint)
+        try:
+            with open(cache.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cache
+        if data.get('fingerprint') == cache.fingerprint:
+            cache.entries = OrderedDict(data.get('entries', {}))
+            cache.previews = OrderedDict(data.get('previews', {}))
+            cache.hashes = OrderedDict(data.get('hashes', {}))
+        return cache
+
+    def lookup(self, relative_path, dir_stat, root, context=''):
+        """
+        Return the cached record for a directory if it is still valid.
+
+        :param relative_path: Directory path relative to the repository root
+        :param dir_stat: os.stat result for the directory
+        :param root: Absolute path of the directory
+        :param context: Fingerprint of inherited scan state (ignore rules from parent directories)
+        :return: Cached record, or None on a miss
+        """
+        with self._lock:
+            entry = self.entries.get(relative_path)
+        if (entry is None or entry['mtime_ns'] != dir_stat.st_mtime_ns
+                or entry['ino'] != dir_stat.st_ino or entry['context'] != context):
+            self.misses += 1
+            return None
+        for name, stamp in entry['stamps'].items():
+            if file_stamp(os.path.join(root, name)) != stamp:
+                self.misses += 1
+                return None
+        with self._lock:
+            self.entries.move_to_end(relative_path)
+        self.hits += 1
+        return entry['record']
+
+    def store(self, relative_path, dir_stat, record, stamps, context=''):
+        """
+        Remember the record for a directory.
+
+        :param relative_path: Directory path relative to the repository root
+        :param dir_stat: os.stat result taken before the directory was listed
+        :param record: Directory record as returned by scan_directory
+        :param stamps: Mapping of name to file_stamp for files that were read and
+                       directories that were probed
+        :param context: Fingerprint of inherited scan state, as passed to lookup
+        """
+        if time.time_ns() - dir_stat.st_mtime_ns < RACY_WINDOW_NS:
+            return
+        if any(stamp is None for stamp in stamps.values()):
+            return
+        entry = {
+            'mtime_ns': dir_stat.st_mtime_ns,
+            'ino': dir_stat.st_ino,
+            'context': context,
+            'stamps': stamps,
+            'record': record
+        }
+        with self._lock:
+            self.entries[relative_path] = entry
+            self.entries.move_to_end(relative_path)
+
+    def lookup_preview(self, path, stamp):
+        """
+        Return the cached preview of an index file if its stamp is unchanged.
+
+        :param path: File path relative to the repository root
+        :param stamp: Current stamp of the file, including the byte budget it was read with
+        :return: Preview text, or None on a miss
+        """
+        with self._lock:
+            entry = self.previews.get(path)
+            if entry is None or entry[0] != stamp:
+                return None
+            self.previews.move_to_end(path)
+            return entry[1]
+
+    def store_preview(self, path, stamp, preview):
+        """
+        Remember the preview of an index file.
+
+        :param path: File path relative to the repository root
+        :param stamp: Stamp of the file taken before it was read
+        :param preview: Preview text
+        """
+        if time.time_ns() - stamp[0] < RACY_WINDOW_NS:
+            return
+        with self._lock:
+            self.previews[path] = [stamp, preview]
+            self.previews.move_to_end(path)
+
+    def lookup_hash(self, path, stamp, kind):
+        """
+        Return a cached content hash of a file if its stamp is unchanged.
+
+        :param path: File path relative to the repository root
+        :param stamp: Current stamp of the file
+        :param kind: 'partial' for the first block, 'full' for the whole file
+        :return: Hex digest, or None on a miss
+        """
+        with self._lock:
+            entry = self.hashes.get(path)
+            if entry is None or entry['stamp'] != stamp or kind not in entry:
+                return None
+            self.hashes.move_to_end(path)
+            return entry[kind]
+
+    def store_hash(self, path, stamp, kind, digest):
+        """
+        Remember a content hash of a file.
+
+        :param path: File path relative to the repository root
+        :param stamp: Stamp of the file taken before it was read
+        :param kind: 'partial' or 'full', as passed to lookup_hash
+        :param digest: Hex digest
+        """
+        if time.time_ns() - stamp[0] < RACY_WINDOW_NS:
+            return
+        with self._lock:
+            entry = self.hashes.get(path)
+            if entry is None or entry['stamp'] != stamp:
+                entry = self.hashes[path] = {'stamp': stamp}
+            entry[kind] = digest
+            self.hashes.move_to_end(path)
+
+    def save(self):
+        """
+        Evict least-recently-used entries over the size cap and write the cache atomically.
+        """
+        with self._lock:
+            for entries in (self.entries, self.previews, self.hashes):
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+            data = {
+                'fingerprint': self.fingerprint,
+                'entries': self.entries,
+                'previews': self.previews,
+                'hashes': self.hashes
+            }
+            cache_dir = os.path.dirname(self.cache_file)
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, separators=(',', ':'))
+                os.replace(tmp_path, self.cache_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+def load_rule_pack(path):
+    """
+    Load an indicator rule pack from a JSON file.
+
+    A rule pack has the same shape as DEFAULT_RULES, for example
+    {"frameworks": {"acme_web": ["acme.toml", {"name": "app.py", "contains": "acme"}]}}.
+
+    :param path: Path to the JSON rule pack
+    :return: Dictionary of category -> label -> indicators
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        pack = json.load(f)
+    if not isinstance(pack, dict):
+        raise ValueError(f"{path}: rule pack must be a JSON object")
+    for category, labels in pack.items():
+        if category not in INDICATOR_CATEGORIES:
+            raise ValueError(f"{path}: unknown indicator category '{category}'")
+        if not isinstance(labels, dict):
+            raise ValueError(f"{path}: '{category}' must map labels to lists of indicators")
+    return pack
+
+def merge_rule_packs(*packs):
+    """
+    Merge rule packs; indicators for an existing label are appended to it.
+
+    :param packs: Rule pack dictionaries, in priority order
+    :return: Merged rule pack
+    """
+    merged = {category: {} for category in INDICATOR_CATEGORIES}
+    for pack in packs:
+        for category, labels in pack.items():
+            for label, indicators in labels.items():
+                merged[category].setdefault(label, []).extend(indicators)
+    return merged
+
+class RuleEngine:
+    """
+    Indicator rules compiled into hash indexes on entry name.
+
+    Every rule is indexed under the last component of its pattern, separately
+    for files and directories, so matching a directory costs one dict lookup
+    per entry rather than a pass over every rule. Anchored patterns
+    ('.circleci/config.yml') additionally check the trailing components of
+    the directory path, and 'contains' rules sniff the start of the file.
+
+    Anchored patterns are also indexed under their first component as probes:
+    when that directory is one the walker prunes (such as .circleci), the
+    rest of the pattern is checked for existence instead.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        self.file_index = {}
+        self.dir_index = {}
+        self.probe_index = {}
+        # File name -> 'contains' needles, for sources that must read ahead
+        self.sniff_needles = {}
+        self.max_depth = 0
+        order = 0
+        for category in INDICATOR_CATEGORIES:
+            for label, indicators in rules.get(category, {}).items():
+                for indicator in indicators:
+                    if isinstance(indicator, str):
+                        pattern, contains = indicator, None
+                    else:
+                        pattern, contains = indicator['name'], indicator.get('contains')
+                    is_dir = pattern.endswith('/')
+                    parts = pattern.strip('/').split('/')
+                    rule = (order, category, label, tuple(parts[:-1]),
+                            contains.lower().encode('utf-8') if contains else None)
+                    index = self.dir_index if is_dir else self.file_index
+                    index.setdefault(parts[-1], []).append(rule)
+                    if contains and not is_dir:
+                        self.sniff_needles.setdefault(parts[-1], set()).add(rule[4])
+                    if len(parts) > 1:
+                        self.probe_index.setdefault(parts[0], []).append(
+                            (order, category, label, '/'.join(parts[1:]), is_dir))
+                    self.max_depth = max(self.max_depth, len(parts) - 1)
+                    order += 1
+        self.fingerprint = hashlib.sha1(
+            json.dumps(rules, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    def match_directory(self, relative_path, files, dirs, read_head, probe=None):
+        """
+        Find the indicator hits among the entries of a single directory.
+
+        :param relative_path: Directory path relative to the repository root ('.' for the root)
+        :param files: Names of the files in the directory
+        :param dirs: Names of all subdirectories, including ones the walker prunes
+        :param read_head: Callable returning the first RULE_SNIFF_BYTES of a file by name
+        :param probe: Callable (path, is_dir) -> bool checking a path below this directory
+        :return: Dictionary of category -> list of hits, in rule order
+        """
+        hits = []
+        if probe is not None:
+            for name in dirs:
+                if name not in self.probe_index or should_descend(name):
+                    continue
+                for order, category, label, rest, is_dir in self.probe_index[name]:
+                    path = os.path.join(name, rest)
+                    if probe(path, is_dir):
+                        hits.append((order, path, category, label))
+
+        parents = None
+        heads = {}
+        for names, index in ((files, self.file_index), (dirs, self.dir_index)):
+            for name in names:
+                rules = index.get(name)
+                if not rules:
+                    continue
+                for order, category, label, anchor, contains in rules:
+                    if anchor:
+                        if parents is None:
+                            parents = () if relative_path == '.' else tuple(relative_path.split(os.path.sep))
+                        if parents[-len(anchor):] != anchor:
+                            continue
+                    if contains is not None:
+                        if name not in heads:
+                            heads[name] = read_head(name).lower()
+                        if contains not in heads[name]:
+                            continue
+                    hits.append((order, name, category, label))
+
+        matches = {category: [] for category in INDICATOR_CATEGORIES}
+        for order, name, category, label in sorted(hits):
+            matches[category].append({
+                INDICATOR_CATEGORIES[category]: label,
+                'path': os.path.join(relative_path, name)
+            })
+        return matches
+
+DEFAULT_RULE_ENGINE = RuleEngine()
+
+class PathTable:
+    """
+    Interned, array-backed table of the entries in a repository.
+
+    Each row holds a parent row, an interned name id and an extension code
+    (DIRECTORY for directories), at 12 bytes per entry instead of a dict per
+    directory and a key per file. Row 0 is the repository root. Rows only
+    need to be added after their parent; children are listed in row order.
+    """
+
+    DIRECTORY = -1
+    ROOT = 0
+
+    def __init__(self):
+        self.parents = array('i', [-1])
+        self.name_ids = array('i', [0])
+        self.ext_codes = array('i', [self.DIRECTORY])
+        self.names = ['']
+        self.extensions = ['']
+        self._name_ids = {'': 0}
+        self._ext_codes = {'': 0}
+
+    def __len__(self):
+        return len(self.parents)
+
+    def _intern_name(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def add_directory(self, parent, name):
+        """
+        Append a directory row.
+
+        :param parent: Row of the parent directory
+        :param name: Directory name
+        :return: Row of the new directory
+        """
+        self.parents.append(parent)
+        self.name_ids.append(self._intern_name(name))
+        self.ext_codes.append(self.DIRECTORY)
+        return len(self.parents) - 1
+
+    def add_file(self, parent, name, ext):
+        """
+        Append a file row.
+
+        :param parent: Row of the parent directory
+        :param name: File name
+        :param ext: Lower-cased extension including the dot, or '' for none
+        :return: Row of the new file
+        """
+        ext_code = self._ext_codes.get(ext)
+        if ext_code is None:
+            ext_code = self._ext_codes[ext] = len(self.extensions)
+            self.extensions.append(ext)
+        self.parents.append(parent)
+        self.name_ids.append(self._intern_name(name))
+        self.ext_codes.append(ext_code)
+        return len(self.parents) - 1
+
+    def is_dir(self, row):
+        return self.ext_codes[row] == self.DIRECTORY
+
+    def name(self, row):
+        return self.names[self.name_ids[row]]
+
+    def extension(self, row):
+        """
+        :return: Extension of a file row, or None for a directory
+        """
+        ext_code = self.ext_codes[row]
+        return None if ext_code == self.DIRECTORY else self.extensions[ext_code]
+
+    def path(self, row):
+        """
+        Build the path of a row relative to the repository root.
+
+        :param row: Row number
+        :return: Relative path ('.' for the root)
+        """
+        parts = []
+        while row > self.ROOT:
+            parts.append(self.names[self.name_ids[row]])
+            row = self.parents[row]
+        return os.path.join(*reversed(parts)) if parts else '.'
+
+    def iter_paths(self):
+        """
+        Build the path of every row but the root in one pass.
+
+        Rows come after their parents, so each path is the parent's path
+        (kept for directory rows only) plus the name: one join per row,
+        where calling path() on each row walks up to the root every time.
+
+        :return: Generator of (row, relative path) pairs in row order
+        """
+        parents, name_ids, ext_codes, names = self.parents, self.name_ids, self.ext_codes, self.names
+        dir_paths = {self.ROOT: ''}
+        for row in range(1, len(parents)):
+            parent_path = dir_paths[parents[row]]
+            name = names[name_ids[row]]
+            path = parent_path + os.sep + name if parent_path else name
+            if ext_codes[row] == self.DIRECTORY:
+                dir_paths[row] = path
+            yield row, path
+
+    def iter_tree(self):
+        """
+        Walk the table in pre-order without materializing a nested structure.
+
+        :return: Generator of (depth, row) pairs, excluding the root
+        """
+        count = len(self.parents)
+        first_child = array('i', [-1]) * count
+        next_sibling = array('i', [-1]) * count
+        # Link children back to front so siblings come out in row order
+        for row in range(count - 1, 0, -1):
+            parent = self.parents[row]
+            next_sibling[row] = first_child[parent]
+            first_child[parent] = row
+
+        stack = [(first_child[self.ROOT], 0)]
+        while stack:
+            row, depth = stack.pop()
+            if row == -1:
+                continue
+            yield depth, row
+            stack.append((next_sibling[row], depth))
+            stack.append((first_child[row], depth + 1))
+
+    def nested(self):
+        """
+        Build the legacy directory_tree view: nested dicts with None for files.
+        """
+        nodes = {self.ROOT: {}}
+        for row in range(1, len(self.parents)):
+            parent = nodes[self.parents[row]]
+            if self.ext_codes[row] == self.DIRECTORY:
+                parent[self.names[self.name_ids[row]]] = nodes[row] = {}
+            else:
+                parent[self.names[self.name_ids[row]]] = None
+        return nodes[self.ROOT]
+
+    def file_types(self):
+        """
+        Build the file_types view: relative path -> extension for files that have one.
+        """
+        return {
+            path: self.extensions[self.ext_codes[row]]
+            for row, path in self.iter_paths()
+            if self.ext_codes[row] > 0
+        }
+
+class LazyView(Mapping):
+    """
+    Read-only mapping that is only built the first time it is used.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._data = None
+
+    def _materialize(self):
+        if self._data is None:
+            self._data = self._factory()
+        return self._data
+
+    def __getitem__(self, key):
+        return self._materialize()[key]
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __len__(self):
+        return len(self._materialize())
+
+class ScanStats:
+    """
+    Phase timers and counters collected during a scan and report.
+
+    Everything that takes a stats argument accepts None, in which case no
+    clock is read and nothing is counted. Phases that run on worker threads
+    ('list', 'match', 'preview') are summed across threads, so they can add
+    up to more than the wall-clock 'walk' phase.
+    """
+
+    def __init__(self, slowest=DEFAULT_SLOWEST_DIRS):
+        self.phases = {}
+        self.counters = {}
+        self.slowest = slowest
+        self._slowest_heap = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Time a block of code and add it to the named phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def directory_time(self, relative_path, seconds):
+        """
+        Offer a directory's scan time to the slowest-directories list.
+        """
+        with self._lock:
+            entry = (seconds, relative_path)
+            if len(self._slowest_heap) < self.slowest:
+                heapq.heappush(self._slowest_heap, entry)
+            elif entry > self._slowest_heap[0]:
+                heapq.heapreplace(self._slowest_heap, entry)
+
+    def slowest_directories(self):
+        """
+        :return: List of {'path', 'seconds'} dictionaries, slowest first
+        """
+        with self._lock:
+            entries = sorted(self._slowest_heap, reverse=True)
+        return [{'path': path, 'seconds': seconds} for seconds, path in entries]
+
+    def as_dict(self):
+        with self._lock:
+            phases = dict(self.phases)
+            counters = dict(sorted(self.counters.items()))
+        return {
+            'phases': phases,
+            'counters': counters,
+            'slowest_directories': self.slowest_directories()
+        }
+
+    def write_json(self, output_file):
+        """
+        Dump the stats as JSON to a file, or to standard error for '-'.
+        """
+        data = json.dumps(self.as_dict(), indent=2) + '\n'
+        if output_file == '-':
+            sys.stderr.write(data)
+            return
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(data)
+
+    def write_markdown(self, f):
+        """
+        Append a 'Scan Statistics' section to an open markdown report.
+        """
+        stats = self.as_dict()
+        f.write(f"\n## Scan Statistics\n")
+        f.write(f"### Phases\n")
+        for name, seconds in stats['phases'].items():
+            f.write(f"- {name}: {seconds:.3f}s\n")
+        f.write(f"\n### Counters\n")
+        for name, value in stats['counters'].items():
+            f.write(f"- {name}: {value}\n")
+        if stats['slowest_directories']:
+            f.write(f"\n### Slowest Directories\n")
+            for entry in stats['slowest_directories']:
+                f.write(f"- {entry['path']}: {entry['seconds'] * 1000:.1f}ms\n")
+
+def _translate_ignore_glob(pattern):
+    """
+    Translate a gitignore glob into a regular expression body.
+
+    '*', '?' and character classes never match '/', and '**' is only special
+    as a whole path component: a leading '**/' or inner '/**/' matches zero
+    or more directories, and a trailing '/**' matches everything inside.
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/') \
+                    and (i + 2 == n or pattern[i + 2] == '/'):
+                if i + 2 == n:
+                    out.append('.*')
+                    i += 2
+                else:
+                    out.append('(?:.*/)?')
+                    i += 3
+                continue
+            while i + 1 < n and pattern[i + 1] == '*':
+                i += 1
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 2 if pattern[j] == '\\' else 1
+            if j >= n:
+                out.append('\\[')
+            else:
+                body = pattern[i + 1:j]
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                out.append(f'(?!/)[{body}]')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+class IgnoreRules:
+    """
+    The patterns of one ignore file, compiled for matching.
+
+    Patterns without a slash or glob characters match on the entry name and
+    go into a dict; the rest become regular expressions. Matching returns
+    the verdict of the last pattern that matches, as git does.
+    """
+
+    def __init__(self, base, lines):
+        self.base = base
+        self.literals = {}
+        self.patterns = []
+        for index, line in enumerate(lines):
+            if not line or line.startswith('#'):
+                continue
+            # Trailing spaces are ignored unless escaped with a backslash
+            stripped = line.rstrip(' ')
+            if stripped.endswith('\\') and len(stripped) < len(line):
+                stripped += ' '
+            line = stripped
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            # A slash anywhere but the end anchors the pattern to the ignore file's directory
+            anchored = '/' in line
+            line = line.lstrip('/')
+            if not anchored and not any(c in line for c in '*?[\\'):
+                self.literals.setdefault(line, []).append((index, negate, dir_only))
+            else:
+                regex = re.compile(_translate_ignore_glob(line) + r'\Z')
+                self.patterns.append((index, regex, anchored, negate, dir_only))
+
+    def match(self, path, name, is_dir):
+        """
+        Match an entry against these patterns.
+
+        :param path: Entry path relative to this file's base directory, with '/' separators
+        :param name: Entry name
+        :param is_dir: Whether the entry is a directory
+        :return: True if ignored, False if re-included by a negated pattern, None if no pattern matches
+        """
+        best, verdict = -1, None
+        for index, negate, dir_only in reversed(self.literals.get(name, ())):
+            if is_dir or not dir_only:
+                best, verdict = index, not negate
+                break
+        for index, regex, anchored, negate, dir_only in reversed(self.patterns):
+            if index < best:
+                break
+            if (is_dir or not dir_only) and regex.match(path if anchored else name):
+                return not negate
+        return verdict
+
+@functools.lru_cache(maxsize=4096)
+def compile_ignore_rules(base, lines):
+    """
+    Compile (and memoize) the patterns of an ignore file.
+
+    :param base: Directory the patterns are relative to ('.' for the repository root)
+    :param lines: Tuple of lines from the ignore file
+    :return: IgnoreRules
+    """
+    return IgnoreRules(base, lines)
+
+def read_ignore_lines(path):
+    """
+    Read the lines of an ignore file, or an empty tuple if it cannot be read.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            return tuple(f.read().splitlines())
+    except OSError:
+        return ()
+
+class IgnoreMatcher:
+    """
+    The ignore rules in effect for one directory of the walk.
+
+    Rule sets are checked from highest to lowest precedence, and the first
+    set with a matching pattern decides: user-supplied ignore files, then
+    .gitignore files from the deepest directory up to the root, then
+    .git/info/exclude. Matchers are immutable; extend() returns the matcher
+    for a subdirectory that has its own .gitignore.
+    """
+
+    def __init__(self, overrides=(), chain=(), fingerprint='', use_git_rules=True):
+        self.overrides = overrides
+        self.chain = chain
+        self.fingerprint = fingerprint
+        self.use_git_rules = use_git_rules
+
+    @classmethod
+    def for_repository(cls, repo_path, ignore_files=(), use_git_rules=True):
+        """
+        Build the matcher for the repository root.
+
+        :param repo_path: Path to the local repository
+        :param ignore_files: Extra ignore files, with patterns relative to the repository root
+        :param use_git_rules: Apply .git/info/exclude and .gitignore files
+        :return: IgnoreMatcher
+        """
+        overrides = tuple(compile_ignore_rules('.', read_ignore_lines(path)) for path in ignore_files)
+        chain = ()
+        git_dir = find_git_dir(repo_path) if use_git_rules else None
+        if git_dir is not None:
+            exclude = read_ignore_lines(os.path.join(_git_common_dir(git_dir), 'info', 'exclude'))
+            chain = (compile_ignore_rules('.', exclude),)
+        digest = hashlib.sha1(repr(use_git_rules).encode('utf-8'))
+        for rule_set in overrides + chain:
+            digest.update(repr(sorted(rule_set.literals.items())).encode('utf-8', 'surrogateescape'))
+            digest.update(repr([p[1].pattern for p in rule_set.patterns]).encode('utf-8', 'surrogateescape'))
+        return cls(overrides, chain, digest.hexdigest(), use_git_rules)
+
+    def extend(self, base, lines):
+        """
+        Return the matcher for a directory with a .gitignore of its own.
+
+        :param base: Directory containing the .gitignore, relative to the repository root
+        :param lines: Lines from the .gitignore
+        :return: IgnoreMatcher
+        """
+        lines = tuple(lines)
+        digest = hashlib.sha1(f"{self.fingerprint}\0{base}\0".encode('utf-8', 'surrogateescape'))
+        digest.update('\n'.join(lines).encode('utf-8', 'surrogateescape'))
+        return IgnoreMatcher(self.overrides, (compile_ignore_rules(base, lines),) + self.chain,
+                             digest.hexdigest(), self.use_git_rules)
+
+    def is_ignored(self, relative_path, name, is_dir):
+        """
+        :param relative_path: Entry path relative to the repository root
+        :param name: Entry name
+        :param is_dir: Whether the entry is a directory
+        :return: True if the entry is ignored
+        """
+        if os.sep != '/':
+            relative_path = relative_path.replace(os.sep, '/')
+        for rule_set in self.overrides + self.chain:
+            base = rule_set.base
+            path = relative_path if base == '.' else relative_path[len(base) + 1:]
+            verdict = rule_set.match(path, name, is_dir)
+            if verdict is not None:
+                return verdict
+        return False
+
+def should_descend(dir_name):
+    """
+    Decide whether the walker should descend into a subdirectory.
+
+    :param dir_name: Name of the subdirectory
+    :return: False for version control, hidden directories (except .github) and node_modules
+    """
+    return not (dir_name.startswith('.') and dir_name != '.github') and dir_name != 'node_modules'
+
+def analyze_directory(relative_path, files, dirs, rules, read_head, probe):
+    """
+    Build the record for one directory from its listing.
+
+    This is shared by every source of directory listings (filesystem walk,
+    git index), which differ only in how they list and read files.
+
+    :param relative_path: Directory path relative to the repository root ('.' for the root)
+    :param files: Sorted names of the files in the directory
+    :param dirs: Sorted names of all subdirectories
+    :param rules: RuleEngine used to detect indicators
+    :param read_head: Callable returning the first RULE_SNIFF_BYTES of a file by name
+    :param probe: Callable (path, is_dir) -> bool checking a path below this directory
+    :return: Dictionary describing the directory
+    """
+    record = {
+        'path': relative_path,
+        'files': files,
+        'dirs': [d for d in dirs if should_descend(d)],
+        'github_workflows': [],
+        'index_files': []
+    }
+
+    # GitHub workflow detection
+    if '.github' in relative_path.split(os.path.sep):
+        for file in files:
+            if file.endswith(('.yml', '.yaml')):
+                workflow_path = os.path.join(relative_path, file)
+                record['github_workflows'].append(workflow_path)
+
+    # Index file detection; previews are read later by a PreviewReader
+    for index_file in INDEX_CANDIDATES:
+        if index_file in files:
+            record['index_files'].append({
+                'path': index_file if relative_path == '.' else os.path.join(relative_path, index_file),
+                'type': os.path.splitext(index_file)[1]
+            })
+
+    # Subdirectories pruned by ignore rules, added by the source that applies
+    # them; hidden directories and node_modules are never counted, as every
+    # source skips them
+    record['pruned'] = 0
+
+    # Check for framework, package manager, development and CI/CD indicators
+    record.update(rules.match_directory(relative_path, files, dirs, read_head, probe))
+
+    return record
+
+def scan_directory(repo_path, relative_path, cache=None, rules=DEFAULT_RULE_ENGINE, ignore=None, stats=None):
+    """
+    List a single directory with os.scandir and run the per-directory matching.
+
+    This is the unit of work handed to the walker's thread pool, so it only
+    reads from disk and returns a self-contained record; merging into
+    repo_info happens on the calling thread.
+
+    :param repo_path: Path to the local repository
+    :param relative_path: Directory path relative to the repository root ('.' for the root)
+    :param cache: Optional SnapshotCache to reuse and store records
+    :param rules: RuleEngine used to detect indicators
+    :param ignore: IgnoreMatcher inherited from the parent directory, or None to ignore nothing
+    :param stats: Optional ScanStats receiving timings and counters
+    :return: Dictionary describing the directory, or None if it could not be listed
+    """
+    root = repo_path if relative_path == '.' else os.path.join(repo_path, relative_path)
+    context = ignore.fingerprint if ignore is not None else ''
+    if stats is not None:
+        start = time.perf_counter()
+
+    if cache is not None:
+        # Stat before listing so a change made during the scan invalidates the entry
+        try:
+            dir_stat = os.stat(root)
+        except OSError:
+            return None
+        record = cache.lookup(relative_path, dir_stat, root, context)
+        if record is not None:
+            if stats is not None:
+                stats.count('directories_cached')
+            return record
+        stamps = {}
+
+    files = []
+    dirs = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry.name)
+                elif not entry.is_symlink():
+                    # Like os.walk, symlinked directories are not followed
+                    dirs.append(entry.name)
+    except OSError:
+        # os.walk silently skips directories it cannot list; do the same
+        return None
+
+    # Apply ignore rules, including this directory's own .gitignore. Ignored
+    # subdirectories are pruned here, so nothing below them is ever opened.
+    gitignore = None
+    ignored_dirs = 0
+    if ignore is not None:
+        if ignore.use_git_rules and '.gitignore' in files:
+            gitignore_path = os.path.join(root, '.gitignore')
+            if cache is not None:
+                stamps['.gitignore'] = file_stamp(gitignore_path)
+            gitignore = read_ignore_lines(gitignore_path)
+            ignore = ignore.extend(relative_path, gitignore)
+        prefix = '' if relative_path == '.' else relative_path + os.sep
+        files = [f for f in files if not ignore.is_ignored(prefix + f, f, False)]
+        kept_dirs = [d for d in dirs if not ignore.is_ignored(prefix + d, d, True)]
+        ignored_dirs = len(dirs) - len(kept_dirs)
+        dirs = kept_dirs
+
+    # Sort so the output does not depend on filesystem or scheduling order
+    files.sort()
+    dirs.sort()
+
+    def read_head(name):
+        full_path = os.path.join(root, name)
+        if cache is not None:
+            stamps[name] = file_stamp(full_path)
+        try:
+            with open(full_path, 'rb') as f:
+                head = f.read(RULE_SNIFF_BYTES)
+        except OSError:
+            return b''
+        if stats is not None:
+            stats.count('rule_files_read')
+            stats.count('rule_bytes_read', len(head))
+        return head
+
+    def probe(path, is_dir):
+        full_path = os.path.join(root, path)
+        if cache is not None:
+            # Creating or removing the probed path changes the mtime of the
+            # deepest directory above it that exists, so stamp each of them
+            directory = ''
+            for part in os.path.normpath(os.path.dirname(path)).split(os.sep):
+                directory = os.path.join(directory, part)
+                stamp = file_stamp(os.path.join(root, directory))
+                if stamp is None:
+                    break
+                stamps[directory] = stamp
+        return os.path.isdir(full_path) if is_dir else os.path.isfile(full_path)
+
+    if stats is not None:
+        listed = time.perf_counter()
+        stats.add_time('list', listed - start)
+    record = analyze_directory(relative_path, files, dirs, rules, read_head, probe)
+    record['pruned'] += ignored_dirs
+    if stats is not None:
+        done = time.perf_counter()
+        stats.add_time('match', done - listed)
+        stats.directory_time(relative_path, done - start)
+        stats.count('directories_scanned')
+        stats.count('files_listed', len(files))
+    # Kept so the walker can hand the same rules down to subdirectories
+    record['gitignore'] = gitignore
+
+    if cache is not None:
+        cache.store(relative_path, dir_stat, record, stamps, context)
+
+    return record
+
+class PreviewError(Exception):
+    """Raised when an index file cannot be previewed as text."""
+
+def read_preview(full_path, max_bytes=DEFAULT_PREVIEW_BYTES, max_chars=PREVIEW_CHARS):
+    """
+    Read the start of a text file for an index file preview.
+
+    Only max_bytes are read. Binary content is rejected by a NUL byte check
+    before anything is decoded, and the UTF-8 decoder is told whether the
+    read stopped at the budget, so a multi-byte character cut at the budget
+    boundary is dropped rather than reported as an invalid encoding.
+
+    :param full_path: Path to the file
+    :param max_bytes: Maximum number of bytes to read
+    :param max_chars: Maximum number of characters to keep
+    :return: Tuple of (preview text, bytes read)
+    """
+    with open(full_path, 'rb') as f:
+        data = f.read(max_bytes)
+    return decode_preview(data, max_bytes, max_chars), len(data)
+
+def decode_preview(data, max_bytes, max_chars=PREVIEW_CHARS):
+    """
+    Turn the first bytes of a file into preview text (see read_preview).
+
+    :param data: Bytes read from the start of the file
+    :param max_bytes: Number of bytes that were asked for
+    :param max_chars: Maximum number of characters to keep
+    :return: Preview text
+    """
+    if b'\0' in data:
+        raise PreviewError("binary content")
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        text = decoder.decode(data, final=len(data) < max_bytes)
+    except UnicodeDecodeError as e:
+        raise PreviewError(f"not valid UTF-8 ({e.reason} at byte {e.start})") from None
+    # Match the newline translation of text mode
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text[:max_chars].strip()
+
+class PreviewReader:
+    """
+    Concurrent, bounded stage that reads index file previews off the walker's thread.
+
+    Index files are submitted as the walk discovers them and come back, with
+    a 'preview' key added, in the order they were submitted. Index files
+    that already carry a preview pass straight through. Each file reads
+    at most max_bytes; once total_bytes have been read across the scan the
+    remaining previews are left empty. Files that are binary, not UTF-8 or
+    unreadable are reported on stderr and dropped.
+    """
+
+    def __init__(self, repo_path, jobs=DEFAULT_JOBS, max_bytes=DEFAULT_PREVIEW_BYTES,
+                 total_bytes=DEFAULT_PREVIEW_BUDGET, cache=None, stats=None):
+        self.repo_path = repo_path
+        self.max_bytes = max_bytes
+        self.remaining = total_bytes
+        self.cache = cache
+        self.stats = stats
+        self.window = max(1, jobs) * 4
+        self._pool = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._budget_warned = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _reserve(self, nbytes):
+        with self._lock:
+            granted = min(nbytes, self.remaining)
+            self.remaining -= granted
+            return granted
+
+    def _read(self, index_file):
+        if 'preview' in index_file:
+            # Already read by the source (archives are read in a single pass)
+            return index_file
+        if self.stats is None:
+            return self._read_preview(index_file)
+        with self.stats.phase('preview'):
+            return self._read_preview(index_file)
+
+    def _read_preview(self, index_file):
+        full_path = os.path.join(self.repo_path, index_file['path'])
+        stamp = file_stamp(full_path)
+        if self.cache is not None and stamp is not None:
+            stamp.append(self.max_bytes)
+            preview = self.cache.lookup_preview(index_file['path'], stamp)
+            if preview is not None:
+                if self.stats is not None:
+                    self.stats.count('previews_cached')
+                return {**index_file, 'preview': preview}
+
+        budget = self._reserve(self.max_bytes)
+        if budget == 0:
+            if not self._budget_warned:
+                self._budget_warned = True
+                print("Preview byte budget exhausted; remaining previews are empty", file=sys.stderr)
+            return {**index_file, 'preview': ''}
+        try:
+            preview, nbytes = read_preview(full_path, budget)
+        except (OSError, PreviewError) as e:
+            print(f"Error reading {full_path}: {e}", file=sys.stderr)
+            self._reserve(-budget)
+            if self.stats is not None:
+                self.stats.count('preview_errors')
+            return None
+        # Hand back whatever part of the reservation was not used
+        self._reserve(nbytes - budget)
+        if self.stats is not None:
+            self.stats.count('previews_read')
+            self.stats.count('preview_bytes_read', nbytes)
+
+        if self.cache is not None and stamp is not None and budget == self.max_bytes:
+            self.cache.store_preview(index_file['path'], stamp, preview)
+        return {**index_file, 'preview': preview}
+
+    def submit(self, index_file):
+        """
+        Queue an index file ({'path': ..., 'type': ...}) for previewing.
+        """
+        if self._pool is None:
+            self._pending.append(self._read(index_file))
+        else:
+            self._pending.append(self._pool.submit(self._read, index_file))
+
+    def drain(self, wait=False):
+        """
+        Yield finished previews in submission order.
+
+        :param wait: Wait for every submitted file; otherwise only yield the
+                     finished prefix, blocking just enough to keep at most
+                     a few batches in flight
+        :return: Generator of index file dictionaries with a 'preview' key
+        """
+        while self._pending:
+            head = self._pending[0]
+            if self._pool is not None:
+                if not (wait or head.done() or len(self._pending) > self.window):
+                    return
+                head = head.result()
+            self._pending.popleft()
+            if head is not None:
+                yield head
+
+def hash_file(full_path, limit=None):
+    """
+    Hash the contents of a file with BLAKE2b.
+
+    :param full_path: Path to the file
+    :param limit: Only hash the first limit bytes, or None for the whole file
+    :return: Tuple of (hex digest, bytes read)
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    nbytes = 0
+    with open(full_path, 'rb') as f:
+        while limit is None or nbytes < limit:
+            chunk_size = DUPLICATE_CHUNK_BYTES if limit is None else min(DUPLICATE_CHUNK_BYTES, limit - nbytes)
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            nbytes += len(chunk)
+    return digest.hexdigest(), nbytes
+
+def find_duplicate_files(repo_path, paths, jobs=DEFAULT_JOBS, cache=None, stats=None, min_size=1):
+    """
+    Find files with identical contents.
+
+    Candidates are narrowed in stages so most files are never read: files
+    are grouped by size, same-size files are compared by a hash of their
+    first DUPLICATE_BLOCK_BYTES, and only files that still collide are
+    hashed in full. Stat calls and hashing run on a thread pool. Hard links
+    to the same inode count as one file, since they waste no space.
+
+    :param repo_path: Path to the local repository
+    :param paths: Iterable of file paths relative to the repository root
+    :param jobs: Number of worker threads used to stat and hash files
+    :param cache: Optional SnapshotCache reusing hashes of unchanged files
+    :param stats: Optional ScanStats receiving timings and counters
+    :param min_size: Smallest file size considered (empty files are skipped by default)
+    :return: Dictionary with 'groups' (each with 'size', 'wasted_bytes' and
+             sorted 'paths', most wasted first) and total 'wasted_bytes'
+    """
+    pool = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    run = pool.map if pool is not None else map
+
+    def stat_file(path):
+        try:
+            st = os.stat(os.path.join(repo_path, path))
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode) or st.st_size < min_size:
+            return None
+        return path, st
+
+    def hash_stage(kind, limit):
+        def hash_one(candidate):
+            path, st = candidate
+            stamp = [st.st_mtime_ns, st.st_size]
+            if cache is not None:
+                digest = cache.lookup_hash(path, stamp, kind)
+                if digest is not None:
+                    if stats is not None:
+                        stats.count('hashes_cached')
+                    return digest
+            try:
+                digest, nbytes = hash_file(os.path.join(repo_path, path), limit)
+            except OSError as e:
+                print(f"Error hashing {path}: {e}", file=sys.stderr)
+                return None
+            if nbytes != st.st_size and limit is None:
+                # Changed while being read; leave it out rather than guess
+                return None
+            if stats is not None:
+                stats.count(f'files_hashed_{kind}')
+                stats.count('hash_bytes_read', nbytes)
+            if cache is not None:
+                cache.store_hash(path, stamp, kind, digest)
+            return digest
+        return hash_one
+
+    def refine(groups, hash_one):
+        candidates = [candidate for group in groups for candidate in group]
+        refined = {}
+        for candidate, digest in zip(candidates, run(hash_one, candidates)):
+            if digest is not None:
+                refined.setdefault((candidate[1].st_size, digest), []).append(candidate)
+        return [group for group in refined.values() if len(group) > 1]
+
+    try:
+        if stats is not None:
+            start = time.perf_counter()
+
+        # Stage 1: group by size, collapsing hard links
+        by_size = {}
+        seen_inodes = set()
+        for candidate in run(stat_file, paths):
+            if candidate is None:
+                continue
+            st = candidate[1]
+            inode = (st.st_dev, st.st_ino)
+            if inode in seen_inodes:
+                continue
+            seen_inodes.add(inode)
+            by_size.setdefault(st.st_size, []).append(candidate)
+        groups = [group for group in by_size.values() if len(group) > 1]
+
+        # Stage 2: hash the first block; for small files this is the whole file
+        groups = refine(groups, hash_stage('partial', DUPLICATE_BLOCK_BYTES))
+
+        # Stage 3: hash larger survivors in full
+        small = [group for group in groups if group[0][1].st_size <= DUPLICATE_BLOCK_BYTES]
+        large = [group for group in groups if group[0][1].st_size > DUPLICATE_BLOCK_BYTES]
+        groups = small + refine(large, hash_stage('full', None))
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    duplicates = [
+        {
+            'size': group[0][1].st_size,
+            'wasted_bytes': group[0][1].st_size * (len(group) - 1),
+            'paths': sorted(path for path, _ in group)
+        }
+        for group in groups
+    ]
+    duplicates.sort(key=lambda group: (-group['wasted_bytes'], group['paths'][0]))
+    if stats is not None:
+        stats.add_time('duplicates', time.perf_counter() - start)
+        stats.count('duplicate_groups', len(duplicates))
+    return {
+        'groups': duplicates,
+        'wasted_bytes': sum(group['wasted_bytes'] for group in duplicates)
+    }
+
+def count_file_lines(full_path, buffer):
+    """
+    Count the lines and bytes of a text file without holding it in memory.
+
+    A final line without a trailing newline still counts as a line.
+
+    :param full_path: Path to the file
+    :param buffer: Reusable bytearray the file is read into, chunk by chunk
+    :return: Tuple of (lines, bytes), or None for a binary file
+    """
+    lines = 0
+    nbytes = 0
+    last = b'\n'
+    view = memoryview(buffer)
+    with open(full_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            if nbytes == 0 and buffer.find(b'\0', 0, n) != -1:
+                return None
+            lines += buffer.count(b'\n', 0, n)
+            nbytes += n
+            last = view[n - 1:n].tobytes()
+    if last != b'\n':
+        lines += 1
+    return lines, nbytes
+
+def count_extension_lines(repo_path, paths, jobs=DEFAULT_JOBS, stats=None):
+    """
+    Total the lines and bytes of text files per extension.
+
+    Files are read on a thread pool, each worker reusing one chunk buffer,
+    so memory stays flat however large the files are. Binary files (a NUL
+    byte in their first chunk) are counted but contribute no lines or bytes.
+
+    :param repo_path: Path to the local repository
+    :param paths: Iterable of file paths relative to the repository root
+    :param jobs: Number of worker threads
+    :param stats: Optional ScanStats receiving timings and counters
+    :return: Dictionary of extension ('' for none) -> {'files', 'binary_files', 'lines', 'bytes'},
+             sorted by extension
+    """
+    buffers = threading.local()
+
+    def count_one(path):
+        buffer = getattr(buffers, 'buffer', None)
+        if buffer is None:
+            buffer = buffers.buffer = bytearray(LINE_COUNT_CHUNK_BYTES)
+        try:
+            return path, count_file_lines(os.path.join(repo_path, path), buffer)
+        except OSError as e:
+            print(f"Error counting lines in {path}: {e}", file=sys.stderr)
+            return path, False
+
+    if stats is not None:
+        start = time.perf_counter()
+    totals = {}
+    pool = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        results = pool.map(count_one, paths) if pool is not None else map(count_one, paths)
+        for path, counted in results:
+            if counted is False:
+                continue
+            ext = os.path.splitext(path)[1].lower()
+            entry = totals.get(ext)
+            if entry is None:
+                entry = totals[ext] = {'files': 0, 'binary_files': 0, 'lines': 0, 'bytes': 0}
+            entry['files'] += 1
+            if counted is None:
+                entry['binary_files'] += 1
+            else:
+                entry['lines'] += counted[0]
+                entry['bytes'] += counted[1]
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    if stats is not None:
+        stats.add_time('line_counts', time.perf_counter() - start)
+        stats.count('line_count_bytes_read', sum(entry['bytes'] for entry in totals.values()))
+    return dict(sorted(totals.items()))
+
+def walk_repository(repo_path, jobs=DEFAULT_JOBS, cache=None, rules=DEFAULT_RULE_ENGINE, ignore=None, stats=None,
+                    start='.'):
+    """
+    Walk a repository with a bounded thread pool, yielding directory records.
+
+    Records are yielded in depth-first pre-order with sorted names, so the
+    output is identical for any number of workers. Directories near the top
+    of the pending stack are listed ahead of time on the pool; only a small
+    window is in flight, so memory does not grow with the size of the tree.
+
+    :param repo_path: Path to the local repository
+    :param jobs: Number of worker threads (1 lists everything on the calling thread)
+    :param cache: Optional SnapshotCache to reuse records of unchanged directories
+    :param rules: RuleEngine used to detect indicators
+    :param ignore: IgnoreMatcher for the start directory, or None to ignore nothing
+    :param stats: Optional ScanStats receiving timings and counters
+    :param start: Directory to walk, relative to the repository root ('.' for the whole repository)
+    :return: Generator of records as returned by scan_directory
+    """
+    def children(relative_path, ignore, record):
+        if ignore is not None and record['gitignore'] is not None:
+            ignore = ignore.extend(relative_path, record['gitignore'])
+        for name in reversed(record['dirs']):
+            yield name if relative_path == '.' else os.path.join(relative_path, name), ignore
+
+    if jobs <= 1:
+        stack = [(start, ignore)]
+        while stack:
+            relative_path, dir_ignore = stack.pop()
+            record = scan_directory(repo_path, relative_path, cache, rules, dir_ignore, stats)
+            if record is None:
+                continue
+            yield record
+            stack.extend(children(relative_path, dir_ignore, record))
+        return
+
+    # Each stack item is [relative_path, ignore, future]; the top of the stack
+    # is the end of the list and is the next directory to be yielded.
+    window = jobs * 4
+    pool = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        stack = [[start, ignore, None]]
+        while stack:
+            for item in stack[-window:]:
+                if item[2] is None:
+                    item[2] = pool.submit(scan_directory, repo_path, item[0], cache, rules, item[1], stats)
+
+            relative_path, dir_ignore, future = stack.pop()
+            record = future.result()
+            if record is None:
+                continue
+            yield record
+            stack.extend([child, child_ignore, None]
+                         for child, child_ignore in children(relative_path, dir_ignore, record))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+class GitIndexError(Exception):
+    """Raised when a git index cannot be used as a source of file listings."""
+
+def find_git_dir(repo_path):
+    """
+    Locate the git directory of a checkout, following a '.git' file in worktrees.
+
+    :param repo_path: Path to the local repository
+    :return: Path to the git directory, or None if repo_path is not a git checkout
+    """
+    dot_git = os.path.join(repo_path, '.git')
+    if os.path.isdir(dot_git):
+        return dot_git
+    try:
+        with open(dot_git, 'r', encoding='utf-8') as f:
+            line = f.readline().strip()
+    except OSError:
+        return None
+    if not line.startswith('gitdir:'):
+        return None
+    git_dir = line[len('gitdir:'):].strip()
+    return os.path.normpath(os.path.join(repo_path, git_dir))
+
+def _git_common_dir(git_dir):
+    """
+    Return the directory holding config and info/ (shared by all worktrees).
+    """
+    try:
+        with open(os.path.join(git_dir, 'commondir'), 'r', encoding='utf-8') as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        return git_dir
+
+def _git_hash_size(git_dir):
+    """
+    Return the object id size in bytes: 32 for SHA-256 repositories, else 20.
+    """
+    try:
+        with open(os.path.join(_git_common_dir(git_dir), 'config'), 'r', encoding='utf-8') as f:
+            for line in f:
+                key, _, value = line.partition('=')
+                if key.strip().lower() == 'objectformat' and value.strip().lower() == 'sha256':
+                    return 32
+    except OSError:
+        pass
+    return 20
+
+def read_git_index(git_dir):
+    """
+    Read the paths of the tracked files from a git index (versions 2 to 4).
+
+    Submodules (gitlinks) and the directory entries of a sparse index are
+    skipped, as are the extra stages of conflicted paths.
+
+    :param git_dir: Path to the git directory
+    :return: List of tracked paths relative to the repository root, in index order
+    """
+    try:
+        with open(os.path.join(git_dir, 'index'), 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise GitIndexError(f"cannot read index: {e}") from None
+
+    if len(data) < 12 or data[:4] != b'DIRC':
+        raise GitIndexError("not a git index file")
+    version, count = struct.unpack('>II', data[4:12])
+    if version not in (2, 3, 4):
+        raise GitIndexError(f"unsupported index version {version}")
+
+    hash_size = _git_hash_size(git_dir)
+    # ctime, mtime, dev, ino, mode, uid, gid, size, object id, flags
+    header_size = 40 + hash_size + 2
+    mode_offset = 24
+    flags_offset = 40 + hash_size
+
+    paths = []
+    previous = b''
+    offset = 12
+    try:
+        for _ in range(count):
+            mode, = struct.unpack_from('>I', data, offset + mode_offset)
+            flags, = struct.unpack_from('>H', data, offset + flags_offset)
+            name_offset = offset + header_size
+            if version >= 3 and flags & 0x4000:
+                # Extended flags
+                name_offset += 2
+
+            if version == 4:
+                # Path is prefix-compressed against the previous entry: a
+                # varint count of bytes to drop, then a NUL-terminated suffix
+                byte = data[name_offset]
+                name_offset += 1
+                strip = byte & 0x7f
+                while byte & 0x80:
+                    byte = data[name_offset]
+                    name_offset += 1
+                    strip = ((strip + 1) << 7) | (byte & 0x7f)
+                end = data.index(b'\0', name_offset)
+                name = previous[:len(previous) - strip] + data[name_offset:end]
+                offset = end + 1
+            else:
+                end = data.index(b'\0', name_offset)
+                name = data[name_offset:end]
+                # Entries are NUL-padded to a multiple of eight bytes
+                offset += (name_offset - offset + len(name) + 8) & ~7
+            previous = name
+
+            stage = (flags >> 12) & 0x3
+            object_type = mode >> 12
+            if stage > 1 or object_type not in (0o10, 0o12):
+                # Conflict stages, gitlinks (0o16) and sparse directories (0o04)
+                continue
+            paths.append(os.fsdecode(name))
+    except (struct.error, IndexError, ValueError):
+        raise GitIndexError("truncated or corrupt index") from None
+
+    # A split index keeps most entries in a shared index file
+    while offset + 8 <= len(data) - hash_size:
+        signature = data[offset:offset + 4]
+        size, = struct.unpack_from('>I', data, offset + 4)
+        if signature == b'link':
+            raise GitIndexError("split index is not supported")
+        offset += 8 + size
+
+    if os.sep != '/':
+        paths = [path.replace('/', os.sep) for path in paths]
+    return paths
+
+def list_untracked_files(repo_path):
+    """
+    List untracked files that are not ignored, using the git command line.
+
+    :param repo_path: Path to the local repository
+    :return: List of paths relative to the repository root
+    """
+    try:
+        output = subprocess.run(
+            ['git', 'ls-files', '--others', '--exclude-standard', '-z'],
+            cwd=repo_path, capture_output=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise GitIndexError(f"cannot list untracked files: {e}") from None
+    return [os.fsdecode(path).replace('/', os.sep) for path in output.split(b'\0') if path]
+
+def _path_tree_add(tree, path, is_dir=False):
+    """
+    Add a path to a tree of directory path -> (file names, subdirectory names),
+    registering any missing ancestor directories on the way.
+
+    :param tree: Dictionary being built, holding at least the root '.'
+    :param path: File or directory path relative to the repository root
+    :param is_dir: Whether path is a directory
+    """
+    directory = path if is_dir else (os.path.dirname(path) or '.')
+    if directory not in tree:
+        links = []
+        child = directory
+        while child not in tree:
+            tree[child] = ([], set())
+            grandparent, child_name = os.path.split(child)
+            links.append((grandparent or '.', child_name))
+            child = grandparent or '.'
+        for grandparent, child_name in links:
+            tree[grandparent][1].add(child_name)
+    if not is_dir:
+        tree[directory][0].append(os.path.basename(path))
+
+def walk_path_tree(tree, rules=DEFAULT_RULE_ENGINE, read_head=None, stats=None):
+    """
+    Yield directory records for a tree of paths that was listed up front.
+
+    Records come out in the same sorted pre-order, with the same pruning, as
+    walk_repository; probes for pruned directories are answered from the tree.
+
+    :param tree: Dictionary of directory path -> (file names, subdirectory names), see _path_tree_add
+    :param rules: RuleEngine used to detect indicators
+    :param read_head: Callable returning the first RULE_SNIFF_BYTES of a file by relative path
+    :param stats: Optional ScanStats receiving timings and counters
+    :return: Generator of directory records
+    """
+    def make_record(relative_path):
+        files, dirs = tree[relative_path]
+
+        def read_dir_head(name):
+            return read_head(name if relative_path == '.' else os.path.join(relative_path, name))
+
+        def probe(path, is_dir):
+            full_path = path if relative_path == '.' else os.path.join(relative_path, path)
+            if is_dir:
+                return full_path in tree
+            parent, name = os.path.split(full_path)
+            return name in tree.get(parent or '.', ((), ()))[0]
+
+        return analyze_directory(relative_path, sorted(set(files)), sorted(dirs), rules, read_dir_head, probe)
+
+    stack = ['.']
+    while stack:
+        relative_path = stack.pop()
+        if stats is None:
+            record = make_record(relative_path)
+        else:
+            start = time.perf_counter()
+            record = make_record(relative_path)
+            seconds = time.perf_counter() - start
+            stats.add_time('match', seconds)
+            stats.directory_time(relative_path, seconds)
+            stats.count('directories_scanned')
+            stats.count('files_listed', len(record['files']))
+        yield record
+        for name in reversed(record['dirs']):
+            stack.append(name if relative_path == '.' else os.path.join(relative_path, name))
+
+def walk_git_index(repo_path, rules=DEFAULT_RULE_ENGINE, include_untracked=False, stats=None):
+    """
+    Yield directory records built from the git index instead of the filesystem.
+
+    The tracked paths are grouped into directories up front, so nothing is
+    listed or stat'ed; only files needed by content rules are opened. Records
+    come out in the same sorted pre-order, with the same pruning, as
+    walk_repository.
+
+    :param repo_path: Path to the local repository
+    :param rules: RuleEngine used to detect indicators
+    :param include_untracked: Also include untracked files that are not ignored
+    :param stats: Optional ScanStats receiving timings and counters
+    :return: Generator of directory records
+    """
+    if stats is not None:
+        start = time.perf_counter()
+    git_dir = find_git_dir(repo_path)
+    if git_dir is None:
+        raise GitIndexError("not a git checkout")
+    paths = read_git_index(git_dir)
+    if include_untracked:
+        paths.extend(list_untracked_files(repo_path))
+
+    tree = {'.': ([], set())}
+    for path in paths:
+        _path_tree_add(tree, path)
+    if stats is not None:
+        stats.add_time('list', time.perf_counter() - start)
+
+    def read_head(path):
+        try:
+            with open(os.path.join(repo_path, path), 'rb') as f:
+                head = f.read(RULE_SNIFF_BYTES)
+        except OSError:
+            return b''
+        if stats is not None:
+            stats.count('rule_files_read')
+            stats.count('rule_bytes_read', len(head))
+        return head
+
+    yield from walk_path_tree(tree, rules, read_head, stats)
+
+class GitObjectError(Exception):
+    """Raised when objects cannot be read from a repository's object store."""
+
+class GitObjectReader:
+    """
+    A single long-lived `git cat-file --batch` process for reading objects.
+
+    Requests are written from a helper thread while the responses are read,
+    so a whole batch of object ids is pipelined through the one process
+    without either side blocking on a full pipe.
+    """
+
+    def __init__(self, repo_path):
+        try:
+            self._process = subprocess.Popen(
+                ['git', 'cat-file', '--batch'], cwd=repo_path,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise GitObjectError(f"cannot run git cat-file: {e}") from None
+        self.objects_read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._process.wait()
+        self._process.stdout.close()
+
+    def _write(self, specs):
+        try:
+            self._process.stdin.write(b''.join(os.fsencode(spec) + b'\n' for spec in specs))
+            self._process.stdin.flush()
+        except OSError:
+            # git exited; the reader sees end of file
+            pass
+
+    def _read_object(self, limit):
+        stdout = self._process.stdout
+        header = stdout.readline()
+        if not header.endswith(b'\n'):
+            raise GitObjectError("git cat-file exited unexpectedly")
+        fields = header.split()
+        if len(fields) != 3:
+            # '<spec> missing' or '<spec> ambiguous'
+            return None, None, None
+        oid, kind, size = fields[0].decode('ascii'), fields[1].decode('ascii'), int(fields[2])
+        keep = size if limit is None else min(size, limit)
+        data = stdout.read(keep)
+        # Skip the rest of the object and its trailing newline
+        skip = size - keep + 1
+        while skip > 0:
+            chunk = stdout.read(min(skip, DUPLICATE_CHUNK_BYTES))
+            if not chunk:
+                raise GitObjectError("git cat-file exited unexpectedly")
+            skip -= len(chunk)
+        if len(data) != keep:
+            raise GitObjectError("git cat-file exited unexpectedly")
+        self.objects_read += 1
+        return oid, kind, data
+
+    def read_many(self, specs, limit=None):
+        """
+        Read a batch of objects.
+
+        :param specs: Object names understood by git (object ids, 'rev^{tree}', ...)
+        :param limit: Keep at most this many bytes of each object, or None for all of it
+        :return: List of (object id, type, data) tuples in request order, with
+                 (None, None, None) for names that do not resolve
+        """
+        if not specs:
+            return []
+        writer = threading.Thread(target=self._write, args=(specs,))
+        writer.start()
+        try:
+            return [self._read_object(limit) for _ in specs]
+        finally:
+            writer.join()
+
+def _parse_git_tree(data, hash_size):
+    """
+    Parse the entries of a raw tree object.
+
+    :param data: Tree object contents
+    :param hash_size: Object id size in bytes
+    :return: Generator of (mode, name, object id) tuples, mode and name as bytes
+    """
+    offset = 0
+    while offset < len(data):
+        space = data.index(b' ', offset)
+        end = data.index(b'\0', space)
+        yield data[offset:space], data[space + 1:end], data[end + 1:end + 1 + hash_size].hex()
+        offset = end + 1 + hash_size
+
+def walk_git_revision(repo_path, revision, rules=DEFAULT_RULE_ENGINE, preview_bytes=DEFAULT_PREVIEW_BYTES,
+                      preview_budget=DEFAULT_PREVIEW_BUDGET, stats=None):
+    """
+    Yield directory records for a commit's tree instead of the working tree.
+
+    Nothing is checked out: tree objects are read a level at a time, then
+    the blobs needed by content rules and index previews are read in one
+    batch, all through a single GitObjectReader. Records come out in the same
+    sorted pre-order, with the same pruning, as walk_repository, and their
+    index files already carry a preview. Pruned directories are only read
+    as deep as probe rules need. Submodules are skipped, as in the git index.
+
+    :param repo_path: Path to the local repository
+    :param revision: Any revision git understands (commit, tag, branch, 'HEAD~3', ...)
+    :param rules: RuleEngine used to detect indicators
+    :param preview_bytes: Maximum number of bytes read per index file preview
+    :param preview_budget: Maximum number of preview bytes read across the scan
+    :param stats: Optional ScanStats receiving timings and counters
+    :return: Generator of directory records
+    """
+    if not revision or '\n' in revision:
+        raise GitObjectError(f"invalid revision: {revision!r}")
+    if stats is not None:
+        start = time.perf_counter()
+
+    tree = {'.': ([], set())}
+    blobs = {}
+    # Directories that are reported, in addition to the root
+    walked = ['.']
+    found_needles = {}
+    previews = {}
+
+    with GitObjectReader(repo_path) as reader:
+        [(root_oid, _, root_data)] = reader.read_many([revision + '^{tree}'])
+        if root_oid is None:
+            raise GitObjectError(f"unknown revision: {revision}")
+        hash_size = len(root_oid) // 2
+
+        # (directory path, tree contents, levels left to read or None for all)
+        level = [('.', root_data, None)]
+        while level:
+            pending = []
+            for relative_path, data, depth in level:
+                files, dirs = tree[relative_path]
+                for mode, name, oid in _parse_git_tree(data, hash_size):
+                    name = os.fsdecode(name)
+                    path = name if relative_path == '.' else os.path.join(relative_path, name)
+                    if mode == b'40000':
+                        dirs.add(name)
+                        tree[path] = ([], set())
+                        if depth is None and should_descend(name):
+                            walked.append(path)
+                            pending.append((path, oid, None))
+                        elif depth is None and name in rules.probe_index:
+                            pending.append((path, oid, rules.max_depth))
+                        elif depth is not None and depth > 1:
+                            pending.append((path, oid, depth - 1))
+                    elif mode != b'160000':
+                        files.append(name)
+                        if depth is None:
+                            blobs[path] = oid
+            objects = reader.read_many([oid for _, oid, _ in pending])
+            level = [(path, data, depth) for (path, _, depth), (_, _, data) in zip(pending, objects)]
+
+        # Blobs to read, in the walker's order so the preview budget is spent the same way
+        wanted = []
+        for relative_path in sorted(walked, key=_tree_order):
+            files = tree[relative_path][0]
+            prefix = '' if relative_path == '.' else relative_path + os.sep
+            wanted.extend((prefix + name, False) for name in files if name in rules.sniff_needles)
+            wanted.extend((prefix + name, True) for name in INDEX_CANDIDATES if name in files)
+        objects = reader.read_many([blobs[path] for path, _ in wanted], max(RULE_SNIFF_BYTES, preview_bytes))
+
+    remaining = preview_budget
+    budget_warned = False
+    for (path, wants_preview), (_, _, data) in zip(wanted, objects):
+        if data is None:
+            continue
+        if not wants_preview:
+            needles = rules.sniff_needles[os.path.basename(path)]
+            head = data[:RULE_SNIFF_BYTES].lower()
+            found_needles[path] = b'\0'.join(needle for needle in needles if needle in head)
+            if stats is not None:
+                stats.count('rule_files_read')
+                stats.count('rule_bytes_read', len(head))
+            continue
+        if remaining <= 0:
+            previews[path] = ''
+            if not budget_warned:
+                budget_warned = True
+                print("Preview byte budget exhausted; remaining previews are empty", file=sys.stderr)
+            continue
+        budget = min(preview_bytes, remaining)
+        chunk = data[:budget]
+        try:
+            previews[path] = decode_preview(chunk, budget)
+        except PreviewError as e:
+            print(f"Error reading {path} at {revision}: {e}", file=sys.stderr)
+            continue
+        remaining -= len(chunk)
+        if stats is not None:
+            stats.count('previews_read')
+            stats.count('preview_bytes_read', len(chunk))
+
+    if stats is not None:
+        stats.add_time('list', time.perf_counter() - start)
+        stats.count('git_objects_read', reader.objects_read)
+
+    def read_head(path):
+        return found_needles.get(path, b'')
+
+    for record in walk_path_tree(tree, rules, read_head, stats):
+        record['index_files'] = [
+            {**index_file, 'preview': previews[index_file['path']]}
+            for index_file in record['index_files']
+            if index_file['path'] in previews
+        ]
+        yield record
+
+def list_revisions(repo_path, revision_range):
+    """
+    List the first-parent commits of a range, oldest first, using git rev-list.
+
+    :param repo_path: Path to the local repository
+    :param revision_range: Range or revisions as git rev-list takes them ('v1.0..main', 'main~50..main')
+    :return: List of commit ids
+    """
+    try:
+        output = subprocess.run(
+            ['git', 'rev-list', '--reverse', '--first-parent', *revision_range.split(), '--'],
+            cwd=repo_path, capture_output=True, check=True
+        ).stdout
+    except OSError as e:
+        raise GitObjectError(f"cannot run git rev-list: {e}") from None
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise GitObjectError(f"cannot list {revision_range}: {message[0] if message else e}") from None
+    return output.decode('ascii').split()
+
+class SubtreeSummarizer:
+    """
+    Summary counts and indicator labels of git trees, memoized by tree object id.
+
+    A subtree's counts do not depend on where it sits, and its indicators
+    only depend on the last rules.max_depth components of its path (for
+    anchored patterns) and on whether it is below .github (for workflows).
+    Results are therefore keyed by tree id plus that context, and a subtree
+    seen in an earlier commit is never read again: summarizing a commit only
+    reads the trees whose ids changed, which between neighbouring commits
+    are the ones on the paths to changed files.
+    """
+
+    def __init__(self, reader, rules=DEFAULT_RULE_ENGINE, stats=None):
+        self.reader = reader
+        self.rules = rules
+        self.stats = stats
+        self.memo = {}
+        # Parsed listings of pruned trees, for probes
+        self._listings = {}
+        self._hash_size = None
+
+    def _read_tree(self, oid):
+        [(_, _, data)] = self.reader.read_many([oid])
+        if data is None:
+            raise GitObjectError(f"missing tree {oid}")
+        return data
+
+    def _parse(self, data):
+        return {os.fsdecode(name): (mode, oid) for mode, name, oid in _parse_git_tree(data, self._hash_size)}
+
+    def _listing(self, oid):
+        if oid not in self._listings:
+            self._listings[oid] = self._parse(self._read_tree(oid))
+        return self._listings[oid]
+
+    def _key(self, oid, relative_path):
+        parts = () if relative_path == '.' else tuple(relative_path.split(os.sep))
+        depth = self.rules.max_depth
+        return oid, parts[-depth:] if depth else (), '.github' in parts
+
+    def summarize_commit(self, commit):
+        """
+        Summarize the tree of one commit.
+
+        :param commit: Commit id or any revision git understands
+        :return: Dictionary with 'tree', 'committed' (Unix time) and the subtree summary of
+                 the root: 'files', 'directories', 'pruned', 'extensions', 'workflows', 'indicators'
+        """
+        [(oid, kind, data)] = self.reader.read_many([commit + '^{commit}'])
+        if oid is None:
+            raise GitObjectError(f"unknown revision: {commit}")
+        tree_oid = None
+        committed = None
+        for line in data.split(b'\n'):
+            if not line:
+                # End of the commit headers
+                break
+            field, _, value = line.partition(b' ')
+            if field == b'tree' and tree_oid is None:
+                tree_oid = value.decode('ascii')
+            elif field == b'committer':
+                committed = int(value.rsplit(b' ', 2)[1])
+        self._hash_size = len(tree_oid) // 2
+        return {'commit': oid, 'tree': tree_oid, 'committed': committed, **self._summarize(tree_oid, '.')}
+
+    def _summarize(self, oid, relative_path, data=None):
+        key = self._key(oid, relative_path)
+        result = self.memo.get(key)
+        if result is not None:
+            if self.stats is not None:
+                self.stats.count('subtrees_reused')
+            return result
+        entries = self._parse(data if data is not None else self._read_tree(oid))
+        # Submodules (gitlinks) are skipped, as in walk_git_revision
+        files = sorted(name for name, (mode, _) in entries.items() if mode not in (b'40000', b'160000'))
+        dirs = sorted(name for name, (mode, _) in entries.items() if mode == b'40000')
+        prefix = '' if relative_path == '.' else relative_path + os.sep
+
+        # Subtrees not seen before, and the files content rules sniff, are each read in one batch
+        descended = [name for name in dirs if should_descend(name)]
+        unseen = [name for name in descended if self._key(entries[name][1], prefix + name) not in self.memo]
+        contents = dict(zip(unseen, (data for _, _, data in
+                                     self.reader.read_many([entries[name][1] for name in unseen]))))
+        sniffed = [name for name in files if name in self.rules.sniff_needles]
+        heads = dict(zip(sniffed, (data for _, _, data in
+                                   self.reader.read_many([entries[name][1] for name in sniffed], RULE_SNIFF_BYTES))))
+        if self.stats is not None and sniffed:
+            self.stats.count('rule_files_read', len(sniffed))
+
+        def read_head(name):
+            return heads.get(name) or b''
+
+        def probe(path, is_dir):
+            listing = entries
+            parts = path.split(os.sep)
+            for part in parts[:-1]:
+                mode, part_oid = listing.get(part, (None, None))
+                if mode != b'40000':
+                    return False
+                listing = self._listing(part_oid)
+            mode, _ = listing.get(parts[-1], (None, None))
+            if mode is None or mode == b'160000':
+                return False
+            return (mode == b'40000') == is_dir
+
+        record = analyze_directory(relative_path, files, dirs, self.rules, read_head, probe)
+        extensions = {}
+        visible = 0
+        for file in files:
+            # Hidden files are left out of the summary, as in explore_repository
+            if file.startswith('.'):
+                continue
+            visible += 1
+            file_ext = os.path.splitext(file)[1].lower()
+            if file_ext:
+                extensions[file_ext] = extensions.get(file_ext, 0) + 1
+        result = {
+            'files': visible,
+            'directories': len(descended),
+            'pruned': record['pruned'],
+            'extensions': extensions,
+            'workflows': len(record['github_workflows']),
+            'indicators': {
+                category: {hit[label_key] for hit in record[category]}
+                for category, label_key in INDICATOR_CATEGORIES.items()
+            }
+        }
+
+        for name in descended:
+            child = self._summarize(entries[name][1], prefix + name, contents.get(name))
+            result['files'] += child['files']
+            result['directories'] += child['directories']
+            result['pruned'] += child['pruned']
+            result['workflows'] += child['workflows']
+            for file_ext, count in child['extensions'].items():
+                extensions[file_ext] = extensions.get(file_ext, 0) + count
+            for category, labels in child['indicators'].items():
+                result['indicators'][category] |= labels
+
+        self.memo[key] = result
+        if self.stats is not None:
+            self.stats.count('subtrees_scanned')
+        return result
+
+def iter_revision_series(repo_path, revision_range, rules=DEFAULT_RULE_ENGINE, stats=None):
+    """
+    Yield the summary of every first-parent commit in a range, oldest first.
+
+    All commits share one GitObjectReader and one SubtreeSummarizer, so each
+    commit only costs the subtrees that changed since the ones before it.
+
+    :param repo_path: Path to the local repository
+    :param revision_range: Range or revisions as git rev-list takes them
+    :param rules: RuleEngine used to detect indicators
+    :param stats: Optional ScanStats receiving timings and counters
+    :return: Generator of 'revision' events with the summary fields of each commit
+    """
+    commits = list_revisions(repo_path, revision_range)
+    with GitObjectReader(repo_path) as reader:
+        summarizer = SubtreeSummarizer(reader, rules, stats)
+        for commit in commits:
+            if stats is None:
+                result = summarizer.summarize_commit(commit)
+            else:
+                with stats.phase('walk'):
+                    result = summarizer.summarize_commit(commit)
+                stats.count('revisions_scanned')
+            yield {
+                'event': 'revision',
+                'commit': result['commit'],
+                'tree': result['tree'],
+                'committed': result['committed'],
+                'total_files': result['files'],
+                'total_directories': result['directories'],
+                'pruned_directories': result['pruned'],
+                'file_type_breakdown': dict(sorted(result['extensions'].items())),
+                'github_workflows': result['workflows'],
+                'indicators': {category: sorted(labels) for category, labels in result['indicators'].items()}
+            }
+    if stats is not None:
+        stats.count('git_objects_read', reader.objects_read)
+
+def is_archive(path):
+    """
+    Tell whether a path is a zip or (optionally compressed) tar archive.
+    """
+    if not os.path.isfile(path):
+        return False
+    try:
+        return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+    except OSError:
+        return False
+
+def iter_archive_members(archive_path):
+    """
+    Stream the members of a zip or tar archive in archive order.
+
+    Tar archives are read as a stream (compressed or not) and each member is
+    forgotten once it has been yielded, so memory does not grow with the
+    number of members. Zip archives are listed from their central directory.
+
+    :param archive_path: Path to the archive
+    :return: Generator of (name, is_dir, open_member) tuples; open_member is
+             None for entries without contents (directories, links) and
+             otherwise returns a binary stream, valid until the next member
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                is_dir = info.is_dir()
+                yield info.filename, is_dir, None if is_dir else (lambda info=info: zf.open(info))
+        return
+
+    with tarfile.open(archive_path, 'r|*') as tar:
+        for member in tar:
+            if member.isdir():
+                yield member.name, True, None
+            elif member.isfile():
+                yield member.name, False, (lambda member=member: tar.extractfile(member))
+            elif member.issym() or member.islnk():
+                # Listed like os.scandir lists a symlink, without following it
+                yield member.name, False, None
+            # Drop the member so the archive's member list stays empty
+            tar.members = []
+
+def _archive_member_path(name):
+    """
+    Normalize an archive member name to a relative path, or None if it
+    escapes the archive root or names the root itself.
+    """
+    path = posixpath.normpath(name.lstrip('/'))
+    if path == '.' or path == '..' or path.startswith('../'):
+        return None
+    return path.replace('/', os.sep)
+
+def walk_archive(archive_path, rules=DEFAULT_RULE_ENGINE, preview_bytes=DEFAULT_PREVIEW_BYTES,
+                 preview_budget=DEFAULT_PREVIEW_BUDGET, stats=None):
+    """
+    Yield directory records for a zip or tar archive without extracting it.
+
+    The archive is read in a single pass: member names are grouped into
+    directories, and the few members that content rules or index previews
+    need are read from their streams as they go by, within the same per-file
+    and total byte budgets as PreviewReader. Nothing is written to disk. If
+    every member sits under one top-level directory (as in GitHub source
+    archives), that directory is treated as the repository root.
+
+    :param archive_path: Path to the archive
+    :param rules: RuleEngine used to detect indicators
+    :param preview_bytes: Maximum number of bytes read per index file preview
+    :param preview_budget: Maximum number of preview bytes read across the archive
+    :param stats: Optional ScanStats receiving timings and counters
+    :return: Generator of directory records whose index files already carry a preview
+    """
+    if stats is not None:
+        start = time.perf_counter()
+    tree = {'.': ([], set())}
+    # Only the needles found are kept, not the bytes read, so memory does not
+    # grow with the number of sniffed members
+    found_needles = {}
+    previews = {}
+    remaining = preview_budget
+    budget_warned = False
+
+    for name, is_dir, open_member in iter_archive_members(archive_path):
+        path = _archive_member_path(name)
+        if path is None:
+            continue
+        _path_tree_add(tree, path, is_dir)
+        if open_member is None:
+            continue
+        parts = path.split(os.sep)
+        if not all(should_descend(part) for part in parts[:-1]):
+            # Never reported, so never read
+            continue
+        needles = rules.sniff_needles.get(parts[-1])
+        wants_preview = parts[-1] in INDEX_CANDIDATES
+        if wants_preview and remaining <= 0:
+            wants_preview = False
+            previews[path] = ''
+            if not budget_warned:
+                budget_warned = True
+                print("Preview byte budget exhausted; remaining previews are empty", file=sys.stderr)
+        if not needles and not wants_preview:
+            continue
+
+        budget = min(preview_bytes, remaining) if wants_preview else 0
+        try:
+            with open_member() as f:
+                data = f.read(max(RULE_SNIFF_BYTES if needles else 0, budget))
+        except (OSError, tarfile.TarError, zipfile.BadZipFile, RuntimeError) as e:
+            # RuntimeError covers encrypted zip members
+            print(f"Error reading {name} in {archive_path}: {e}", file=sys.stderr)
+            continue
+        if stats is not None:
+            stats.count('rule_bytes_read' if not wants_preview else 'preview_bytes_read', len(data))
+
+        if needles:
+            head = data[:RULE_SNIFF_BYTES].lower()
+            found_needles[path] = b'\0'.join(needle for needle in needles if needle in head)
+        if wants_preview:
+            chunk = data[:budget]
+            remaining -= len(chunk)
+            try:
+                previews[path] = decode_preview(chunk, budget)
+            except PreviewError as e:
+                print(f"Error reading {name} in {archive_path}: {e}", file=sys.stderr)
+            else:
+                if stats is not None:
+                    stats.count('previews_read')
+
+    prefix = ''
+    root_files, root_dirs = tree['.']
+    if not root_files and len(root_dirs) == 1:
+        top = next(iter(root_dirs))
+        prefix = top + os.sep
+        tree = {
+            (path[len(prefix):] if path != top else '.'): entry
+            for path, entry in tree.items()
+            if path == top or path.startswith(prefix)
+        }
+    if stats is not None:
+        stats.add_time('list', time.perf_counter() - start)
+
+    def read_head(path):
+        return found_needles.get(prefix + path, b'')
+
+    for record in walk_path_tree(tree, rules, read_head, stats):
+        record['index_files'] = [
+            {**index_file, 'preview': previews[prefix + index_file['path']]}
+            for index_file in record['index_files']
+            if prefix + index_file['path'] in previews
+        ]
+        yield record
+
+def iter_directory_records(repo_path, jobs=DEFAULT_JOBS, cache=None, rules=DEFAULT_RULE_ENGINE,
+                           source='filesystem', include_untracked=False, ignore=None, stats=None,
+                           preview_bytes=DEFAULT_PREVIEW_BYTES, preview_budget=DEFAULT_PREVIEW_BUDGET,
+                           revision=None):
+    """
+    Yield directory records from the requested source, falling back to the filesystem.
+
+    A repo_path that is a zip or tar archive is always read with walk_archive,
+    and a revision is always read from git with walk_git_revision.
+
+    :param repo_path: Path to the local repository, or to an archive of one
+    :param jobs: Number of worker threads used to list directories
+    :param cache: Optional SnapshotCache (filesystem source only)
+    :param rules: RuleEngine used to detect indicators
+    :param source: 'filesystem' or 'git-index'
+    :param include_untracked: With 'git-index', also include untracked files that are not ignored
+    :param ignore: IgnoreMatcher for the filesystem walk (the git index is already ignore-aware)
+    :param stats: Optional ScanStats receiving timings and counters
+    :param preview_bytes: Per-file preview budget, for sources that read previews during the walk
+    :param preview_budget: Total preview budget, for archives and revisions
+    :param revision: Commit to scan instead of the working tree, or None
+    :return: Generator of directory records
+    """
+    if revision is not None:
+        yield from walk_git_revision(repo_path, revision, rules, preview_bytes, preview_budget, stats)
+        return
+    if is_archive(repo_path):
+        yield from walk_archive(repo_path, rules, preview_bytes, preview_budget, stats)
+        return
+    if source == 'git-index':
+        try:
+            records = walk_git_index(repo_path, rules, include_untracked, stats)
+            # Reading and grouping the index happens on the first record
+            first = next(records)
+        except GitIndexError as e:
+            print(f"Cannot use the git index ({e}); walking the filesystem instead", file=sys.stderr)
+        else:
+            yield first
+            yield from records
+            return
+    yield from walk_repository(repo_path, jobs, cache, rules, ignore, stats)
+
+def explore_repository(repo_path, jobs=DEFAULT_JOBS, cache=None, rules=DEFAULT_RULE_ENGINE,
+                       preview_bytes=DEFAULT_PREVIEW_BYTES, preview_budget=DEFAULT_PREVIEW_BUDGET,
+                       source='filesystem', include_untracked=False, ignore=None, stats=None,
+                       duplicates=False, line_counts=False, revision=None):
+    """
+    Explore the structure of a GitHub repository and generate a comprehensive summary.
+
+    This blocks until the scan is done; from a coroutine, await
+    aexplore_repository instead so the event loop keeps running.
+    
+    :param repo_path: Path to the local repository, or to a zip or tar archive of one
+    :param jobs: Number of worker threads used to list directories and read previews
+    :param cache: Optional SnapshotCache; the caller is responsible for saving it
+    :param rules: RuleEngine used to detect indicators
+    :param preview_bytes: Maximum number of bytes read per index file preview
+    :param preview_budget: Maximum number of preview bytes read across the scan
+    :param source: 'filesystem' to walk the tree, or 'git-index' to list tracked files from .git/index
+    :param include_untracked: With 'git-index', also include untracked files that are not ignored
+    :param ignore: IgnoreMatcher applied while walking the filesystem, or None to ignore nothing
+    :param stats: Optional ScanStats receiving per-phase timings and counters
+    :param duplicates: Also look for files with identical contents (see find_duplicate_files)
+    :param line_counts: Also total lines and bytes per extension into summary['extension_stats']
+    :param revision: Scan this commit's tree through git instead of the working tree (see walk_git_revision)
+    :return: Dictionary containing repository structure and details
+    """
+    repo_info, dir_rows = _new_repo_info(repo_path)
+    for kind, value in iter_scan_results(repo_path, jobs, cache, rules, preview_bytes, preview_budget, source,
+                                         include_untracked, ignore, stats, duplicates, line_counts, revision):
+        _merge_result(repo_info, dir_rows, kind, value)
+    return repo_info
+
+def iter_scan_results(repo_path, jobs=DEFAULT_JOBS, cache=None, rules=DEFAULT_RULE_ENGINE,
+                      preview_bytes=DEFAULT_PREVIEW_BYTES, preview_budget=DEFAULT_PREVIEW_BUDGET,
+                      source='filesystem', include_untracked=False, ignore=None, stats=None,
+                      duplicates=False, line_counts=False, revision=None):
+    """
+    Run a scan and yield its results as they become available.
+
+    This is the pipeline shared by explore_repository and
+    iter_repository_events: directory records come out in pre-order, index
+    file previews are read concurrently and follow in submission order
+    (possibly trailing their directory), and the optional whole-repository
+    passes run once the walk is done.
+
+    :param repo_path: Path to the local repository, or to a zip or tar archive of one
+    :param jobs: Number of worker threads used to list directories and read previews
+    :param cache: Optional SnapshotCache; the caller is responsible for saving it
+    :param rules: RuleEngine used to detect indicators
+    :param preview_bytes: Maximum number of bytes read per index file preview
+    :param preview_budget: Maximum number of preview bytes read across the scan
+    :param source: 'filesystem' to walk the tree, or 'git-index' to list tracked files from .git/index
+    :param include_untracked: With 'git-index', also include untracked files that are not ignored
+    :param ignore: IgnoreMatcher applied while walking the filesystem, or None to ignore nothing
+    :param stats: Optional ScanStats receiving per-phase timings and counters
+    :param duplicates: Also look for files with identical contents (see find_duplicate_files)
+    :param line_counts: Also total lines and bytes per extension (see count_extension_lines)
+    :param revision: Scan this commit's tree through git instead of the working tree (see walk_git_revision)
+    :return: Generator of (kind, value) pairs: ('record', directory record),
+             ('index_preview', index file with 'preview'), ('duplicates', result
+             of find_duplicate_files) and ('extension_stats', result of count_extension_lines)
+    """
+    file_paths = [] if duplicates or line_counts else None
+
+    if stats is not None:
+        start = time.perf_counter()
+    with PreviewReader(repo_path, jobs, preview_bytes, preview_budget, cache, stats) as previews:
+        for record in iter_directory_records(repo_path, jobs, cache, rules, source, include_untracked,
+                                             ignore, stats, preview_bytes, preview_budget, revision):
+            yield 'record', record
+            if file_paths is not None:
+                relative_path = record['path']
+                file_paths.extend(file if relative_path == '.' else os.path.join(relative_path, file)
+                                  for file in record['files'] if not file.startswith('.'))
+            for index_file in record['index_files']:
+                previews.submit(index_file)
+            for index_file in previews.drain():
+                yield 'index_preview', index_file
+
+        for index_file in previews.drain(wait=True):
+            yield 'index_preview', index_file
+
+    if stats is not None:
+        # Includes the time the consumer spent handling results
+        stats.add_time('walk', time.perf_counter() - start)
+
+    if duplicates:
+        yield 'duplicates', find_duplicate_files(repo_path, file_paths, max(1, jobs), cache, stats)
+    if line_counts:
+        yield 'extension_stats', count_extension_lines(repo_path, file_paths, max(1, jobs), stats)
+
+def iter_repository_events(repo_path, jobs=DEFAULT_JOBS, cache=None, rules=DEFAULT_RULE_ENGINE,
+                           preview_bytes=DEFAULT_PREVIEW_BYTES, preview_budget=DEFAULT_PREVIEW_BUDGET,
+                           source='filesystem', include_untracked=False, ignore=None, stats=None,
+                           duplicates=False, line_counts=False, revision=None):
+    """
+    Explore a repository as a stream of scan events instead of one big dictionary.
+
+    Nothing proportional to the size of the repository is kept: each event is
+    yielded as soon as its directory has been scanned, and only the totals
+    are carried to the final 'summary' event. Events are dictionaries with an
+    'event' key of 'dir', 'file', 'workflow', 'indicator', 'index_preview'
+    or 'summary'. Index previews are emitted as soon as they have been read,
+    so they may trail the 'dir' event of their directory. With duplicates or
+    line_counts, the file paths are kept until the walk ends; 'duplicate'
+    events come just before the summary, and per-extension line counts are
+    added to it.
+
+    :param repo_path: Path to the local repository, or to a zip or tar archive of one
+    :param jobs: Number of worker threads used to list directories and read previews
+    :param cache: Optional SnapshotCache; the caller is responsible for saving it
+    :param rules: RuleEngine used to detect indicators
+    :param preview_bytes: Maximum number of bytes read per index file preview
+    :param preview_budget: Maximum number of preview bytes read across the scan
+    :param source: 'filesystem' to walk the tree, or 'git-index' to list tracked files from .git/index
+    :param include_untracked: With 'git-index', also include untracked files that are not ignored
+    :param ignore: IgnoreMatcher applied while walking the filesystem, or None to ignore nothing
+    :param stats: Optional ScanStats receiving per-phase timings and counters
+    :param duplicates: Also look for files with identical contents (see find_duplicate_files)
+    :param line_counts: Also total lines and bytes per extension into the summary's 'extension_stats'
+    :param revision: Scan this commit's tree through git instead of the working tree (see walk_git_revision)
+    :return: Generator of event dictionaries
+    """
+    summary = {
+        "total_files": 0,
+        "total_directories": 0,
+        "pruned_directories": 0,
+        "file_type_breakdown": {}
+    }
+
+    for kind, value in iter_scan_results(repo_path, jobs, cache, rules, preview_bytes, preview_budget, source,
+                                         include_untracked, ignore, stats, duplicates, line_counts, revision):
+        if kind == 'index_preview':
+            yield {'event': 'index_preview', **value}
+        elif kind == 'duplicates':
+            for group in value['groups']:
+                yield {'event': 'duplicate', **group}
+            summary['duplicate_wasted_bytes'] = value['wasted_bytes']
+        elif kind == 'extension_stats':
+            summary['extension_stats'] = value
+        else:
+            record = value
+            relative_path = record['path']
+            if relative_path != '.':
+                summary['total_directories'] += 1
+            summary['pruned_directories'] += record['pruned']
+            yield {'event': 'dir', 'path': relative_path}
+
+            for file in record['files']:
+                # Skip hidden files
+                if file.startswith('.'):
+                    continue
+                summary['total_files'] += 1
+                file_ext = os.path.splitext(file)[1].lower()
+                if file_ext:
+                    summary['file_type_breakdown'][file_ext] = \
+                        summary['file_type_breakdown'].get(file_ext, 0) + 1
+                yield {
+                    'event': 'file',
+                    'path': file if relative_path == '.' else os.path.join(relative_path, file),
+                    'ext': file_ext
+                }
+
+            for workflow in record['github_workflows']:
+                yield {'event': 'workflow', 'path': workflow}
+
+            for category, label_key in INDICATOR_CATEGORIES.items():
+                for hit in record[category]:
+                    yield {
+                        'event': 'indicator',
+                        'category': category,
+                        'label': hit[label_key],
+                        'path': hit['path']
+                    }
+
+    yield {'event': 'summary', 'repository_root': repo_path, **summary}
+
+async def _aiter_in_thread(make_iterator, batch_size=ASYNC_BATCH_EVENTS, max_batches=ASYNC_QUEUE_BATCHES):
     """
-    Explore the structure of a GitHub repository and generate a comprehensive summary.
-    
-    :param repo_path: Path to the local repository
+    Drive a blocking iterator on a worker thread and consume it from the event loop.
+
+    Items are handed over in batches through a queue of at most max_batches,
+    and the worker waits while the queue is full, so a slow consumer holds
+    back the producer instead of letting it buffer everything. Leaving the
+    loop early (break, aclose() or cancellation) stops the producer at its
+    next item, closes the iterator and waits for the thread to finish.
+
+    :param make_iterator: Zero-argument callable returning the iterator; called on the worker thread
+    :param batch_size: Maximum number of items per batch handed to the loop
+    :param max_batches: Maximum number of batches waiting to be consumed
+    :return: Async generator of the iterator's items
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(max_batches)
+    stop = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        iterator = make_iterator()
+        try:
+            batch = []
+            flushed = time.monotonic()
+            for item in iterator:
+                if stop.is_set():
+                    return
+                batch.append(item)
+                # Flush full batches, and partial ones that have waited a
+                # while so a slow walk still streams
+                if len(batch) >= batch_size or time.monotonic() - flushed > ASYNC_FLUSH_SECONDS:
+                    put(batch)
+                    batch = []
+                    flushed = time.monotonic()
+            if batch and not stop.is_set():
+                put(batch)
+        finally:
+            iterator.close()
+            if not stop.is_set():
+                put(None)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                break
+            for item in batch:
+                yield item
+        # Raises whatever stopped the producer
+        await producer
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue, then let it wind down
+        while not producer.done():
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.wait([producer], timeout=0.05)
+
+def aiter_repository_events(repo_path, jobs=DEFAULT_JOBS, cache=None, rules=DEFAULT_RULE_ENGINE,
+                            preview_bytes=DEFAULT_PREVIEW_BYTES, preview_budget=DEFAULT_PREVIEW_BUDGET,
+                            source='filesystem', include_untracked=False, ignore=None, stats=None,
+                            duplicates=False, line_counts=False, revision=None, batch_size=ASYNC_BATCH_EVENTS,
+                            max_batches=ASYNC_QUEUE_BATCHES):
+    """
+    Async iterator over the events of iter_repository_events, for use from an event loop.
+
+    The scan runs on a worker thread of the loop's default executor (with
+    its own bounded pools for listing and reading), so the loop is never
+    blocked. Events arrive in batches with backpressure and the scan stops
+    when the consumer does (see _aiter_in_thread).
+
+    Takes the same arguments as iter_repository_events, plus:
+
+    :param batch_size: Maximum number of events per batch handed to the loop
+    :param max_batches: Maximum number of batches waiting to be consumed
+    :return: Async generator of event dictionaries
+    """
+    def make_iterator():
+        return iter_repository_events(repo_path, jobs, cache, rules, preview_bytes, preview_budget, source,
+                                      include_untracked, ignore, stats, duplicates, line_counts, revision)
+    return _aiter_in_thread(make_iterator, batch_size, max_batches)
+
+async def aexplore_repository(repo_path, jobs=DEFAULT_JOBS, cache=None, rules=DEFAULT_RULE_ENGINE,
+                              preview_bytes=DEFAULT_PREVIEW_BYTES, preview_budget=DEFAULT_PREVIEW_BUDGET,
+                              source='filesystem', include_untracked=False, ignore=None, stats=None,
+                              duplicates=False, line_counts=False, revision=None):
+    """
+    Explore a repository without blocking the event loop (see explore_repository).
+
+    Directory records are produced on a worker thread and merged on the
+    loop, a batch at a time.
+
     :return: Dictionary containing repository structure and details
     """
+    repo_info, dir_rows = _new_repo_info(repo_path)
+
+    def make_iterator():
+        return iter_scan_results(repo_path, jobs, cache, rules, preview_bytes, preview_budget, source,
+                                 include_untracked, ignore, stats, duplicates, line_counts, revision)
+
+    async for kind, value in _aiter_in_thread(make_iterator):
+        _merge_result(repo_info, dir_rows, kind, value)
+    return repo_info
+
+def _new_repo_info(repo_path):
+    """
+    Create the empty result of explore_repository and aexplore_repository.
+
+    :param repo_path: Path to the local repository
+    :return: (repo_info, dir_rows) where dir_rows holds the rows of
+             directories that still have subdirectories to be merged
+    """
+    path_table = PathTable()
     repo_info = {
         "repository_root": repo_path,
-        "directory_tree": {},
-        "file_types": {},
+        "path_table": path_table,
+        # Legacy nested views, built from path_table only if someone reads them
+        "directory_tree": LazyView(path_table.nested),
+        "file_types": LazyView(path_table.file_types),
         "summary": {
             "total_files": 0,
             "total_directories": 0,
+            "pruned_directories": 0,
             "file_type_breakdown": {}
         },
         "github_workflows": [],
-        "index_files": []
-    }
-    
-    # Special configuration tracking
-    special_configs = {
-        'frameworks': [],
-        'package_managers': [],
-        'development_configs': [],
-        'ci_cd_configs': []
-    }
-    
-    # Predefined lists of configuration files and directories to track
-    framework_indicators = {
-        'react': ['react-config.js', 'next.config.js', '.reactrc'],
-        'vue': ['vue.config.js', '.vuerc'],
-        'angular': ['angular.json', '.angular-cli.json'],
-        'svelte': ['svelte.config.js'],
-        'django': ['manage.py', 'settings.py'],
-        'flask': ['app.py', 'config.py'],
-        'express': ['app.js', 'server.js'],
-        'fastapi': ['main.py'],
-        'spring_boot': ['pom.xml', 'mvnw', 'mvnw.cmd', 'build.gradle']
-    }
-    
-    package_manager_indicators = {
-        'npm': ['package.json', 'package-lock.json'],
-        'yarn': ['yarn.lock'],
-        'pip': ['requirements.txt', 'Pipfile'],
-        'poetry': ['pyproject.toml'],
-        'maven': ['pom.xml'],
-        'gradle': ['build.gradle', 'gradle.properties']
-    }
-    
-    development_config_indicators = {
-        'docker': ['Dockerfile', 'docker-compose.yml'],
-        'kubernetes': ['deployment.yaml', 'service.yaml', 'ingress.yaml'],
-        'vscode': ['.vscode'],
-        'jetbrains': ['.idea'],
-        'env_configs': ['.env', '.env.local', '.env.development']
+        "index_files": [],
+        # Special configuration tracking
+        "special_configs": {category: [] for category in INDICATOR_CATEGORIES}
     }
+    return repo_info, {}
+
+def _merge_result(repo_info, dir_rows, kind, value):
+    """
+    Fold one (kind, value) pair from iter_scan_results into repo_info.
+
+    :param repo_info: Dictionary created by _new_repo_info
+    :param dir_rows: Rows of directories whose subdirectories are still to come
+    :param kind: 'record', 'index_preview', 'duplicates' or 'extension_stats'
+    :param value: The result that goes with kind
+    """
+    if kind == 'record':
+        _merge_record(repo_info, repo_info['special_configs'], repo_info['path_table'], dir_rows, value)
+    elif kind == 'index_preview':
+        repo_info['index_files'].append(value)
+    elif kind == 'duplicates':
+        repo_info['duplicates'] = value
+    elif kind == 'extension_stats':
+        repo_info['summary']['extension_stats'] = value
+
+def _merge_record(repo_info, special_configs, path_table, dir_rows, record):
+    """
+    Fold one directory record from the walker into repo_info.
+
+    :param repo_info: Dictionary being built by explore_repository
+    :param special_configs: Indicator hits by category
+    :param path_table: PathTable receiving the directory and its files
+    :param dir_rows: Rows of directories whose subdirectories are still to come
+    :param record: Directory record as returned by scan_directory
+    """
+    # Relative path from repository root
+    relative_path = record['path']
+
+    repo_info['summary']['pruned_directories'] += record['pruned']
+    repo_info['github_workflows'].extend(record['github_workflows'])
+    for config_key in special_configs:
+        special_configs[config_key].extend(record[config_key])
     
-    ci_cd_indicators = {
-        'github_actions': ['.github/workflows'],
-        'travis_ci': ['.travis.yml'],
-        'gitlab_ci': ['.gitlab-ci.yml'],
-        'jenkins': ['Jenkinsfile'],
-        'circleci': ['.circleci/config.yml']
-    }
+    # Track directories; the walk is pre-order, so the parent already has a row
+    if relative_path == '.':
+        dir_row = PathTable.ROOT
+    else:
+        repo_info['summary']['total_directories'] += 1
+        parent_path, dir_name = os.path.split(relative_path)
+        dir_row = path_table.add_directory(dir_rows[parent_path or '.'], dir_name)
+    if record['dirs']:
+        dir_rows[relative_path] = dir_row
     
-    # Walk through the repository
-    for root, dirs, files in os.walk(repo_path):
-        # Relative path from repository root
-        relative_path = os.path.relpath(root, repo_path)
-        
-        # GitHub workflow detection
-        if '.github' in root.split(os.path.sep):
-            for file in files:
-                if file.endswith(('.yml', '.yaml')):
-                    workflow_path = os.path.join(relative_path, file)
-                    repo_info['github_workflows'].append(workflow_path)
-        
-        # Index file detection
-        index_candidates = [
-            'index.md', 'README.md', 'readme.md',  # Markdown files
-            'index.txt', 'readme.txt',  # Text files
-            'index.html', 'readme.html',  # HTML files
-            'index.rst'  # ReStructuredText files
-        ]
-        
-        for index_file in index_candidates:
-            if index_file in files:
-                # Full path to the index file
-                full_path = os.path.join(root, index_file)
-                
-                # Relative path from repository root
-                file_relative_path = os.path.relpath(full_path, repo_path)
-                
-                # Read first 1000 characters of the file
-                try:
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        content = f.read(1000)  # Read first 1000 characters
-                        
-                        repo_info['index_files'].append({
-                            'path': file_relative_path,
-                            'type': os.path.splitext(index_file)[1],
-                            'preview': content.strip()
-                        })
-                except Exception as e:
-                    print(f"Error reading {full_path}: {e}")
+    # Process files
+    for file in record['files']:
+        # Skip hidden files
+        if file.startswith('.'):
+            continue
         
-        # Check for framework indicators
-        for framework, indicators in framework_indicators.items():
-            for indicator in indicators:
-                if indicator in files or indicator in relative_path:
-                    special_configs['frameworks'].append({
-                        'framework': framework,
-                        'path': os.path.join(relative_path, indicator)
-                    })
+        repo_info['summary']['total_files'] += 1
         
-        # Check for package manager indicators
-        for manager, indicators in package_manager_indicators.items():
-            for indicator in indicators:
-                if indicator in files:
-                    special_configs['package_managers'].append({
-                        'manager': manager,
-                        'path': os.path.join(relative_path, indicator)
-                    })
+        # Get file extension
+        file_ext = os.path.splitext(file)[1].lower()
+        if file_ext:
+            repo_info['summary']['file_type_breakdown'][file_ext] = \
+                repo_info['summary']['file_type_breakdown'].get(file_ext, 0) + 1
         
-        # Check for development config indicators
-        for config_type, indicators in development_config_indicators.items():
-            for indicator in indicators:
-                if indicator in files or indicator in relative_path:
-                    special_configs['development_configs'].append({
-                        'type': config_type,
-                        'path': os.path.join(relative_path, indicator)
-                    })
-        
-        # Check for CI/CD config indicators
-        for ci_type, indicators in ci_cd_indicators.items():
-            for indicator in indicators:
-                if indicator in relative_path or any(ind in files for ind in indicator.split('/')):
-                    special_configs['ci_cd_configs'].append({
-                        'type': ci_type,
-                        'path': os.path.join(relative_path, indicator)
-                    })
-        
-        # Skip version control and hidden directories (except .github)
-        dirs[:] = [d for d in dirs if not (d.startswith('.') and d != '.github') and d != 'node_modules']
-        
-        # Track directories
-        if relative_path != '.':
-            repo_info['summary']['total_directories'] += 1
-            
-            # Create nested dictionary for directory structure
-            current_level = repo_info['directory_tree']
-            for part in relative_path.split(os.path.sep):
-                current_level = current_level.setdefault(part, {})
-        
-        # Process files
-        for file in files:
-            # Skip hidden files
-            if file.startswith('.'):
-                continue
-            
-            repo_info['summary']['total_files'] += 1
-            
-            # Get file extension
-            file_ext = os.path.splitext(file)[1].lower()
-            if file_ext:
-                repo_info['file_types'][file] = file_ext
-                repo_info['summary']['file_type_breakdown'][file_ext] = \
-                    repo_info['summary']['file_type_breakdown'].get(file_ext, 0) + 1
-            
-            # Add file to directory structure
-            current_level = repo_info['directory_tree']
-            if relative_path != '.':
-                for part in relative_path.split(os.path.sep):
-                    current_level = current_level[part]
-            current_level[file] = None
-    
-    # Add special configurations to repository info
-    repo_info['special_configs'] = special_configs
-    
-    return repo_info
+        # Add file to directory structure
+        path_table.add_file(dir_row, file, file_ext)
 
-def generate_repository_report(repo_info, output_file='repository_summary.md'):
+def generate_repository_report(repo_info, output_file='repository_summary.md', stats=None):
     """
     Generate a markdown report of the repository structure.
     
     :param repo_info: Dictionary containing repository information
     :param output_file: Path to output markdown file
+    :param stats: Optional ScanStats; the time spent writing is recorded as the
+                  'report' phase and the stats are appended as a final section
     """
+    if stats is not None:
+        start = time.perf_counter()
     with open(output_file, 'w', encoding='utf-8') as f:
         # Repository Overview
         f.write(f"# Repository Structure Overview\n\n")
         f.write(f"**Repository Root:** {repo_info['repository_root']}\n\n")
         f.write(f"## Summary Statistics\n")
         f.write(f"- Total Directories: {repo_info['summary']['total_directories']}\n")
-        f.write(f"- Total Files: {repo_info['summary']['total_files']}\n\n")
+        f.write(f"- Total Files: {repo_info['summary']['total_files']}\n")
+        f.write(f"- Pruned Directories: {repo_info['summary'].get('pruned_directories', 0)}\n\n")
         
         # File Type Breakdown
         f.write(f"## File Type Breakdown\n")
         for ext, count in repo_info['summary']['file_type_breakdown'].items():
             f.write(f"- {ext}: {count} files\n")
+
+        # Lines and Bytes
+        extension_stats = repo_info['summary'].get('extension_stats')
+        if extension_stats is not None:
+            f.write(f"\n## Lines and Bytes by Extension\n")
+            for ext, entry in extension_stats.items():
+                binary = f" ({entry['binary_files']} binary)" if entry['binary_files'] else ""
+                f.write(f"- {ext or '(no extension)'}: {entry['files']} files{binary}, "
+                        f"{entry['lines']} lines, {entry['bytes']} bytes\n")
+            f.write(f"- Total: {sum(entry['lines'] for entry in extension_stats.values())} lines, "
+                    f"{sum(entry['bytes'] for entry in extension_stats.values())} bytes\n")
         
         # Detailed Directory Tree
         f.write(f"\n## Directory Structure\n")
         
-        def write_tree(tree, indent=''):
-            for key, value in tree.items():
-                f.write(f"{indent}- {key}\n")
-                if isinstance(value, dict):
-                    write_tree(value, indent + '  ')
-        
-        write_tree(repo_info['directory_tree'])
+        path_table = repo_info['path_table']
+        for depth, row in path_table.iter_tree():
+            f.write(f"{'  ' * depth}- {path_table.name(row)}\n")
         
         # Detailed File Types
         f.write(f"\n## Detailed File Types\n")
-        for file, ext in repo_info['file_types'].items():
-            f.write(f"- {file}: {ext}\n")
+        for row, path in path_table.iter_paths():
+            ext = path_table.extension(row)
+            if ext:
+                f.write(f"- {path}: {ext}\n")
         
         # GitHub Workflows
         if repo_info.get('github_workflows'):
@@ -261,23 +2895,1199 @@ def generate_repository_report(repo_info, output_file='repository_summary.md'):
                 f.write(f"### {index_file['path']}\n")
                 f.write(f"**File Type:** {index_file['type']}\n\n")
                 f.write(f"**Preview:**\n```\n{index_file['preview']}\n```\n\n")
+
+        # Duplicate Files
+        duplicates = repo_info.get('duplicates')
+        if duplicates is not None:
+            f.write(f"\n## Duplicate Files\n")
+            f.write(f"- Duplicate Groups: {len(duplicates['groups'])}\n")
+            f.write(f"- Wasted Bytes: {duplicates['wasted_bytes']}\n")
+            for group in duplicates['groups']:
+                f.write(f"\n### {len(group['paths'])} files of {group['size']} bytes "
+                        f"({group['wasted_bytes']} bytes wasted)\n")
+                for path in group['paths']:
+                    f.write(f"- {path}\n")
+
+        if stats is not None:
+            stats.add_time('report', time.perf_counter() - start)
+            stats.write_markdown(f)
     
     print(f"Repository summary written to {output_file}")
 
+def write_ndjson_events(events, output_file='-'):
+    """
+    Write scan events as newline-delimited JSON.
+
+    The sink is flushed after every directory (or revision) so downstream
+    tools can start consuming output while the scan is still running.
+
+    :param events: Iterable of event dictionaries, e.g. from iter_repository_events
+    :param output_file: Path to the output file, or '-' for standard output
+    :return: Number of events written
+    """
+    f = sys.stdout if output_file == '-' else open(output_file, 'w', encoding='utf-8')
+    count = 0
+    try:
+        for event in events:
+            if event['event'] in ('dir', 'revision') and count:
+                f.flush()
+            f.write(json.dumps(event, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+        f.flush()
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return count
+
+# inotify event bits (from <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# Events that change a directory listing
+IN_LISTING_CHANGED = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+DEFAULT_DEBOUNCE = 0.5
+DEFAULT_POLL_INTERVAL = 2.0
+
+class InotifyBackend:
+    """
+    Directory watches through Linux inotify, bound with ctypes.
+
+    Events are reported as (directory, mask, name) tuples, with directory
+    relative to the repository root.
+    """
+
+    MASK = IN_LISTING_CHANGED | IN_CLOSE_WRITE | IN_ONLYDIR
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._paths = {}
+        self._wds = {}
+
+    def close(self):
+        os.close(self.fd)
+
+    def add(self, full_path, relative_path):
+        wd = self._add_watch(self.fd, os.fsencode(full_path), self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"cannot watch {full_path}: {os.strerror(errno)}")
+        self._paths[wd] = relative_path
+        self._wds[relative_path] = wd
+
+    def add_file(self, full_path, relative_path):
+        # Covered by IN_CLOSE_WRITE on the directory watch
+        pass
+
+    def remove(self, relative_path):
+        wd = self._wds.pop(relative_path, None)
+        if wd is not None and self._paths.get(wd) == relative_path:
+            del self._paths[wd]
+            self._rm_watch(self.fd, wd)
+
+    def remove_file(self, relative_path):
+        pass
+
+    def read(self, timeout=None):
+        """
+        Wait up to timeout seconds (None for ever) for events.
+
+        :return: List of (directory, mask, name) tuples; a directory of None
+                 with IN_Q_OVERFLOW means events were lost
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, mask, ''))
+                continue
+            relative_path = self._paths.get(wd)
+            if mask & IN_IGNORED:
+                # The watch is gone (directory deleted or watch removed)
+                if relative_path is not None:
+                    del self._paths[wd]
+                    if self._wds.get(relative_path) == wd:
+                        del self._wds[relative_path]
+                continue
+            if relative_path is not None:
+                events.append((relative_path, mask, name))
+        return events
+
+class PollingBackend:
+    """
+    Fallback for InotifyBackend that stats watched paths every interval.
+
+    Directory mtimes catch entries being added, removed or renamed; files
+    whose contents matter are watched individually by (mtime, size). Each
+    check costs one stat per watched path.
+    """
+
+    def __init__(self, interval=DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self._dirs = {}
+        self._files = {}
+
+    def close(self):
+        pass
+
+    def add(self, full_path, relative_path):
+        try:
+            mtime = os.stat(full_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        self._dirs[relative_path] = (full_path, mtime)
+
+    def add_file(self, full_path, relative_path):
+        self._files[relative_path] = (full_path, file_stamp(full_path))
+
+    def remove(self, relative_path):
+        self._dirs.pop(relative_path, None)
+
+    def remove_file(self, relative_path):
+        self._files.pop(relative_path, None)
+
+    def read(self, timeout=None):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        events = []
+        for relative_path, (full_path, mtime) in list(self._dirs.items()):
+            try:
+                current = os.stat(full_path).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                self._dirs[relative_path] = (full_path, current)
+                events.append((relative_path, IN_CREATE if current is not None else IN_DELETE_SELF, ''))
+        for relative_path, (full_path, stamp) in list(self._files.items()):
+            current = file_stamp(full_path)
+            if current != stamp:
+                self._files[relative_path] = (full_path, current)
+                parent, name = os.path.split(relative_path)
+                events.append((parent or '.', IN_CLOSE_WRITE, name))
+        return events
+
+def _tree_order(relative_path):
+    """
+    Sort key putting directory paths in the walker's sorted pre-order.
+    """
+    return () if relative_path == '.' else tuple(relative_path.split(os.sep))
+
+class RepositoryWatcher:
+    """
+    Keep the scan of a repository live as files change.
+
+    The watcher holds one record per directory, as produced by
+    scan_directory. A change only rescans the directories it touched (and
+    the subtrees of directories that appear, or whose .gitignore changed),
+    adjusting the summary counts, indicator hits and previews by the
+    difference between the old and new records. snapshot() assembles a
+    repo_info for generate_repository_report; that step, like writing the
+    report, is linear in the size of the repository.
+    """
+
+    def __init__(self, repo_path, jobs=DEFAULT_JOBS, rules=DEFAULT_RULE_ENGINE, ignore=None,
+                 preview_bytes=DEFAULT_PREVIEW_BYTES, preview_budget=DEFAULT_PREVIEW_BUDGET,
+                 backend=None):
+        self.repo_path = repo_path
+        self.jobs = jobs
+        self.rules = rules
+        self.preview_bytes = preview_bytes
+        self.preview_budget = preview_budget
+        self.backend = backend if backend is not None else PollingBackend()
+        self.records = {}
+        self.ignores = {'.': ignore}
+        self.previews = {}
+        # Directories with workflow, indicator or index file entries
+        self.hit_dirs = set()
+        self.summary = {
+            "total_files": 0,
+            "total_directories": 0,
+            "pruned_directories": 0,
+            "file_type_breakdown": {}
+        }
+
+    def _full_path(self, relative_path):
+        return self.repo_path if relative_path == '.' else os.path.join(self.repo_path, relative_path)
+
+    def _watched_files(self, record):
+        """
+        Files whose contents feed into a record: .gitignore, index files and sniffed rule files.
+        """
+        for name in record['files']:
+            if name == '.gitignore' or name in INDEX_CANDIDATES or name in self.rules.sniff_needles:
+                yield name if record['path'] == '.' else os.path.join(record['path'], name)
+
+    def _ignore_for(self, relative_path):
+        """
+        Return the IgnoreMatcher a directory inherits, as walk_repository would hand it down.
+        """
+        if relative_path in self.ignores:
+            return self.ignores[relative_path]
+        parent = os.path.dirname(relative_path) or '.'
+        ignore = self._ignore_for(parent)
+        gitignore = self.records[parent]['gitignore']
+        if ignore is not None and gitignore is not None:
+            ignore = ignore.extend(parent, gitignore)
+        self.ignores[relative_path] = ignore
+        return ignore
+
+    def _account(self, record, sign):
+        """
+        Add (sign=1) or remove (sign=-1) a record's contribution to the summary.
+        """
+        summary = self.summary
+        if record['path'] != '.':
+            summary['total_directories'] += sign
+        summary['pruned_directories'] += sign * record['pruned']
+        breakdown = summary['file_type_breakdown']
+        for file in record['files']:
+            # Skip hidden files
+            if file.startswith('.'):
+                continue
+            summary['total_files'] += sign
+            file_ext = os.path.splitext(file)[1].lower()
+            if file_ext:
+                breakdown[file_ext] = breakdown.get(file_ext, 0) + sign
+                if not breakdown[file_ext]:
+                    del breakdown[file_ext]
+
+    def _add_record(self, record, previews):
+        relative_path = record['path']
+        self.records[relative_path] = record
+        self._account(record, 1)
+        if record['github_workflows'] or record['index_files'] or any(record[c] for c in INDICATOR_CATEGORIES):
+            self.hit_dirs.add(relative_path)
+        for index_file in record['index_files']:
+            previews.submit(index_file)
+        try:
+            self.backend.add(self._full_path(relative_path), relative_path)
+        except OSError as e:
+            print(f"Warning: {e}", file=sys.stderr)
+        for path in self._watched_files(record):
+            self.backend.add_file(os.path.join(self.repo_path, path), path)
+
+    def _drop_record(self, relative_path):
+        record = self.records.pop(relative_path)
+        self._account(record, -1)
+        self.hit_dirs.discard(relative_path)
+        for index_file in record['index_files']:
+            self.previews.pop(index_file['path'], None)
+        for path in self._watched_files(record):
+            self.backend.remove_file(path)
+        self.backend.remove(relative_path)
+        if relative_path != '.':
+            self.ignores.pop(relative_path, None)
+        return record
+
+    def _add_subtree(self, relative_path, previews):
+        ignore = self._ignore_for(relative_path)
+        for record in walk_repository(self.repo_path, self.jobs, None, self.rules, ignore, start=relative_path):
+            self._add_record(record, previews)
+
+    def _drop_subtree(self, relative_path):
+        stack = [relative_path]
+        while stack:
+            path = stack.pop()
+            if path not in self.records:
+                continue
+            record = self._drop_record(path)
+            stack.extend(name if path == '.' else os.path.join(path, name) for name in record['dirs'])
+
+    def _rescan(self, relative_path, previews):
+        """
+        Rescan one directory, descending only into subdirectories that are new.
+        """
+        old = self.records.get(relative_path)
+        if old is None:
+            return
+        record = scan_directory(self.repo_path, relative_path, None, self.rules, self._ignore_for(relative_path))
+        if record is None:
+            # Gone; its parent's rescan (or this one, for the root) drops it
+            self._drop_subtree(relative_path)
+            return
+        if record['gitignore'] != old['gitignore']:
+            # Every directory below inherits the new rules
+            self._drop_subtree(relative_path)
+            self._add_subtree(relative_path, previews)
+            return
+
+        self._drop_record(relative_path)
+        self._add_record(record, previews)
+        old_dirs = set(old['dirs'])
+        new_dirs = set(record['dirs'])
+        for name in sorted(old_dirs - new_dirs):
+            self._drop_subtree(name if relative_path == '.' else os.path.join(relative_path, name))
+        for name in sorted(new_dirs - old_dirs):
+            self._add_subtree(name if relative_path == '.' else os.path.join(relative_path, name), previews)
+
+    def scan(self):
+        """
+        Run the initial scan and start watching every directory it visited.
+        """
+        with PreviewReader(self.repo_path, self.jobs, self.preview_bytes, self.preview_budget) as previews:
+            self._add_subtree('.', previews)
+            self._store_previews(previews)
+
+    def _store_previews(self, previews):
+        for index_file in previews.drain(wait=True):
+            self.previews[index_file['path']] = index_file
+
+    def apply(self, events):
+        """
+        Bring the records up to date with a batch of watch events.
+
+        :param events: List of (directory, mask, name) tuples from a backend
+        :return: Number of directories rescanned plus previews reread
+        """
+        if any(directory is None for directory, _, _ in events):
+            # Events were lost; start over
+            print("Watch queue overflowed; rescanning the repository", file=sys.stderr)
+            self._drop_subtree('.')
+            self.scan()
+            return len(self.records)
+
+        listings = set()
+        contents = set()
+        for directory, mask, name in events:
+            if mask & IN_LISTING_CHANGED:
+                listings.add(directory)
+            elif mask & IN_CLOSE_WRITE:
+                contents.add((directory, name))
+        for directory, name in contents:
+            if name == '.gitignore' or name in self.rules.sniff_needles:
+                # The record itself depends on the file's contents
+                listings.add(directory)
+
+        changed = 0
+        with PreviewReader(self.repo_path, self.jobs, self.preview_bytes, self.preview_budget) as previews:
+            # Parents first, so a rescanned parent settles which children still exist
+            for directory in sorted(listings, key=_tree_order):
+                if directory in self.records:
+                    self._rescan(directory, previews)
+                    changed += 1
+            for directory, name in contents:
+                record = self.records.get(directory)
+                if directory in listings or record is None or name not in INDEX_CANDIDATES:
+                    continue
+                for index_file in record['index_files']:
+                    if os.path.basename(index_file['path']) == name:
+                        previews.submit({'path': index_file['path'], 'type': index_file['type']})
+                        changed += 1
+            self._store_previews(previews)
+        return changed
+
+    def snapshot(self):
+        """
+        Assemble a repo_info dictionary, as explore_repository returns, from the live records.
+
+        :return: Dictionary containing repository structure and details
+        """
+        path_table = PathTable()
+        repo_info = {
+            "repository_root": self.repo_path,
+            "path_table": path_table,
+            "directory_tree": LazyView(path_table.nested),
+            "file_types": LazyView(path_table.file_types),
+            "summary": {**self.summary, "file_type_breakdown": dict(self.summary['file_type_breakdown'])},
+            "github_workflows": [],
+            "index_files": [],
+            "special_configs": {category: [] for category in INDICATOR_CATEGORIES}
+        }
+
+        dir_rows = {}
+        for relative_path in sorted(self.records, key=_tree_order):
+            record = self.records[relative_path]
+            if relative_path == '.':
+                dir_row = PathTable.ROOT
+            else:
+                parent_path, dir_name = os.path.split(relative_path)
+                dir_row = path_table.add_directory(dir_rows[parent_path or '.'], dir_name)
+            dir_rows[relative_path] = dir_row
+            for file in record['files']:
+                if not file.startswith('.'):
+                    path_table.add_file(dir_row, file, os.path.splitext(file)[1].lower())
+
+        for relative_path in sorted(self.hit_dirs, key=_tree_order):
+            record = self.records[relative_path]
+            repo_info['github_workflows'].extend(record['github_workflows'])
+            for category in INDICATOR_CATEGORIES:
+                repo_info['special_configs'][category].extend(record[category])
+            for index_file in record['index_files']:
+                if index_file['path'] in self.previews:
+                    repo_info['index_files'].append(self.previews[index_file['path']])
+        return repo_info
+
+    def run(self, output_file, debounce=DEFAULT_DEBOUNCE):
+        """
+        Scan, write the report, then rewrite it whenever the repository changes.
+
+        Events are collected until none have arrived for debounce seconds,
+        so a burst of changes (a checkout, a build) costs a single update.
+        Runs until interrupted.
+
+        :param output_file: Path to the markdown report, rewritten on each update
+        :param debounce: Quiet period in seconds before an update is applied
+        """
+        self.scan()
+        generate_repository_report(self.snapshot(), output_file)
+        while True:
+            events = self.backend.read()
+            while events:
+                more = self.backend.read(debounce)
+                if not more:
+                    break
+                events.extend(more)
+            if events and self.apply(events):
+                generate_repository_report(self.snapshot(), output_file)
+
+class ScanDatabase:
+    """
+    Persistent SQLite index of scan results, queryable without rescanning.
+
+    Each repository, keyed by absolute root path, has rows in four indexed
+    tables: entries (files and directories), extensions, indicators (hits
+    and GitHub workflows) and previews. Storing a new scan diffs it against
+    the rows already there and only writes the ones that changed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS repositories (
+            id INTEGER PRIMARY KEY,
+            root TEXT NOT NULL UNIQUE,
+            scanned_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            repo_id INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            parent TEXT NOT NULL,
+            name TEXT NOT NULL,
+            is_dir INTEGER NOT NULL,
+            ext TEXT,
+            PRIMARY KEY (repo_id, path)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS entries_by_name ON entries (repo_id, name);
+        CREATE INDEX IF NOT EXISTS entries_by_ext ON entries (repo_id, ext);
+        CREATE TABLE IF NOT EXISTS extensions (
+            repo_id INTEGER NOT NULL,
+            ext TEXT NOT NULL,
+            files INTEGER NOT NULL,
+            lines INTEGER,
+            bytes INTEGER,
+            PRIMARY KEY (repo_id, ext)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS indicators (
+            repo_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            label TEXT NOT NULL,
+            path TEXT NOT NULL,
+            PRIMARY KEY (repo_id, category, label, path)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS indicators_by_label ON indicators (repo_id, label);
+        CREATE TABLE IF NOT EXISTS previews (
+            repo_id INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            type TEXT NOT NULL,
+            preview TEXT NOT NULL,
+            PRIMARY KEY (repo_id, path)
+        ) WITHOUT ROWID;
+    """
+
+    # Table -> (key columns, value columns), as diffed by _sync
+    TABLES = {
+        'entries': (('path',), ('parent', 'name', 'is_dir', 'ext')),
+        'extensions': (('ext',), ('files', 'lines', 'bytes')),
+        'indicators': (('category', 'label', 'path'), ()),
+        'previews': (('path',), ('type', 'preview'))
+    }
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Batch scans write from several processes; wait for the lock
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def repository_ids(self, roots=None):
+        """
+        Look up repositories by root path.
+
+        :param roots: Repository paths, or None for every repository in the database
+        :return: Dictionary of root -> repository id, for the roots that have been stored
+        """
+        if roots is None:
+            return dict(self.conn.execute('SELECT root, id FROM repositories ORDER BY root'))
+        ids = {}
+        for root in roots:
+            root = os.path.abspath(root)
+            row = self.conn.execute('SELECT id FROM repositories WHERE root = ?', (root,)).fetchone()
+            if row is not None:
+                ids[root] = row[0]
+        return ids
+
+    def store(self, repo_info):
+        """
+        Store a scan, writing only the rows that differ from the previous one.
+
+        :param repo_info: Dictionary returned by explore_repository
+        :return: Dictionary with the number of rows 'inserted', 'updated' and 'deleted'
+        """
+        root = os.path.abspath(repo_info['repository_root'])
+        path_table = repo_info['path_table']
+        summary = repo_info['summary']
+        extension_stats = summary.get('extension_stats', {})
+
+        entries = []
+        for row, path in path_table.iter_paths():
+            entries.append((path, os.path.dirname(path) or '.', path_table.name(row),
+                            int(path_table.is_dir(row)), path_table.extension(row)))
+        extensions = [
+            (ext, count, extension_stats.get(ext, {}).get('lines'), extension_stats.get(ext, {}).get('bytes'))
+            for ext, count in summary['file_type_breakdown'].items()
+        ]
+        # Hits at the root are reported as './name'; store them like entry paths
+        indicators = [('github_workflows', 'github_workflow', os.path.normpath(path))
+                      for path in repo_info['github_workflows']]
+        for category, label_key in INDICATOR_CATEGORIES.items():
+            indicators.extend((category, hit[label_key], os.path.normpath(hit['path']))
+                              for hit in repo_info['special_configs'][category])
+        previews = [(index_file['path'], index_file['type'], index_file['preview'])
+                    for index_file in repo_info['index_files']]
+
+        counts = {'inserted': 0, 'updated': 0, 'deleted': 0}
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO repositories (root, scanned_at) VALUES (?, ?) '
+                'ON CONFLICT (root) DO UPDATE SET scanned_at = excluded.scanned_at',
+                (root, time.time())
+            )
+            repo_id, = self.conn.execute('SELECT id FROM repositories WHERE root = ?', (root,)).fetchone()
+            for table, rows in (('entries', entries), ('extensions', extensions),
+                                ('indicators', indicators), ('previews', previews)):
+                for key, n in self._sync(table, repo_id, rows).items():
+                    counts[key] += n
+        return counts
+
+    def _sync(self, table, repo_id, rows):
+        """
+        Make a repository's rows in a table equal to rows, touching only the differences.
+
+        :param table: Table name, one of TABLES
+        :param repo_id: Repository id
+        :param rows: Tuples of the table's key columns followed by its value columns
+        :return: Dictionary with the number of rows 'inserted', 'updated' and 'deleted'
+        """
+        key_columns, value_columns = self.TABLES[table]
+        columns = key_columns + value_columns
+        width = len(key_columns)
+        existing = {
+            row[:width]: row[width:]
+            for row in self.conn.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE repo_id = ?", (repo_id,))
+        }
+        wanted = {tuple(row[:width]): tuple(row[width:]) for row in rows}
+
+        deleted = [key for key in existing if key not in wanted]
+        inserted = [key + values for key, values in wanted.items() if key not in existing]
+        updated = [key + values for key, values in wanted.items()
+                   if key in existing and existing[key] != values]
+
+        key_match = ' AND '.join(f"{column} = ?" for column in key_columns)
+        self.conn.executemany(f"DELETE FROM {table} WHERE repo_id = ? AND {key_match}",
+                              ((repo_id,) + key for key in deleted))
+        placeholders = ', '.join('?' * (len(columns) + 1))
+        self.conn.executemany(f"INSERT OR REPLACE INTO {table} (repo_id, {', '.join(columns)}) "
+                              f"VALUES ({placeholders})",
+                              ((repo_id,) + row for row in inserted + updated))
+        return {'inserted': len(inserted), 'updated': len(updated), 'deleted': len(deleted)}
+
+    @staticmethod
+    def _under(column, under):
+        """
+        Build an index-friendly condition for paths at or below a directory.
+        """
+        if not under or under == '.':
+            return '', ()
+        under = os.path.normpath(under)
+        # Everything strictly between 'dir/' and 'dir0' ('0' follows '/') is below dir
+        return (f" AND ({column} = ? OR ({column} > ? AND {column} < ?))",
+                (under, under + os.sep, under + chr(ord(os.sep) + 1)))
+
+    def query(self, kind, roots=None, name=None, ext=None, under=None, label=None):
+        """
+        Answer a question from the stored scans.
+
+        :param kind: 'files', 'dirs', 'indicators', 'extensions' or 'previews'
+        :param roots: Repository paths to look in, or None for all of them
+        :param name: 'files': exact file name; 'dirs': directories containing a file of that name
+        :param ext: Extension filter for 'files' (including the dot)
+        :param under: Only report paths at or below this directory
+        :param label: Indicator label (or category) filter for 'indicators'
+        :return: List of (root, row tuple) pairs
+        """
+        results = []
+        for root, repo_id in self.repository_ids(roots).items():
+            params = [repo_id]
+            if kind == 'files':
+                sql = 'SELECT path FROM entries WHERE repo_id = ? AND is_dir = 0'
+                if name is not None:
+                    sql += ' AND name = ?'
+                    params.append(name)
+                if ext is not None:
+                    sql += ' AND ext = ?'
+                    params.append(ext.lower())
+                condition, under_params = self._under('path', under)
+            elif kind == 'dirs':
+                if name is not None:
+                    sql = 'SELECT DISTINCT parent FROM entries WHERE repo_id = ? AND is_dir = 0 AND name = ?'
+                    params.append(name)
+                    condition, under_params = self._under('parent', under)
+                else:
+                    sql = 'SELECT path FROM entries WHERE repo_id = ? AND is_dir = 1'
+                    condition, under_params = self._under('path', under)
+            elif kind == 'indicators':
+                sql = 'SELECT category, label, path FROM indicators WHERE repo_id = ?'
+                if label is not None:
+                    sql += ' AND (label = ? OR category = ?)'
+                    params.extend((label, label))
+                condition, under_params = self._under('path', under)
+            elif kind == 'extensions':
+                sql = 'SELECT ext, files, lines, bytes FROM extensions WHERE repo_id = ?'
+                condition, under_params = '', ()
+            elif kind == 'previews':
+                sql = 'SELECT path, type, preview FROM previews WHERE repo_id = ?'
+                condition, under_params = self._under('path', under)
+            else:
+                raise ValueError(f"unknown query: {kind}")
+            sql += condition + ' ORDER BY 1'
+            params.extend(under_params)
+            results.extend((root, row) for row in self.conn.execute(sql, params))
+        return results
+
+def load_rules(settings):
+    """
+    Build the RuleEngine for the command line's rule packs.
+    """
+    if not settings['rules']:
+        return DEFAULT_RULE_ENGINE
+    packs = [load_rule_pack(path) for path in settings['rules']]
+    return RuleEngine(merge_rule_packs(DEFAULT_RULES, *packs))
+
+def build_ignore_matcher(repo_path, settings):
+    """
+    Build the root IgnoreMatcher for the command line's ignore settings, or None.
+    """
+    if settings['no_gitignore'] and not settings['ignore_file']:
+        return None
+    return IgnoreMatcher.for_repository(repo_path, settings['ignore_file'],
+                                        use_git_rules=not settings['no_gitignore'])
+
+def watch_repository(repo_path, output_file, settings):
+    """
+    Keep a repository's report up to date until interrupted (see RepositoryWatcher).
+
+    :param repo_path: Path to the local repository
+    :param output_file: Path to the markdown report
+    :param settings: Dictionary of command-line settings (see main)
+    """
+    backend = None
+    if not settings['poll']:
+        try:
+            backend = InotifyBackend()
+        except OSError as e:
+            print(f"Cannot use inotify ({e}); polling every {settings['poll_interval']}s instead",
+                  file=sys.stderr)
+    if backend is None:
+        backend = PollingBackend(settings['poll_interval'])
+
+    watcher = RepositoryWatcher(repo_path, max(1, settings['jobs']), load_rules(settings),
+                                build_ignore_matcher(repo_path, settings), settings['preview_bytes'],
+                                settings['preview_budget'], backend)
+    try:
+        watcher.run(output_file, settings['debounce'])
+    finally:
+        backend.close()
+
+def scan_revision_range(repo_path, output_file, settings):
+    """
+    Write the summary time series of a range of commits as NDJSON (see iter_revision_series).
+
+    :param repo_path: Path to the local repository
+    :param output_file: Series path, or '-' for standard output
+    :param settings: Dictionary of command-line settings (see main)
+    :return: Dictionary with the summary counts of the newest commit
+    """
+    if not os.path.isdir(repo_path):
+        raise NotADirectoryError(f"not a directory: {repo_path}")
+    stats = None
+    if settings['stats'] or settings['stats_json']:
+        stats = ScanStats()
+
+    latest = {}
+    def track_latest(events):
+        for event in events:
+            latest.update(event)
+            yield event
+    write_ndjson_events(track_latest(iter_revision_series(repo_path, settings['rev_range'],
+                                                          load_rules(settings), stats)), output_file)
+
+    if stats is not None:
+        stats.write_json(settings['stats_json'] or '-')
+
+    return {
+        'total_directories': latest.get('total_directories', 0),
+        'total_files': latest.get('total_files', 0)
+    }
+
+def scan_repository(repo_path, output_file, settings):
+    """
+    Scan one repository and write its report, as configured by the command line.
+
+    :param repo_path: Path to the local repository, or to a zip or tar archive of one
+    :param output_file: Report path, or '-' for standard output (ndjson only)
+    :param settings: Dictionary of command-line settings (see main)
+    :return: Dictionary with the repository's summary counts
+    """
+    if settings['rev_range']:
+        return scan_revision_range(repo_path, output_file, settings)
+
+    archive = is_archive(repo_path)
+    revision = settings['rev']
+    if not archive and not os.path.isdir(repo_path):
+        raise NotADirectoryError(f"not a directory or archive: {repo_path}")
+    if archive and revision is not None:
+        raise ValueError(f"--rev needs a git repository, not archive {repo_path}")
+    if (archive or revision is not None) and (settings['duplicates'] or settings['line_counts']):
+        # Both read whole files, which archive and revision scans never extract
+        print(f"Warning: --duplicates and --line-counts are skipped for "
+              f"{'archive' if archive else 'revision ' + revision} {repo_path}", file=sys.stderr)
+        settings = {**settings, 'duplicates': False, 'line_counts': False}
+
+    rules = load_rules(settings)
+    # Archives and revisions are read as they are: no ignore rules and no snapshot cache
+    snapshot = archive or revision is not None
+    ignore = None if snapshot else build_ignore_matcher(repo_path, settings)
+
+    cache = None
+    if not snapshot and not settings['no_cache']:
+        cache = SnapshotCache.open(repo_path, settings['cache_dir'], settings['cache_size'], rules.fingerprint)
+
+    stats = None
+    if settings['stats'] or settings['stats_json']:
+        stats = ScanStats()
+
+    scan_options = {
+        'jobs': max(1, settings['jobs']),
+        'cache': cache,
+        'rules': rules,
+        'preview_bytes': settings['preview_bytes'],
+        'preview_budget': settings['preview_budget'],
+        'source': settings['source'],
+        'include_untracked': settings['include_untracked'],
+        'ignore': ignore,
+        'stats': stats,
+        'duplicates': settings['duplicates'],
+        'line_counts': settings['line_counts'],
+        'revision': revision
+    }
+
+    if settings['format'] == 'ndjson':
+        # Stream events straight to the sink without building repo_info
+        summary = {}
+        def track_summary(events):
+            for event in events:
+                if event['event'] == 'summary':
+                    summary.update(event)
+                yield event
+        write_ndjson_events(track_summary(iter_repository_events(repo_path, **scan_options)), output_file)
+    else:
+        # Explore repository
+        repo_info = explore_repository(repo_path, **scan_options)
+
+        # Generate report, with the stats appended if they were asked for
+        if settings['stats'] or stats is None:
+            generate_repository_report(repo_info, output_file, stats)
+        else:
+            with stats.phase('report'):
+                generate_repository_report(repo_info, output_file)
+        summary = repo_info['summary']
+
+        if settings['db']:
+            with ScanDatabase(settings['db']) as db:
+                counts = db.store(repo_info)
+            print(f"Scan index {settings['db']} updated: {counts['inserted']} inserted, "
+                  f"{counts['updated']} updated, {counts['deleted']} deleted")
+
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError as e:
+            print(f"Warning: could not write snapshot cache: {e}", file=sys.stderr)
+
+    if stats is not None:
+        if settings['stats_json']:
+            stats.write_json(settings['stats_json'])
+        elif settings['format'] == 'ndjson':
+            # The report is the event stream; keep the stats out of it
+            stats.write_json('-')
+
+    return {
+        'total_directories': summary.get('total_directories', 0),
+        'total_files': summary.get('total_files', 0)
+    }
+
+def run_scan_job(repo_path, output_file, settings):
+    """
+    Scan one repository for a batch run, turning any failure into a result.
+
+    This is the process pool's unit of work, so one broken repository
+    cannot take the rest of the batch down with it.
+
+    :return: Dictionary with 'repository', 'report', 'ok', 'error', 'elapsed' and summary counts
+    """
+    start = time.perf_counter()
+    result = {'repository': repo_path, 'report': output_file, 'ok': False, 'error': None}
+    try:
+        result.update(scan_repository(repo_path, output_file, settings))
+        result['ok'] = True
+    except BrokenPipeError:
+        raise
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+def report_file_name(repo_path, extension):
+    """
+    Build a unique, filesystem-safe report name for a repository in a batch.
+
+    :param repo_path: Path to the local repository
+    :param extension: Report file extension, including the dot
+    :return: File name such as 'programming-1a2b3c4d.md'
+    """
+    abs_path = os.path.abspath(repo_path)
+    name = re.sub(r'[^A-Za-z0-9._-]+', '-', os.path.basename(abs_path.rstrip(os.sep))) or 'root'
+    digest = hashlib.sha1(abs_path.encode('utf-8', 'surrogateescape')).hexdigest()[:8]
+    return f"{name}-{digest}{extension}"
+
+def write_batch_index(results, output_dir):
+    """
+    Write the combined index of a batch run.
+
+    :param results: List of results from run_scan_job, in input order
+    :param output_dir: Directory holding the per-repository reports
+    :return: Path to the index file
+    """
+    index_file = os.path.join(output_dir, 'index.md')
+    with open(index_file, 'w', encoding='utf-8') as f:
+        f.write(BATCH_INDEX_TITLE + "\n\n")
+        succeeded = sum(1 for result in results if result['ok'])
+        f.write(f"- Repositories: {len(results)}\n")
+        f.write(f"- Succeeded: {succeeded}\n")
+        f.write(f"- Failed: {len(results) - succeeded}\n\n")
+        f.write("| Repository | Status | Directories | Files | Time (s) | Report |\n")
+        f.write("|---|---|---|---|---|---|\n")
+        for result in results:
+            if result['ok']:
+                report = os.path.relpath(result['report'], output_dir)
+                f.write(f"| {result['repository']} | ok | {result['total_directories']} "
+                        f"| {result['total_files']} | {result['elapsed']:.2f} | [{report}]({report}) |\n")
+            else:
+                error = result['error'].replace('|', '\\|')
+                f.write(f"| {result['repository']} | failed: {error} | | | {result['elapsed']:.2f} | |\n")
+    return index_file
+
+def is_batch_index(index_file):
+    """
+    Tell whether a batch run may write index_file: it does not exist yet, or an earlier batch wrote it.
+
+    :param index_file: Path to the index.md of an output directory
+    :return: True if the file is missing or starts with the batch index title
+    """
+    try:
+        with open(index_file, 'r', encoding='utf-8', errors='replace') as f:
+            return f.readline().rstrip('\n') == BATCH_INDEX_TITLE
+    except FileNotFoundError:
+        return True
+    except OSError:
+        return False
+
+def read_repo_list(path):
+    """
+    Read repository paths from a file, one per line; blank lines and '#' comments are skipped.
+    """
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def run_query(args):
+    """
+    Print the answer to a --query from the scan index, one tab-separated row per line.
+
+    :return: Exit status: 0 with results, 1 without
+    """
+    roots = list(args.repo_paths) or None
+    if args.repo_list:
+        roots = (roots or []) + read_repo_list(args.repo_list)
+    with ScanDatabase(args.db) as db:
+        results = db.query(args.query, roots, name=args.name, ext=args.ext, under=args.under, label=args.label)
+        several = roots is None or len(roots) > 1
+    if args.count:
+        print(len(results))
+    else:
+        for root, row in results:
+            columns = [str(value) if value is not None else '' for value in row]
+            if args.query == 'previews':
+                # One line per preview
+                columns[-1] = columns[-1].replace('\n', '\\n')
+            print('\t'.join(([root] if several else []) + columns))
+    return 0 if results else 1
+
 def main():
-    # Specify the path to the cloned repository
-    repo_path = input("Enter the full path to the cloned repository: ")
-    
-    # Validate repository path
-    if not os.path.exists(repo_path):
-        print("Error: Invalid repository path")
-        return
-    
-    # Explore repository
-    repo_info = explore_repository(repo_path)
-    
-    # Generate report
-    generate_repository_report(repo_info)
+    parser = argparse.ArgumentParser(
+        description="Summarize the structure of one or more cloned repositories.",
+        epilog="Exit status: 0 if every repository was scanned, 1 if some failed, "
+               "3 if all failed, 2 for usage errors."
+    )
+    parser.add_argument('repo_paths', nargs='*', metavar='REPO',
+                        help="Paths to cloned repositories, or to .zip/.tar(.gz) archives of them "
+                             "(prompted for one if omitted on a terminal)")
+    parser.add_argument('--repo-list', metavar='FILE',
+                        help="File listing repository paths, one per line ('-' for standard input)")
+    parser.add_argument('--output-dir', metavar='DIR',
+                        help="Write one report per repository plus index.md into DIR "
+                             "(required when scanning more than one repository)")
+    parser.add_argument('-P', '--processes', type=int, default=os.cpu_count() or 1,
+                        help="Number of repositories scanned in parallel (default: number of CPUs)")
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f"Number of threads used to walk each repository (default: {DEFAULT_JOBS})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Rescan every directory instead of reusing the snapshot cache")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"Directory for snapshot caches (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f"Maximum number of cached directories per repository (default: {DEFAULT_CACHE_SIZE})")
+    parser.add_argument('--rules', action='append', default=[], metavar='FILE',
+                        help="JSON rule pack with extra indicators (may be repeated)")
+    parser.add_argument('--preview-bytes', type=int, default=DEFAULT_PREVIEW_BYTES,
+                        help=f"Bytes read per index file preview (default: {DEFAULT_PREVIEW_BYTES})")
+    parser.add_argument('--preview-budget', type=int, default=DEFAULT_PREVIEW_BUDGET,
+                        help=f"Total bytes read for previews across the scan (default: {DEFAULT_PREVIEW_BUDGET})")
+    parser.add_argument('--source', choices=['filesystem', 'git-index'], default='filesystem',
+                        help="Walk the filesystem, or list tracked files from .git/index (falls back to the filesystem)")
+    parser.add_argument('--rev', metavar='REVISION',
+                        help="Scan the tree of a commit (branch, tag, 'HEAD~3', ...) through git "
+                             "instead of the working tree")
+    parser.add_argument('--rev-range', metavar='RANGE',
+                        help="Write the summary of every first-parent commit in RANGE (e.g. v1.0..main) "
+                             "as an NDJSON time series, reusing results for unchanged subtrees")
+    parser.add_argument('--include-untracked', action='store_true',
+                        help="With --source=git-index, also include untracked files that are not ignored")
+    parser.add_argument('--no-gitignore', action='store_true',
+                        help="Do not apply .gitignore and .git/info/exclude rules while walking")
+    parser.add_argument('--ignore-file', action='append', default=[], metavar='FILE',
+                        help="Extra gitignore-style file whose patterns are relative to the repository root "
+                             "(may be repeated)")
+    parser.add_argument('--format', choices=['markdown', 'ndjson'], default='markdown',
+                        help="Write a markdown report, or stream scan events as NDJSON")
+    parser.add_argument('--duplicates', action='store_true',
+                        help="Report files with identical contents and the bytes they waste")
+    parser.add_argument('--line-counts', action='store_true',
+                        help="Count lines and bytes of text files per extension")
+    parser.add_argument('--stats', action='store_true',
+                        help="Collect per-phase timings and counters and append them to the report "
+                             "(written to standard error with ndjson)")
+    parser.add_argument('--stats-json', metavar='FILE',
+                        help="Collect per-phase timings and counters and write them as JSON to FILE "
+                             "('-' for standard error)")
+    parser.add_argument('--watch', action='store_true',
+                        help="After the first report, keep watching the repository and rewrite the "
+                             "report when it changes (until interrupted)")
+    parser.add_argument('--poll', action='store_true',
+                        help="With --watch, poll for changes instead of using inotify")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"Seconds between polls (default: {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f"With --watch, seconds without changes before the report is rewritten "
+                             f"(default: {DEFAULT_DEBOUNCE})")
+    parser.add_argument('--db', metavar='FILE',
+                        help="Store scan results in a SQLite index, updating only rows that changed")
+    parser.add_argument('--query', choices=['files', 'dirs', 'indicators', 'extensions', 'previews'],
+                        help="Answer from the --db index instead of scanning (all stored repositories "
+                             "if none are given)")
+    parser.add_argument('--name', help="With --query files, match this file name; with --query dirs, "
+                                       "list directories containing a file of this name")
+    parser.add_argument('--ext', help="With --query files, match this extension (e.g. .md)")
+    parser.add_argument('--under', metavar='DIR', help="With --query, only report paths below DIR")
+    parser.add_argument('--label', help="With --query indicators, match this label or category")
+    parser.add_argument('--count', action='store_true', help="With --query, print only the number of results")
+    parser.add_argument('-o', '--output',
+                        help="Output file for a single repository "
+                             "(default: repository_summary.md, or standard output for ndjson)")
+    args = parser.parse_args()
+
+    if args.query:
+        if not args.db:
+            parser.error("--query needs --db")
+        if not os.path.exists(args.db):
+            parser.error(f"scan index not found: {args.db}")
+        return run_query(args)
+
+    repo_paths = list(args.repo_paths)
+    if args.repo_list:
+        try:
+            repo_paths.extend(read_repo_list(args.repo_list))
+        except OSError as e:
+            parser.error(f"cannot read repository list: {e}")
+    if not repo_paths:
+        if not sys.stdin.isatty():
+            parser.error("no repositories given")
+        # Specify the path to the cloned repository
+        repo_paths = [input("Enter the full path to the cloned repository: ")]
+
+    # Fail fast on settings shared by every repository
+    for path in args.rules:
+        try:
+            load_rule_pack(path)
+        except (OSError, ValueError) as e:
+            parser.error(f"could not load rule pack: {e}")
+    for path in args.ignore_file:
+        if not os.path.isfile(path):
+            parser.error(f"ignore file not found: {path}")
+
+    if args.db and args.format == 'ndjson':
+        parser.error("--db stores markdown-mode scans; it cannot be combined with --format ndjson")
+    if args.rev_range is not None:
+        if args.rev is not None or args.watch:
+            parser.error("--rev-range cannot be combined with --rev or --watch")
+        if args.db or args.duplicates or args.line_counts:
+            parser.error("--rev-range writes summary counts only; drop --db, --duplicates and --line-counts")
+        # The series is always NDJSON
+        args.format = 'ndjson'
+
+    settings = {
+        key: getattr(args, key)
+        for key in ('jobs', 'no_cache', 'cache_dir', 'cache_size', 'rules', 'preview_bytes',
+                    'preview_budget', 'source', 'include_untracked', 'no_gitignore',
+                    'ignore_file', 'format', 'stats', 'stats_json', 'duplicates',
+                    'line_counts', 'db', 'poll', 'poll_interval', 'debounce', 'rev', 'rev_range')
+    }
+    extension = '.ndjson' if args.format == 'ndjson' else '.md'
+
+    if args.watch:
+        if len(repo_paths) != 1 or args.output_dir is not None:
+            parser.error("--watch takes a single repository")
+        if args.format != 'markdown':
+            parser.error("--watch writes a markdown report")
+        if args.rev is not None:
+            parser.error("--watch follows the working tree; it cannot be combined with --rev")
+        if not os.path.isdir(repo_paths[0]):
+            parser.error(f"not a directory: {repo_paths[0]}")
+        try:
+            watch_repository(repo_paths[0], args.output or 'repository_summary.md', settings)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if len(repo_paths) == 1 and args.output_dir is None:
+        # Single repository: report goes to --output, as it always has
+        default_output = '-' if args.format == 'ndjson' else 'repository_summary.md'
+        try:
+            result = run_scan_job(repo_paths[0], args.output or default_output, settings)
+        except BrokenPipeError:
+            # The consumer stopped reading (e.g. piped into head); silence the
+            # interpreter's own flush of stdout at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 0
+        if not result['ok']:
+            print(f"Error: {repo_paths[0]}: {result['error']}", file=sys.stderr)
+            return 3
+        return 0
+
+    if args.output:
+        parser.error("--output only applies to a single repository; use --output-dir")
+    if args.stats_json:
+        parser.error("--stats-json only applies to a single repository; use --stats")
+    if args.output_dir is None:
+        # Reports and index.md would land in the current directory
+        parser.error("scanning more than one repository needs --output-dir")
+    output_dir = args.output_dir
+    if not is_batch_index(os.path.join(output_dir, 'index.md')):
+        parser.error(f"{os.path.join(output_dir, 'index.md')} exists and was not written by a batch scan; "
+                     f"choose another --output-dir")
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = [(path, os.path.join(output_dir, report_file_name(path, extension)))
+            for path in repo_paths]
+    results = [None] * len(jobs)
+    processes = max(1, min(args.processes, len(jobs)))
+    if processes == 1:
+        for i, (path, output_file) in enumerate(jobs):
+            results[i] = run_scan_job(path, output_file, settings)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(run_scan_job, path, output_file, settings): i
+                       for i, (path, output_file) in enumerate(jobs)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    # The worker process itself died (e.g. killed for memory)
+                    results[i] = {'repository': jobs[i][0], 'report': jobs[i][1], 'ok': False,
+                                  'error': f"{type(e).__name__}: {e}", 'elapsed': 0.0}
+
+    for result in results:
+        if not result['ok']:
+            print(f"Error: {result['repository']}: {result['error']}", file=sys.stderr)
+    index_file = write_batch_index(results, output_dir)
+    print(f"Batch index written to {index_file}")
+
+    failed = sum(1 for result in results if not result['ok'])
+    if failed == 0:
+        return 0
+    return 3 if failed == len(results) else 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -1,4 +1,7 @@
 import os
+import argparse
+
+from docwriter import DocWriter
 
 # Define the base directory
 base_dir = "docs/cpp-intro"
@@ -141,24 +144,30 @@ Functions are reusable blocks of code that perform specific tasks.
 """
 }
 
-def create_files():
-    # Ensure the base directory exists
-    os.makedirs(base_dir, exist_ok=True)
+def pages():
+    # Each section becomes its own folder with an index.md file
+    return {f"{section}/index.md": content.strip() for section, content in sections.items()}
 
-    # Create each section folder and its index.md file
-    for section, content in sections.items():
-        # Define the folder path
-        folder_path = os.path.join(base_dir, section)
-        os.makedirs(folder_path, exist_ok=True)
+def create_files(prune=False):
+    # Files whose contents did not change are left alone, so Jekyll only
+    # rebuilds the pages that did
+    with DocWriter(base_dir) as writer:
+        for page, content in pages().items():
+            # Define the file path
+            file_path = os.path.join(base_dir, *page.split('/'))
 
-        # Define the file path
-        file_path = os.path.join(folder_path, "index.md")
+            # Write the content to the file if it changed
+            if writer.write(file_path, content):
+                print(f"Wrote {file_path}")
 
-        # Write the content to the file
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content.strip())
+        if prune:
+            for file_path in writer.prune():
+                print(f"Removed {file_path}")
 
-        print(f"Created {file_path}")
+        print(f"{base_dir}: {writer.summary()}")
 
 if __name__ == "__main__":
-    create_files()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the C++ intro section pages.")
+    parser.add_argument('--prune', action='store_true',
+                        help="Remove previously generated files that are no longer generated")
+    create_files(prune=parser.parse_args().prune)
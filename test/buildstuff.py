@@ -2,24 +2,21 @@
 
 import os
 import sys
+import argparse
+
+from docwriter import DocWriter
 
 def create_directory(path):
     """Create a directory if it doesn't exist."""
     os.makedirs(path, exist_ok=True)
 
-def write_file(path, content):
-    """Write content to a file."""
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(content)
+def write_file(writer, path, content):
+    """Write content to a file if it changed, returning whether it was written."""
+    return writer.write(path, content)
 
-def generate_cpp_basics_docs():
-    """Generate C++ Basics documentation."""
-    # Base path for documentation
-    base_path = os.path.join('docs', 'cpp-basics')
-    create_directory(base_path)
-
-    # Documentation topics with their content
-    topics = [
+def cpp_basics_topics():
+    """Return the documentation topics with their content."""
+    return [
         {
             'topic_folder': 'index',
             'filename': 'index.md',
@@ -529,19 +526,39 @@ if (x > 0) {
         }
     ]
 
-    # Write each topic to a file in its own subdirectory
-    for topic in topics:
-        topic_path = os.path.join(base_path, topic['topic_folder'])
-        create_directory(topic_path)
-        
-        file_path = os.path.join(topic_path, topic['filename'])
-        write_file(file_path, topic['content'])
+def pages():
+    """Return the generated pages as {path below the base path: content}."""
+    return {
+        f"{topic['topic_folder']}/{topic['filename']}": topic['content']
+        for topic in cpp_basics_topics()
+    }
+
+def generate_cpp_basics_docs(prune=False):
+    """Generate C++ Basics documentation."""
+    # Base path for documentation
+    base_path = os.path.join('docs', 'cpp-basics')
+    create_directory(base_path)
+
+    # Write each topic to a file in its own subdirectory, leaving unchanged
+    # files alone so Jekyll only rebuilds the pages that changed
+    with DocWriter(base_path) as writer:
+        for page, content in pages().items():
+            file_path = os.path.join(base_path, *page.split('/'))
+            write_file(writer, file_path, content)
+
+        if prune:
+            for file_path in writer.prune():
+                print(f"Removed {file_path}")
 
-    print(f"Generated C++ Basics documentation in {base_path}")
+    print(f"Generated C++ Basics documentation in {base_path} ({writer.summary()})")
 
 def main():
     """Main function to run the documentation generator."""
-    generate_cpp_basics_docs()
+    parser = argparse.ArgumentParser(description="Generate the C++ Basics documentation.")
+    parser.add_argument('--prune', action='store_true',
+                        help="Remove previously generated files that are no longer generated")
+    args = parser.parse_args()
+    generate_cpp_basics_docs(prune=args.prune)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import html
+import time
+import argparse
+import posixpath
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+from navigation import read_front_matter, page_url, EXCLUDED_DIRS, PAGE_EXTENSIONS
+from render_site import parse_yaml, build_site
+
+# Pages parsed per worker task; below this many pages the parse runs inline,
+# where it is faster than starting a pool
+FILES_PER_TASK = 256
+
+# Files the theme (jekyll-theme-cayman) adds to the built site; they are not in the source tree
+THEME_FILES = {'/assets/css/style.css'}
+
+# URL schemes that never point into the site
+EXTERNAL_SCHEMES = {'mailto', 'tel', 'javascript', 'data', 'ftp'}
+
+# Tags with a link or anchor attribute: the first such attribute, and the rest
+# of the tag to look for more. Markup shown in code blocks is escaped
+# (&lt;a href="..."&gt;), so it never matches.
+TAG_RE = re.compile(r'<[a-zA-Z][^<>]*?\s(href|src|id|name)\s*=\s*(?:"([^"<>]*)"|\'([^\'<>]*)\')([^<>]*)>')
+ATTR_RE = re.compile(r'\s(href|src|id|name)\s*=\s*(?:"([^"<>]*)"|\'([^\'<>]*)\')')
+MORE_ATTRS_RE = re.compile(r'\s(?:href|src|id|name)\s*=')
+
+def build_index(site_dir):
+    """
+    Build the index of URLs a site serves, without its baseurl.
+
+    Pages are indexed under their pretty URL ('/a/b/'), the same URL without
+    the slash ('/a/b', which GitHub Pages redirects) and the file behind it
+    ('/a/b/index.html'). Static files are indexed by their path.
+
+    :return: Dictionary of URL -> the URL of the page or file it serves
+    """
+    index = {path: path for path in THEME_FILES}
+    static = []
+    # One walk for pages and static files (the walk of navigation.collect_pages)
+    for root, dirs, files in os.walk(site_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(('_', '.')) and d not in EXCLUDED_DIRS]
+        directory = _relative_dir(root, site_dir)
+        for name in files:
+            if name.startswith(('_', '.')):
+                continue
+            path = os.path.join(root, name)
+            relative_path = directory + name
+            front_matter = None
+            if name.endswith(PAGE_EXTENSIONS):
+                try:
+                    front_matter = read_front_matter(path)
+                except (OSError, UnicodeDecodeError):
+                    pass
+            if front_matter is None:
+                # Markdown without front matter is copied as is, like any static file
+                static.append('/' + relative_path)
+                continue
+            url = page_url(relative_path, front_matter)
+            index[url] = url
+            if url.endswith('/'):
+                index[url + 'index.html'] = url
+                if url != '/':
+                    index[url.rstrip('/')] = url
+    for path in static:
+        index.setdefault(path, path)
+    return index
+
+def _relative_dir(root, top):
+    # relpath once per directory rather than once per file; 'a/b/' or ''
+    relative = os.path.relpath(root, top).replace(os.sep, '/')
+    return '' if relative == '.' else relative + '/'
+
+def list_html(html_dir):
+    """List the HTML files of a built site, relative to it with '/' separators."""
+    files = []
+    for root, dirs, names in os.walk(html_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        directory = _relative_dir(root, html_dir)
+        files.extend(directory + name for name in names if name.endswith('.html'))
+    return files
+
+def page_url_of(relative_path):
+    """URL of a built HTML file, e.g. 'a/b/index.html' -> '/a/b/'."""
+    if relative_path == 'index.html':
+        return '/'
+    if relative_path.endswith('/index.html'):
+        return '/' + relative_path[:-len('index.html')]
+    return '/' + relative_path
+
+def parse_pages(html_dir, relative_paths):
+    """
+    Extract the links and anchor ids of some built pages; the unit of work of the pool.
+
+    :return: List of (page URL, [link], set of ids)
+    """
+    results = []
+    for relative_path in relative_paths:
+        with open(os.path.join(html_dir, *relative_path.split('/')), 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        links = []
+        ids = set()
+        for name, double, single, rest in TAG_RE.findall(text):
+            value = double or single
+            if '&' in value:
+                value = html.unescape(value)
+            if name == 'href' or name == 'src':
+                links.append(value)
+            else:
+                ids.add(value)
+            if '=' in rest and MORE_ATTRS_RE.search(rest):
+                for name, double, single in ATTR_RE.findall(rest):
+                    value = html.unescape(double or single)
+                    if name == 'href' or name == 'src':
+                        links.append(value)
+                    else:
+                        ids.add(value)
+        results.append((page_url_of(relative_path), links, ids))
+    return results
+
+def resolve(link, page_url, baseurl, site_host):
+    """
+    Turn a link found on a page into a site URL without the baseurl.
+
+    :return: (URL or None for external links, fragment, problem or None)
+    """
+    parts = urllib.parse.urlsplit(link)
+    if parts.scheme in EXTERNAL_SCHEMES:
+        return None, '', None
+    if parts.scheme or parts.netloc:
+        # Absolute links are internal only when they point at the site itself
+        if parts.netloc != site_host:
+            return None, '', None
+    path = urllib.parse.unquote(parts.path)
+    if not path:
+        if parts.scheme or parts.netloc:
+            # 'https://host' and 'https://host#top' are the host's root
+            path = '/'
+        else:
+            # '#top' and '?q' stay on the page
+            return page_url, parts.fragment, None
+    if not path.startswith('/'):
+        # Relative to the page's directory, as a browser resolves it
+        path = posixpath.join(baseurl + page_url[:page_url.rindex('/') + 1], path)
+    trailing = path.endswith('/') or path.endswith('/.')
+    path = posixpath.normpath(path)
+    if path.startswith('//'):
+        path = path[1:]
+    if trailing and not path.endswith('/'):
+        path += '/'
+    if baseurl and not (path == baseurl or path.startswith(baseurl + '/')):
+        return path, parts.fragment, f"outside the site's baseurl {baseurl}"
+    return path[len(baseurl):] or '/', parts.fragment, None
+
+def _verdict(link, page_url, baseurl, site_host, index, ids):
+    target, fragment, problem = resolve(link, page_url, baseurl, site_host)
+    if target is None:
+        return False, None
+    if problem is None:
+        served = index.get(target)
+        if served is None:
+            problem = 'no such page'
+        elif fragment and served in ids and fragment not in ids[served]:
+            problem = f"no #{fragment} on {served}"
+    return True, problem
+
+def check_links(site_dir, html_dir, jobs=None, files=None):
+    """
+    Check every internal link of a built site against the URLs of its source tree.
+
+    :param site_dir: Jekyll source directory, for the URL index and _config.yml
+    :param html_dir: Built site to parse (render_site.py's or Jekyll's _site)
+    :param jobs: Number of worker processes for parsing (default: number of CPUs; 1 parses inline)
+    :param files: HTML files below html_dir to check (default: all of them)
+    :return: (number of pages, number of internal links, list of (page URL, link, problem))
+    """
+    with open(os.path.join(site_dir, '_config.yml'), 'r', encoding='utf-8') as f:
+        config = parse_yaml(f.read()) or {}
+    baseurl = str(config.get('baseurl') or '').strip('/')
+    baseurl = '/' + baseurl if baseurl else ''
+    site_host = urllib.parse.urlsplit(str(config.get('url') or '')).netloc
+
+    files = sorted(list_html(html_dir) if files is None else files)
+    tasks = [files[i:i + FILES_PER_TASK] for i in range(0, len(files), FILES_PER_TASK)]
+    if (jobs or os.cpu_count()) == 1 or len(tasks) <= 1:
+        index = build_index(site_dir)
+        parsed = [page for task in tasks for page in parse_pages(html_dir, task)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(parse_pages, html_dir, task) for task in tasks]
+            # The index is built while the workers parse
+            index = build_index(site_dir)
+            parsed = [page for future in futures for page in future.result()]
+
+    ids = {url: page_ids for url, _, page_ids in parsed}
+    checked = 0
+    problems = []
+    # Most links (navigation, breadcrumbs) repeat on every page; root-relative
+    # and absolute ones resolve the same everywhere, so check each once.
+    # Verdicts are (internal, problem or None).
+    verdicts = {}
+    for url, links, _ in parsed:
+        for link in links:
+            verdict = verdicts.get(link)
+            if verdict is None:
+                if link.startswith(('/', 'http:', 'https:')):
+                    verdict = verdicts[link] = _verdict(link, url, baseurl, site_host, index, ids)
+                else:
+                    # Relative links depend on the page
+                    key = (url, link)
+                    verdict = verdicts.get(key)
+                    if verdict is None:
+                        verdict = verdicts[key] = _verdict(link, url, baseurl, site_host, index, ids)
+            if verdict[0]:
+                checked += 1
+                if verdict[1]:
+                    problems.append((url, link, verdict[1]))
+    return len(parsed), checked, problems
+
+def main():
+    """Check the internal links of the docs site."""
+    parser = argparse.ArgumentParser(description="Check the internal links of a Jekyll site.")
+    parser.add_argument('site_dir', nargs='?', default='docs',
+                        help="Jekyll source directory (default: docs)")
+    parser.add_argument('--html', metavar='DIR',
+                        help="Check an existing build (e.g. Jekyll's _site) instead of rendering with render_site.py")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs; 1 runs inline)")
+    args = parser.parse_args()
+
+    html_dir = args.html
+    files = None
+    if html_dir is None:
+        # Only the pages of this build: a stale page left in _site is not part of the site
+        html_dir = os.path.join(args.site_dir, '_site')
+        files = build_site(args.site_dir, html_dir, args.jobs)['outputs']
+    start = time.perf_counter()
+    pages, checked, problems = check_links(args.site_dir, html_dir, args.jobs, files)
+    for url, link, problem in problems:
+        print(f"{url}: {link} ({problem})")
+    print(f"{checked} internal links on {pages} pages checked in {time.perf_counter() - start:.3f}s: "
+          f"{len(problems)} unresolved")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
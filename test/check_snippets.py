@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from docwriter import atomic_write
+from markdown_lite import code_blocks
+
+# Stand-in headers for the course library (println, Array, ...)
+STUB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snippet_stubs')
+STUB_HEADER = 'mssm.h'
+
+# Default cache of compile results, in the current directory like the generated docs
+DEFAULT_CACHE = '.snippet-cache.json'
+CACHE_VERSION = 1
+
+# Code block languages that are checked; None is an unlabelled (indented) block,
+# which the site's Prism setup also treats as C++
+CHECKED_LANGUAGES = {'cpp', 'c++', 'cc', 'cxx', None}
+
+# Compiler flags. Warnings that mean the snippet does not do what it says
+# (a value that does not fit its type) are errors.
+DEFAULT_FLAGS = ['-std=c++20', '-Werror=overflow', '-Werror=narrowing', '-Werror=multichar']
+
+# File name given to snippets through #line, replaced by the markdown path when reporting
+SNIPPET_NAME = 'snippet'
+
+# Errors that only mean a fragment uses names from an earlier block on the page
+CONTEXT_ERROR_RE = re.compile(r"error: '[^']+' (?:was not declared in this scope|has not been declared)")
+
+# Compiler output in plain ASCII, so quotes in diagnostics can be matched
+COMPILER_ENV = dict(os.environ, LC_ALL='C')
+
+# Statuses from best to worst
+STATUSES = ('ok', 'warning', 'incomplete', 'error')
+
+def harnesses(code):
+    """
+    Return the ways to wrap a snippet into a translation unit, most likely first.
+
+    Snippets with preprocessor lines or a main() are whole files. Others are
+    usually statements, so they are tried in a function body first and at
+    file scope (function definitions) second.
+
+    :return: List of (harness name, source to compile)
+    """
+    file_scope = f'#line 1 "{SNIPPET_NAME}"\n{code}'
+    if re.search(r'^\s*#|\bmain\s*\(', code, re.MULTILINE):
+        return [('file', file_scope)]
+    body = f'void snippet_body() {{\n#line 1 "{SNIPPET_NAME}"\n{code}\n}}\n'
+    return [('body', body), ('file', file_scope)]
+
+def classify(returncode, diagnostics):
+    """Turn a compiler run into one of STATUSES."""
+    if returncode == 0:
+        return 'warning' if 'warning:' in diagnostics else 'ok'
+    errors = [line for line in diagnostics.splitlines() if ' error: ' in line or line.startswith('error:')]
+    if errors and all(CONTEXT_ERROR_RE.search(line) for line in errors):
+        return 'incomplete'
+    return 'error'
+
+def compiler_id(compiler):
+    """Identify a compiler by its path and version line, for the cache key."""
+    path = shutil.which(compiler)
+    if path is None:
+        raise FileNotFoundError(f"compiler not found: {compiler}")
+    version = subprocess.run([path, '--version'], capture_output=True, text=True).stdout.split('\n', 1)[0]
+    return f"{os.path.realpath(path)} {version}"
+
+def stub_digest():
+    """Digest of the stub headers, so editing them invalidates the cache."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(STUB_DIR)):
+        with open(os.path.join(STUB_DIR, name), 'rb') as f:
+            digest.update(name.encode('utf-8') + b'\0' + f.read())
+    return digest.hexdigest()
+
+def snippet_key(code, environment):
+    """Cache key of a snippet: its code and everything the compile result depends on."""
+    return hashlib.sha256(json.dumps([environment, code]).encode('utf-8')).hexdigest()
+
+def prepare_stubs(include_dir, compiler, flags):
+    """
+    Copy the stub headers into a directory and precompile the main one there.
+
+    Parsing <iostream> and friends is most of the time of checking a snippet;
+    with mssm.h.gch next to mssm.h, g++ loads the parsed headers instead.
+
+    :return: True if the precompiled header was built
+    """
+    for name in os.listdir(STUB_DIR):
+        shutil.copy(os.path.join(STUB_DIR, name), include_dir)
+    header = os.path.join(include_dir, STUB_HEADER)
+    command = [compiler, *flags, '-x', 'c++-header', header, '-o', header + '.gch']
+    return subprocess.run(command, capture_output=True, env=COMPILER_ENV).returncode == 0
+
+def compile_snippet(code, compiler, flags, include_dir=STUB_DIR):
+    """
+    Syntax-check a snippet with each harness until one compiles.
+
+    :param include_dir: Directory holding the stub headers (see prepare_stubs)
+    :return: {'status', 'harness', 'diagnostics'} of the best harness
+    """
+    best = None
+    for name, source in harnesses(code):
+        command = [compiler, *flags, '-fsyntax-only', '-I', include_dir, '-include', STUB_HEADER, '-x', 'c++', '-']
+        run = subprocess.run(command, input=source, capture_output=True, text=True, env=COMPILER_ENV)
+        result = {'status': classify(run.returncode, run.stderr), 'harness': name, 'diagnostics': run.stderr}
+        if best is None or STATUSES.index(result['status']) < STATUSES.index(best['status']):
+            best = result
+        if best['status'] in ('ok', 'warning'):
+            break
+    return best
+
+def find_markdown(paths):
+    """List the markdown files below some files or directories, sorted."""
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            found.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith(('.', '_')))
+            found.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(('.md', '.markdown')))
+    return found
+
+def collect_snippets(files):
+    """
+    Extract the checked code blocks of some markdown files.
+
+    :return: List of {'path', 'line', 'lang', 'code'}
+    """
+    snippets = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        for lang, code, line in code_blocks(text):
+            if (lang.lower() if lang else None) in CHECKED_LANGUAGES and code.strip():
+                snippets.append({'path': path, 'line': line, 'lang': lang, 'code': code})
+    return snippets
+
+def load_cache(path):
+    """Load cached compile results: snippet key -> result."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('results', {})
+
+def check_snippets(snippets, compiler='g++', flags=None, jobs=None, cache_path=DEFAULT_CACHE):
+    """
+    Syntax-check snippets on a pool of compiler processes, reusing cached results.
+
+    Identical snippets are compiled once. The cache is rewritten with the
+    results of this run only, so snippets removed from the docs drop out.
+
+    :return: (list of results in snippet order, number of distinct snippets compiled)
+    """
+    flags = DEFAULT_FLAGS if flags is None else flags
+    environment = [compiler_id(compiler), flags, stub_digest()]
+    cache = load_cache(cache_path) if cache_path else {}
+    keys = [snippet_key(snippet['code'], environment) for snippet in snippets]
+    code_of = dict(zip(keys, (snippet['code'] for snippet in snippets)))
+    missing = [key for key in code_of if key not in cache]
+
+    if missing:
+        with tempfile.TemporaryDirectory(prefix='snippet-stubs-') as include_dir:
+            prepare_stubs(include_dir, compiler, flags)
+            # Threads are enough: the work happens in the compiler processes
+            with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+                compiled = pool.map(lambda key: compile_snippet(code_of[key], compiler, flags, include_dir), missing)
+                for key, result in zip(missing, compiled):
+                    cache[key] = result
+
+    if cache_path:
+        used = {key: cache[key] for key in sorted(code_of)}
+        atomic_write(cache_path, (json.dumps({'version': CACHE_VERSION, 'results': used}, indent=1) + '\n')
+                     .encode('utf-8'))
+    return [cache[key] for key in keys], len(missing)
+
+def report(snippets, results, verbose=False, f=sys.stdout):
+    """
+    Print the diagnostics of failing snippets against their markdown lines.
+
+    :param verbose: Also print snippets that only have warnings or use names from earlier blocks
+    :return: Dictionary of status -> count
+    """
+    counts = dict.fromkeys(STATUSES, 0)
+    for snippet, result in zip(snippets, results):
+        counts[result['status']] += 1
+        if result['status'] == 'ok' or (result['status'] != 'error' and not verbose):
+            continue
+        f.write(f"{snippet['path']}:{snippet['line']}: {result['status']} ({result['harness']} harness)\n")
+        # Point diagnostics at the markdown file instead of the harness
+        offset = snippet['line'] - 1
+        diagnostics = re.sub(rf'^{SNIPPET_NAME}:(?:(\d+):)?',
+                             lambda match: f"{snippet['path']}:" + (
+                                 f"{int(match.group(1)) + offset}:" if match.group(1) else ''),
+                             result['diagnostics'], flags=re.MULTILINE)
+        for line in diagnostics.rstrip('\n').split('\n'):
+            f.write(f"    {line}\n")
+    return counts
+
+def main():
+    """Syntax-check the C++ code blocks of generated lessons."""
+    parser = argparse.ArgumentParser(description="Compile-check the C++ snippets of markdown lessons.")
+    parser.add_argument('paths', nargs='*', default=['docs'],
+                        help="Markdown files or directories to check (default: docs)")
+    parser.add_argument('--compiler', default='g++', help="C++ compiler (default: g++)")
+    parser.add_argument('--flag', action='append', dest='flags', metavar='FLAG',
+                        help=f"Compiler flag, replacing the defaults (may be repeated; default: {' '.join(DEFAULT_FLAGS)})")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of compilers run at once (default: number of CPUs)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE,
+                        help=f"Cache of compile results (default: {DEFAULT_CACHE}; '' disables it)")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="Also show snippets with warnings or names from earlier blocks")
+    args = parser.parse_args()
+
+    snippets = collect_snippets(find_markdown(args.paths))
+    try:
+        results, compiled = check_snippets(snippets, args.compiler, args.flags, args.jobs, args.cache)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    counts = report(snippets, results, args.verbose)
+    print(f"{len(snippets)} snippets ({compiled} compiled, the rest cached or repeated): "
+          + ", ".join(f"{counts[status]} {status}" for status in STATUSES))
+    if counts['error']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
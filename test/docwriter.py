@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import hashlib
+import tempfile
+
+# Name of the manifest kept in each generator's output directory. Jekyll
+# skips dotfiles, so it never ends up in the built site.
+MANIFEST_NAME = '.docwriter-manifest.json'
+MANIFEST_VERSION = 1
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of some bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+def atomic_write(path, data, mode=0o644):
+    """
+    Write bytes to a file through a temporary file and a rename.
+
+    Readers (such as a running `jekyll serve`) see either the old or the
+    new contents, never a half-written file.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class DocWriter:
+    """
+    Write generated files under a root directory, skipping unchanged ones.
+
+    A manifest in the root remembers the hash, size and mtime of every file
+    written. A file whose manifest entry matches both the new contents and
+    the file on disk is left alone without being read, so its mtime does not
+    change and Jekyll does not rebuild it. Files edited since (or missing
+    from the manifest) are read and compared before being rewritten.
+    """
+
+    def __init__(self, root, files=None):
+        """
+        :param root: Directory holding the generated files and the manifest
+        :param files: Manifest entries to start from instead of loading the
+                      manifest, for workers that write part of a root (see state)
+        """
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self.files = self._load_manifest() if files is None else dict(files)
+        self.seen = set()
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+        self._dirty = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest.get('files', {})
+
+    def _key(self, path):
+        key = os.path.relpath(path, self.root)
+        if key == os.pardir or key.startswith(os.pardir + os.sep):
+            raise ValueError(f"{path} is outside {self.root}")
+        return key.replace(os.sep, '/')
+
+    def _is_current(self, path, key, digest):
+        """Tell whether the file on disk already holds contents with this digest."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        entry = self.files.get(key)
+        if entry is not None and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256'] == digest
+        # Not written by us, or changed since: compare the actual contents
+        try:
+            with open(path, 'rb') as f:
+                on_disk = content_hash(f.read())
+        except OSError:
+            return False
+        if on_disk != digest:
+            return False
+        self._record(key, st, digest)
+        return True
+
+    def _record(self, key, st, digest):
+        self.files[key] = {'sha256': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        self._dirty = True
+
+    def write(self, path, content):
+        """
+        Write a text file if its contents changed.
+
+        :param path: File path inside the writer's root
+        :param content: Text to write, encoded as UTF-8
+        :return: True if the file was written, False if it was already up to date
+        """
+        key = self._key(path)
+        self.seen.add(key)
+        data = content.encode('utf-8')
+        digest = content_hash(data)
+        if self._is_current(path, key, digest):
+            self.unchanged += 1
+            return False
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        atomic_write(path, data, mode)
+        self._record(key, os.stat(path), digest)
+        self.written += 1
+        return True
+
+    def keep(self, path):
+        """Count a file as generated by this run without writing it, so prune keeps it."""
+        self.seen.add(self._key(path))
+        self.unchanged += 1
+
+    def entries(self, paths):
+        """Return the manifest entries of some file paths, to hand to a worker's DocWriter."""
+        keys = (self._key(path) for path in paths)
+        return {key: self.files[key] for key in keys if key in self.files}
+
+    def state(self):
+        """
+        Return what this writer did, for a writer that only covered part of a
+        root (e.g. in a worker process) to report back with merge.
+        """
+        return {
+            'files': {key: self.files[key] for key in self.seen if key in self.files},
+            'seen': sorted(self.seen),
+            'written': self.written,
+            'unchanged': self.unchanged,
+            'dirty': self._dirty
+        }
+
+    def merge(self, state):
+        """Fold in the state of a writer that wrote part of this root."""
+        self.files.update(state['files'])
+        self.seen.update(state['seen'])
+        self.written += state['written']
+        self.unchanged += state['unchanged']
+        self._dirty = self._dirty or state['dirty']
+
+    def prune(self):
+        """
+        Remove files written by an earlier run that were not written in this one,
+        along with directories left empty.
+
+        :return: List of removed file paths
+        """
+        removed = []
+        for key in sorted(set(self.files) - self.seen):
+            path = os.path.join(self.root, *key.split('/'))
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            else:
+                removed.append(path)
+            del self.files[key]
+            self._dirty = True
+
+            # Remove emptied parents, stopping at the root
+            parent = os.path.dirname(path)
+            while os.path.abspath(parent) != os.path.abspath(self.root):
+                try:
+                    os.rmdir(parent)
+                except OSError:
+                    break
+                parent = os.path.dirname(parent)
+        self.removed += len(removed)
+        return removed
+
+    def summary(self):
+        """Return the counts of this run as a one-line message."""
+        return f"{self.written} written, {self.unchanged} unchanged, {self.removed} removed"
+
+    def close(self):
+        """Save the manifest if anything in it changed."""
+        if not self._dirty:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        manifest = {'version': MANIFEST_VERSION, 'files': dict(sorted(self.files.items()))}
+        atomic_write(self.manifest_path, (json.dumps(manifest, indent=1) + '\n').encode('utf-8'))
+        self._dirty = False
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import importlib
+import functools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from docwriter import DocWriter
+from navigation import write_navigation
+from render_site import build_site
+from check_links import check_links
+from check_snippets import check_snippets, collect_snippets, compiler_id, find_markdown, report, STATUSES
+
+# Default manifest of courses, next to this script; its paths are relative to
+# the repository root, which is where the script is run from
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs_manifest.json')
+
+# Pages handed to a worker at a time. Small enough to spread one large
+# course over the pool, large enough that scheduling is not the bottleneck.
+PAGES_PER_TASK = 64
+
+class ModuleSource:
+    """Pages from a generator module's pages() function ({path below the output: content})."""
+
+    def __init__(self, course):
+        self.pages = importlib.import_module(course['module']).pages()
+
+    def names(self):
+        return list(self.pages)
+
+    def render(self, name):
+        return self.pages[name]
+
+class DirectorySource:
+    """Pages from a directory of markdown files: each lesson.md becomes lesson/index.md."""
+
+    def __init__(self, course):
+        self.directory = course['directory']
+        self.pattern = course.get('pattern', '*.md')
+
+    def names(self):
+        paths = sorted(glob.glob(os.path.join(self.directory, self.pattern)))
+        return [os.path.splitext(os.path.basename(path))[0] + '/index.md' for path in paths]
+
+    def render(self, name):
+        lesson = name[:-len('/index.md')]
+        suffix = os.path.splitext(self.pattern)[1]
+        with open(os.path.join(self.directory, lesson + suffix), 'r', encoding='utf-8') as f:
+            return f.read()
+
+# Source kinds a course in the manifest can use
+SOURCE_KINDS = {
+    'module': ModuleSource,
+    'directory': DirectorySource
+}
+
+def load_manifest(path):
+    """
+    Load a manifest file: its list of courses, and the Jekyll site they belong to.
+
+    Each course has a 'name', an 'output' directory and a source: either
+    {"module": "boop"} for a generator module, or {"directory": "lessons/cpp"}
+    (with an optional "pattern") for a folder of lesson files. Relative paths
+    are relative to the current directory, as in the generator scripts.
+    An optional top-level "site" names the Jekyll source directory whose
+    navigation data is rebuilt after generating.
+
+    :return: (list of courses, site directory or None)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    courses = manifest.get('courses', [])
+    if not isinstance(courses, list):
+        raise ValueError("'courses' must be a list")
+    for course in courses:
+        if 'name' not in course or 'output' not in course:
+            raise ValueError(f"course without a name or output: {course}")
+        kinds = [kind for kind in SOURCE_KINDS if kind in course]
+        if len(kinds) != 1:
+            raise ValueError(f"course {course['name']} needs exactly one of: {', '.join(SOURCE_KINDS)}")
+        course['kind'] = kinds[0]
+    return courses, manifest.get('site')
+
+@functools.lru_cache(maxsize=None)
+def _load_source(course_key):
+    # Cached per process, so a worker loads each course's source once
+    course = json.loads(course_key)
+    return SOURCE_KINDS[course['kind']](course)
+
+def load_source(course):
+    """Return the (per-process cached) content source of a course."""
+    return _load_source(json.dumps(course, sort_keys=True))
+
+def render_pages(course, names, entries):
+    """
+    Render and write some pages of a course; the unit of work of the pool.
+
+    :param course: Course from the manifest
+    :param names: Page paths below the course output
+    :param entries: Manifest entries of those pages (see DocWriter.entries)
+    :return: (writer state, seconds rendering, seconds writing)
+    """
+    source = load_source(course)
+    writer = DocWriter(course['output'], files=entries)
+    render_seconds = 0.0
+    write_seconds = 0.0
+    for name in names:
+        start = time.perf_counter()
+        content = source.render(name)
+        rendered = time.perf_counter()
+        writer.write(os.path.join(course['output'], *name.split('/')), content)
+        render_seconds += rendered - start
+        write_seconds += time.perf_counter() - rendered
+    return writer.state(), render_seconds, write_seconds
+
+def generate_courses(courses, jobs=None, prune=False):
+    """
+    Generate every course, spreading pages over a process pool.
+
+    :param courses: Courses from load_manifest
+    :param jobs: Number of worker processes (default: number of CPUs); 1 runs inline
+    :param prune: Remove generated files each course no longer produces
+    :return: List of per-course timing dictionaries, in manifest order
+    """
+    results = []
+    writers = []
+    tasks = []
+    for course in courses:
+        start = time.perf_counter()
+        names = load_source(course).names()
+        writer = DocWriter(course['output'])
+        writers.append(writer)
+        results.append({
+            'course': course['name'],
+            'output': course['output'],
+            'pages': len(names),
+            'load_seconds': time.perf_counter() - start,
+            'render_seconds': 0.0,
+            'write_seconds': 0.0,
+            'start': start,
+            'end': start
+        })
+        for i in range(0, len(names), PAGES_PER_TASK):
+            chunk = names[i:i + PAGES_PER_TASK]
+            paths = [os.path.join(course['output'], *name.split('/')) for name in chunk]
+            tasks.append((len(results) - 1, course, chunk, writer.entries(paths)))
+
+    def finish(index, outcome):
+        state, render_seconds, write_seconds = outcome
+        writers[index].merge(state)
+        result = results[index]
+        result['render_seconds'] += render_seconds
+        result['write_seconds'] += write_seconds
+        result['end'] = max(result['end'], time.perf_counter())
+
+    if jobs == 1:
+        for index, course, chunk, entries in tasks:
+            finish(index, render_pages(course, chunk, entries))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(render_pages, course, chunk, entries): index
+                       for index, course, chunk, entries in tasks}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+
+    for writer, result in zip(writers, results):
+        if prune:
+            writer.prune()
+        writer.close()
+        result['written'] = writer.written
+        result['unchanged'] = writer.unchanged
+        result['removed'] = writer.removed
+        # Wall time from listing the course to its last page being written
+        result['seconds'] = result.pop('end') - result.pop('start')
+    return results
+
+def print_timings(results, elapsed, f=sys.stdout):
+    """Print a per-course timing table, slowest course first."""
+    f.write(f"{'course':<24} {'pages':>6} {'written':>8} {'unchanged':>10} {'removed':>8} "
+            f"{'load s':>8} {'render s':>9} {'write s':>8} {'wall s':>8}\n")
+    for result in sorted(results, key=lambda result: result['seconds'], reverse=True):
+        f.write(f"{result['course']:<24} {result['pages']:>6} {result['written']:>8} "
+                f"{result['unchanged']:>10} {result['removed']:>8} {result['load_seconds']:>8.3f} "
+                f"{result['render_seconds']:>9.3f} {result['write_seconds']:>8.3f} {result['seconds']:>8.3f}\n")
+    pages = sum(result['pages'] for result in results)
+    f.write(f"{len(results)} courses, {pages} pages in {elapsed:.2f}s\n")
+
+def main():
+    """Generate every course listed in the manifest."""
+    parser = argparse.ArgumentParser(description="Generate the documentation of every course in a manifest.")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST,
+                        help="JSON manifest of courses (default: docs_manifest.json next to this script)")
+    parser.add_argument('--course', action='append', default=[], metavar='NAME',
+                        help="Only generate this course (may be repeated)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs; 1 runs inline)")
+    parser.add_argument('--prune', action='store_true',
+                        help="Remove previously generated files that are no longer generated")
+    parser.add_argument('--render', action='store_true',
+                        help="Also render the site to HTML with render_site.py (into SITE/_site)")
+    parser.add_argument('--check-links', action='store_true',
+                        help="Render the site and check its internal links with check_links.py")
+    parser.add_argument('--check-snippets', action='store_true',
+                        help="Also syntax-check the C++ code blocks of the generated pages with check_snippets.py")
+    parser.add_argument('--timings-json', metavar='FILE',
+                        help="Also write the per-course timings as JSON to FILE")
+    args = parser.parse_args()
+
+    try:
+        courses, site_dir = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot load manifest: {e}")
+    if args.course:
+        unknown = set(args.course) - {course['name'] for course in courses}
+        if unknown:
+            parser.error(f"unknown course: {', '.join(sorted(unknown))}")
+        courses = [course for course in courses if course['name'] in args.course]
+    if args.check_snippets:
+        # Before generating, rather than failing once the pages are written
+        try:
+            compiler_id('g++')
+        except OSError as e:
+            parser.error(f"--check-snippets: {e}")
+
+    start = time.perf_counter()
+    results = generate_courses(courses, args.jobs, args.prune)
+    if site_dir:
+        # Navigation covers every page of the site, so it is rebuilt after all courses
+        nav_start = time.perf_counter()
+        count, written = write_navigation(site_dir)
+        print(f"Navigation for {count} pages {'written' if written else 'unchanged'} "
+              f"in {time.perf_counter() - nav_start:.3f}s")
+    broken = []
+    if args.render or args.check_links:
+        if not site_dir:
+            parser.error("--render and --check-links need a \"site\" in the manifest")
+        html_dir = os.path.join(site_dir, '_site')
+        site = build_site(site_dir, html_dir, args.jobs, args.prune)
+        print(f"Rendered {site['rendered']} of {site['pages']} pages ({site['cached']} cached, "
+              f"{site['written']} written) in {site['seconds']:.3f}s")
+        if args.check_links:
+            links_start = time.perf_counter()
+            pages, checked, broken = check_links(site_dir, html_dir, args.jobs, site['outputs'])
+            for url, link, problem in broken:
+                print(f"{url}: {link} ({problem})")
+            print(f"Checked {checked} internal links on {pages} pages in "
+                  f"{time.perf_counter() - links_start:.3f}s: {len(broken)} unresolved")
+    print_timings(results, time.perf_counter() - start)
+
+    if args.timings_json:
+        with open(args.timings_json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if args.check_snippets:
+        snippets = collect_snippets(find_markdown([course['output'] for course in courses]))
+        check_start = time.perf_counter()
+        try:
+            results = check_snippets(snippets, jobs=args.jobs)[0]
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+        counts = report(snippets, results)
+        print(f"Checked {len(snippets)} snippets in {time.perf_counter() - check_start:.2f}s: "
+              + ", ".join(f"{counts[status]} {status}" for status in STATUSES))
+        if counts['error']:
+            sys.exit(1)
+    if broken:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+
+import re
+import json
+import html
+import urllib.parse
+
+class LiquidError(Exception):
+    """Raised for templates this renderer cannot parse or evaluate."""
+
+# Markup tokens: {{ output }}, {% tag %}, with optional whitespace control dashes
+TOKEN_RE = re.compile(r'(\{\{-?.*?-?\}\}|\{%-?.*?-?%\})', re.DOTALL)
+
+# Tokens inside a tag or output: strings, numbers, comparison operators, names, punctuation
+EXPRESSION_RE = re.compile(r'''
+    \s*(?:
+        (?P<string>"[^"]*"|'[^']*')
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<op>==|!=|<>|<=|>=|<|>)
+      | (?P<name>[\w-]+\??)
+      | (?P<punct>\.\.|[.\[\]|:,()=])
+    )''', re.VERBOSE)
+
+# Literal names that are not variables
+LITERALS = {'true': True, 'false': False, 'nil': None, 'null': None}
+
+class Empty:
+    """The 'empty' and 'blank' keywords, equal to empty strings, lists and hashes."""
+
+    def __eq__(self, other):
+        return other == '' or other == [] or other == {} or (isinstance(other, Empty))
+
+    def __hash__(self):
+        return 0
+
+EMPTY = Empty()
+
+def ruby_split(text, pattern):
+    """Split like Ruby's String#split: no trailing empty fields, whitespace runs for ' '."""
+    if pattern == ' ':
+        return text.split()
+    parts = list(text) if pattern == '' else text.split(pattern)
+    while parts and parts[-1] == '':
+        parts.pop()
+    return parts
+
+def to_liquid_string(value):
+    """Render a value the way Liquid outputs it."""
+    if value is None:
+        return ''
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, (list, tuple)):
+        return ''.join(to_liquid_string(item) for item in value)
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+def is_truthy(value):
+    """Liquid truthiness: only nil and false are false."""
+    return value is not None and value is not False
+
+def _is_blank(value):
+    return value is None or value is False or value == '' or value == [] or value == {} or (
+        hasattr(value, 'keys') and not list(value.keys()))
+
+def lookup(value, key):
+    """
+    Read a key or index from a value, with Liquid's size, first and last.
+    Objects with a get method (such as tracked data views) are read through it.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, str)):
+        if isinstance(key, int):
+            try:
+                return value[key]
+            except IndexError:
+                return None
+        if key == 'size':
+            return len(value)
+        if key == 'first':
+            return value[0] if value else None
+        if key == 'last':
+            return value[-1] if value else None
+        return None
+    if hasattr(value, 'get'):
+        found = value.get(key)
+        if found is None and key == 'size' and hasattr(value, 'keys'):
+            return len(list(value.keys()))
+        return found
+    return None
+
+def _compare(left, op, right):
+    if op == '==':
+        return left == right if not isinstance(right, Empty) else right == left
+    if op in ('!=', '<>'):
+        return not _compare(left, '==', right)
+    if op == 'contains':
+        if isinstance(left, str):
+            return isinstance(right, str) and right in left
+        if isinstance(left, (list, tuple)):
+            return right in left
+        if hasattr(left, 'keys'):
+            return right in left.keys()
+        return False
+    try:
+        if op == '<':
+            return left < right
+        if op == '>':
+            return left > right
+        if op == '<=':
+            return left <= right
+        if op == '>=':
+            return left >= right
+    except TypeError:
+        raise LiquidError(f"cannot compare {left!r} with {right!r}") from None
+    raise LiquidError(f"unknown operator {op}")
+
+# Filters, by name. Each takes the input and the filter's arguments. Jekyll's
+# filters (relative_url, sort with nils first, pop, ...) follow Jekyll.
+
+def _filter_sort(items, prop=None, nils='first'):
+    if items is None:
+        return []
+    items = list(items.values()) if hasattr(items, 'values') and not isinstance(items, (list, tuple)) else list(items)
+    key_of = (lambda item: item) if prop is None else (lambda item: lookup(item, prop))
+    present = [item for item in items if key_of(item) is not None]
+    missing = [item for item in items if key_of(item) is None]
+    try:
+        present.sort(key=key_of)
+    except TypeError:
+        present.sort(key=lambda item: str(key_of(item)))
+    return missing + present if nils == 'first' else present + missing
+
+def _relative_url(site, value):
+    value = to_liquid_string(value)
+    if urllib.parse.urlsplit(value).scheme:
+        return value
+    baseurl = to_liquid_string(lookup(site, 'baseurl')).rstrip('/')
+    path = value if value.startswith('/') else '/' + value
+    if baseurl:
+        return (baseurl if baseurl.startswith('/') else '/' + baseurl) + path
+    return path
+
+def _absolute_url(site, value):
+    relative = _relative_url(site, value)
+    if urllib.parse.urlsplit(relative).scheme:
+        return relative
+    return to_liquid_string(lookup(site, 'url')).rstrip('/') + relative
+
+FILTERS = {
+    'append': lambda value, suffix: to_liquid_string(value) + to_liquid_string(suffix),
+    'prepend': lambda value, prefix: to_liquid_string(prefix) + to_liquid_string(value),
+    'split': lambda value, pattern: ruby_split(to_liquid_string(value), to_liquid_string(pattern)),
+    'join': lambda value, glue=' ': (to_liquid_string(glue).join(to_liquid_string(item) for item in value)
+                                     if isinstance(value, (list, tuple)) else to_liquid_string(value)),
+    'size': lambda value: len(value) if isinstance(value, (list, tuple, str)) else (
+        len(list(value.keys())) if hasattr(value, 'keys') else 0),
+    'first': lambda value: lookup(value, 'first'),
+    'last': lambda value: lookup(value, 'last'),
+    'pop': lambda value, n=1: list(value)[:-int(n)] if isinstance(value, (list, tuple)) and int(n) else value,
+    'push': lambda value, item: list(value) + [item] if isinstance(value, (list, tuple)) else value,
+    'shift': lambda value, n=1: list(value)[int(n):] if isinstance(value, (list, tuple)) else value,
+    'unshift': lambda value, item: [item] + list(value) if isinstance(value, (list, tuple)) else value,
+    'reverse': lambda value: list(reversed(value)) if isinstance(value, (list, tuple)) else value,
+    'uniq': lambda value: list(dict.fromkeys(value)) if isinstance(value, (list, tuple)) else value,
+    'map': lambda value, prop: [lookup(item, prop) for item in value] if isinstance(value, (list, tuple)) else [],
+    'where': lambda value, prop, target: [item for item in value or [] if to_liquid_string(lookup(item, prop))
+                                          == to_liquid_string(target)],
+    'sort': _filter_sort,
+    'default': lambda value, fallback='': fallback if _is_blank(value) else value,
+    'downcase': lambda value: to_liquid_string(value).lower(),
+    'upcase': lambda value: to_liquid_string(value).upper(),
+    'capitalize': lambda value: to_liquid_string(value).capitalize(),
+    'strip': lambda value: to_liquid_string(value).strip(),
+    'lstrip': lambda value: to_liquid_string(value).lstrip(),
+    'rstrip': lambda value: to_liquid_string(value).rstrip(),
+    'replace': lambda value, old, new='': to_liquid_string(value).replace(to_liquid_string(old), to_liquid_string(new)),
+    'replace_first': lambda value, old, new='': to_liquid_string(value).replace(
+        to_liquid_string(old), to_liquid_string(new), 1),
+    'remove': lambda value, old: to_liquid_string(value).replace(to_liquid_string(old), ''),
+    'escape': lambda value: html.escape(to_liquid_string(value)) if value is not None else None,
+    'xml_escape': lambda value: html.escape(to_liquid_string(value)),
+    'strip_html': lambda value: re.sub(r'<[^>]*>', '', to_liquid_string(value)),
+    'uri_escape': lambda value: urllib.parse.quote(to_liquid_string(value), safe="!#$%&'()*+,/:;=?@[]~"),
+    'url_encode': lambda value: urllib.parse.quote_plus(to_liquid_string(value)),
+    'jsonify': lambda value: json.dumps(value, ensure_ascii=False, separators=(',', ':')),
+    'plus': lambda value, n: (value or 0) + n,
+    'minus': lambda value, n: (value or 0) - n,
+}
+
+# Filters that need the site (registered under the same names in Jekyll)
+SITE_FILTERS = {
+    'relative_url': _relative_url,
+    'absolute_url': _absolute_url,
+}
+
+class Expression:
+    """A variable or literal followed by filters, parsed once and evaluated per render."""
+
+    def __init__(self, source):
+        tokens = [(kind, text) for kind, text in _tokenize(source)]
+        self.source = source
+        self.operand, position = _parse_operand(tokens, 0, source)
+        self.filters = []
+        while position < len(tokens):
+            if tokens[position] != ('punct', '|'):
+                raise LiquidError(f"unexpected {tokens[position][1]!r} in {source!r}")
+            position += 1
+            if position >= len(tokens) or tokens[position][0] != 'name':
+                raise LiquidError(f"missing filter name in {source!r}")
+            name = tokens[position][1]
+            position += 1
+            args = []
+            if position < len(tokens) and tokens[position] == ('punct', ':'):
+                position += 1
+                while True:
+                    arg, position = _parse_operand(tokens, position, source)
+                    args.append(arg)
+                    if position < len(tokens) and tokens[position] == ('punct', ','):
+                        position += 1
+                        continue
+                    break
+            self.filters.append((name, args))
+
+    def evaluate(self, context):
+        value = context.resolve(self.operand)
+        for name, args in self.filters:
+            values = [context.resolve(arg) for arg in args]
+            if name in FILTERS:
+                value = FILTERS[name](value, *values)
+            elif name in SITE_FILTERS:
+                value = SITE_FILTERS[name](context.find('site'), value, *values)
+            # Unknown filters leave the value alone, as Jekyll does by default
+        return value
+
+def _tokenize(source):
+    position = 0
+    source = source.strip()
+    while position < len(source):
+        match = EXPRESSION_RE.match(source, position)
+        if not match or match.end() == position:
+            raise LiquidError(f"cannot parse {source!r} at {source[position:]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        yield kind, match.group(kind)
+
+def _parse_operand(tokens, position, source):
+    """Parse a literal or variable path into ('literal', value) or ('path', [parts])."""
+    if position >= len(tokens):
+        raise LiquidError(f"missing value in {source!r}")
+    kind, text = tokens[position]
+    if kind == 'string':
+        return ('literal', text[1:-1]), position + 1
+    if kind == 'number':
+        return ('literal', float(text) if '.' in text else int(text)), position + 1
+    if kind == 'punct' and text == '(':
+        # Range literal (start..end)
+        start, position = _parse_operand(tokens, position + 1, source)
+        if tokens[position] != ('punct', '..'):
+            raise LiquidError(f"bad range in {source!r}")
+        end, position = _parse_operand(tokens, position + 1, source)
+        if tokens[position] != ('punct', ')'):
+            raise LiquidError(f"bad range in {source!r}")
+        return ('range', start, end), position + 1
+    if kind != 'name':
+        raise LiquidError(f"unexpected {text!r} in {source!r}")
+    if text in LITERALS:
+        return ('literal', LITERALS[text]), position + 1
+    if text in ('empty', 'blank'):
+        return ('literal', EMPTY), position + 1
+    parts = [('literal', text)]
+    position += 1
+    while position < len(tokens):
+        if tokens[position] == ('punct', '.') and position + 1 < len(tokens) and tokens[position + 1][0] == 'name':
+            parts.append(('literal', tokens[position + 1][1]))
+            position += 2
+        elif tokens[position] == ('punct', '['):
+            key, position = _parse_operand(tokens, position + 1, source)
+            if position >= len(tokens) or tokens[position] != ('punct', ']'):
+                raise LiquidError(f"missing ']' in {source!r}")
+            parts.append(key)
+            position += 1
+        else:
+            break
+    return ('path', parts), position
+
+class Condition:
+    """A chain of comparisons joined by and/or, evaluated right to left as Liquid does."""
+
+    def __init__(self, source):
+        tokens = list(_tokenize(source))
+        self.comparisons = []
+        self.joiners = []
+        position = 0
+        while True:
+            left, position = _parse_operand(tokens, position, source)
+            op = right = None
+            if position < len(tokens) and (tokens[position][0] == 'op' or tokens[position] == ('name', 'contains')):
+                op = tokens[position][1]
+                right, position = _parse_operand(tokens, position + 1, source)
+            self.comparisons.append((left, op, right))
+            if position >= len(tokens):
+                break
+            if tokens[position] not in (('name', 'and'), ('name', 'or')):
+                raise LiquidError(f"unexpected {tokens[position][1]!r} in {source!r}")
+            self.joiners.append(tokens[position][1])
+            position += 1
+
+    def evaluate(self, context):
+        def check(comparison):
+            left, op, right = comparison
+            value = context.resolve(left)
+            if op is None:
+                return is_truthy(value)
+            return _compare(value, op, context.resolve(right))
+
+        result = check(self.comparisons[-1])
+        for comparison, joiner in zip(reversed(self.comparisons[:-1]), reversed(self.joiners)):
+            if joiner == 'and':
+                result = check(comparison) and result
+            else:
+                result = check(comparison) or result
+        return result
+
+class Context:
+    """Variable scopes of one render, innermost last; assign writes to the outermost."""
+
+    def __init__(self, variables, loader=None):
+        self.scopes = [variables]
+        self.loader = loader
+
+    def find(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def resolve(self, operand):
+        kind = operand[0]
+        if kind == 'literal':
+            return operand[1]
+        if kind == 'range':
+            return list(range(int(self.resolve(operand[1])), int(self.resolve(operand[2])) + 1))
+        parts = operand[1]
+        value = self.find(parts[0][1])
+        for part in parts[1:]:
+            value = lookup(value, self.resolve(part))
+        return value
+
+class Template:
+    """A parsed Liquid template."""
+
+    def __init__(self, source, name='<template>'):
+        self.name = name
+        tokens = _split_markup(source)
+        self.nodes, end = _parse_block(tokens, 0, (), name)
+        if end is not None:
+            raise LiquidError(f"{name}: unexpected {{% {end[0]} %}}")
+
+    def render(self, context):
+        out = []
+        _render_nodes(self.nodes, context, out)
+        return ''.join(out)
+
+def _split_markup(source):
+    """Split a template into text, ('output', markup) and ('tag', name, markup) tokens."""
+    tokens = []
+    pieces = TOKEN_RE.split(source)
+    strip_next = False
+    i = 0
+    while i < len(pieces):
+        piece = pieces[i]
+        if i % 2 == 0:
+            if strip_next:
+                piece = piece.lstrip()
+            tokens.append(piece)
+            i += 1
+            continue
+        if piece[2:3] == '-' and tokens and isinstance(tokens[-1], str):
+            tokens[-1] = tokens[-1].rstrip()
+        strip_next = piece[-3:-2] == '-'
+        inner = piece[2:-2].strip('-').strip()
+        if piece.startswith('{{'):
+            tokens.append(('output', inner))
+            i += 1
+            continue
+        name, _, markup = inner.partition(' ')
+        if name in ('raw', 'comment'):
+            # Everything up to the matching end tag is kept (raw) or dropped (comment)
+            end_name = 'end' + name
+            body = []
+            i += 1
+            while i < len(pieces):
+                if i % 2 == 1 and pieces[i][2:-2].strip('-').strip() == end_name:
+                    strip_next = pieces[i][-3:-2] == '-'
+                    break
+                body.append(pieces[i])
+                i += 1
+            if name == 'raw':
+                tokens.append(''.join(body))
+            i += 1
+            continue
+        tokens.append(('tag', name, markup.strip()))
+        i += 1
+    return tokens
+
+def _parse_block(tokens, position, end_names, template_name):
+    """
+    Parse nodes until one of end_names.
+
+    :return: (nodes, (end tag name, markup) or None, position after the end tag)
+    """
+    nodes = []
+    while position < len(tokens):
+        token = tokens[position]
+        position += 1
+        if isinstance(token, str):
+            if token:
+                nodes.append(('text', token))
+            continue
+        if token[0] == 'output':
+            nodes.append(('output', Expression(token[1])))
+            continue
+        _, name, markup = token
+        if name in end_names:
+            return nodes, (name, markup, position)
+        if name == 'assign':
+            target, _, expression = markup.partition('=')
+            nodes.append(('assign', target.strip(), Expression(expression)))
+        elif name == 'capture':
+            body, end, position = _parse_until(tokens, position, ('endcapture',), template_name)
+            nodes.append(('capture', markup.strip(), body))
+        elif name in ('if', 'unless'):
+            branches = []
+            condition = markup
+            else_body = None
+            while True:
+                body, end, position = _parse_until(tokens, position, ('elsif', 'else', 'end' + name),
+                                                   template_name)
+                branches.append((Condition(condition), body))
+                if end[0] == 'elsif':
+                    condition = end[1]
+                    continue
+                if end[0] == 'else':
+                    else_body, end, position = _parse_until(tokens, position, ('end' + name,), template_name)
+                break
+            nodes.append((name, branches, else_body))
+        elif name == 'for':
+            match = re.match(r'(\w+)\s+in\s+(.+?)((?:\s+(?:reversed|limit:\s*\S+|offset:\s*\S+))*)\s*$', markup)
+            if not match:
+                raise LiquidError(f"{template_name}: bad for loop {markup!r}")
+            options = match.group(3)
+            limit = re.search(r'limit:\s*(\S+)', options)
+            offset = re.search(r'offset:\s*(\S+)', options)
+            body, end, position = _parse_until(tokens, position, ('else', 'endfor'), template_name)
+            else_body = None
+            if end[0] == 'else':
+                else_body, end, position = _parse_until(tokens, position, ('endfor',), template_name)
+            nodes.append(('for', match.group(1), Expression(match.group(2)), 'reversed' in options,
+                          Expression(limit.group(1)) if limit else None,
+                          Expression(offset.group(1)) if offset else None, body, else_body))
+        elif name == 'include':
+            parts = markup.split(None, 1)
+            if not parts:
+                raise LiquidError(f"{template_name}: include without a file")
+            params = []
+            for key, value in re.findall(r'([\w-]+)\s*=\s*("[^"]*"|\'[^\']*\'|[^\s]+)', parts[1] if len(parts) > 1 else ''):
+                params.append((key, Expression(value)))
+            nodes.append(('include', parts[0], params))
+        else:
+            raise LiquidError(f"{template_name}: unsupported tag {{% {name} %}}")
+    if end_names:
+        raise LiquidError(f"{template_name}: missing {{% {end_names[-1]} %}}")
+    return nodes, None
+
+def _parse_until(tokens, position, end_names, template_name):
+    nodes, end = _parse_block(tokens, position, end_names, template_name)
+    return nodes, end[:2], end[2]
+
+def _render_nodes(nodes, context, out):
+    for node in nodes:
+        kind = node[0]
+        if kind == 'text':
+            out.append(node[1])
+        elif kind == 'output':
+            out.append(to_liquid_string(node[1].evaluate(context)))
+        elif kind == 'assign':
+            context.scopes[0][node[1]] = node[2].evaluate(context)
+        elif kind == 'capture':
+            captured = []
+            _render_nodes(node[2], context, captured)
+            context.scopes[0][node[1]] = ''.join(captured)
+        elif kind in ('if', 'unless'):
+            _, branches, else_body = node
+            for condition, body in branches:
+                matched = condition.evaluate(context)
+                if kind == 'unless':
+                    matched = not matched
+                if matched:
+                    _render_nodes(body, context, out)
+                    break
+            else:
+                if else_body is not None:
+                    _render_nodes(else_body, context, out)
+        elif kind == 'for':
+            _render_for(node, context, out)
+        elif kind == 'include':
+            _render_include(node, context, out)
+
+def _render_for(node, context, out):
+    _, variable, collection, reverse, limit, offset, body, else_body = node
+    items = collection.evaluate(context)
+    if items is None or items is False:
+        items = []
+    elif hasattr(items, 'items') and not isinstance(items, (list, tuple)):
+        items = [[key, value] for key, value in items.items()]
+    elif isinstance(items, str):
+        items = [items] if items else []
+    else:
+        items = list(items)
+    if offset is not None:
+        items = items[int(offset.evaluate(context)):]
+    if limit is not None:
+        items = items[:int(limit.evaluate(context))]
+    if reverse:
+        items.reverse()
+    if not items:
+        if else_body is not None:
+            _render_nodes(else_body, context, out)
+        return
+    length = len(items)
+    for index, item in enumerate(items):
+        context.scopes.append({variable: item, 'forloop': {
+            'index': index + 1, 'index0': index, 'rindex': length - index, 'rindex0': length - index - 1,
+            'first': index == 0, 'last': index == length - 1, 'length': length
+        }})
+        try:
+            _render_nodes(body, context, out)
+        finally:
+            context.scopes.pop()
+
+def _render_include(node, context, out):
+    _, name, params = node
+    if context.loader is None:
+        raise LiquidError(f"cannot include {name}: no include loader")
+    template = context.loader(name)
+    scope = {}
+    if params:
+        scope['include'] = {key: value.evaluate(context) for key, value in params}
+    context.scopes.append(scope)
+    try:
+        _render_nodes(template.nodes, context, out)
+    finally:
+        context.scopes.pop()
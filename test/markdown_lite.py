@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+
+import re
+import html
+
+# Block-level HTML tags whose elements are passed through untouched
+HTML_BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset', 'figure',
+    'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'iframe', 'nav', 'ol',
+    'p', 'pre', 'script', 'section', 'style', 'table', 'ul', 'video'
+}
+
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})\s*([\w+#.-]*)\s*$')
+ATX_HEADER_RE = re.compile(r'^(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$')
+SETEXT_RE = re.compile(r'^ {0,3}(=+|-+)[ \t]*$')
+HR_RE = re.compile(r'^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$')
+LIST_ITEM_RE = re.compile(r'^( {0,3})([-*+]|\d+\.)([ \t]+|$)(.*)$')
+HTML_BLOCK_RE = re.compile(r'^ {0,3}<(/?)([a-zA-Z][\w-]*)(?=[\s>/])|^ {0,3}<!--')
+
+# Header ids the way kramdown's GFM parser makes them: lowercase, drop
+# everything but word characters, dashes and spaces, spaces become dashes
+GFM_ID_STRIP_RE = re.compile(r'[^\w\- \t]')
+
+# Placeholders for inline pieces that are already HTML
+PLACEHOLDER_RE = re.compile('\x00(\\d+)\x00')
+
+CODE_SPAN_RE = re.compile(r'(`+)(.+?)(?<!`)\1(?!`)', re.DOTALL)
+ESCAPE_RE = re.compile(r'\\([\\`*_{}\[\]()#+\-.!|<>"\'$:=~^])')
+AUTOLINK_RE = re.compile(r'<((?:https?|ftp|mailto):[^>\s]+)>')
+INLINE_HTML_RE = re.compile(r'</?[a-zA-Z][\w-]*(?:\s+[^<>]*?)?/?>|<!--.*?-->', re.DOTALL)
+LINK_RE = re.compile(r'(!?)\[([^\]]*)\]\(\s*<?([^)\s>]*)>?(?:\s+"([^"]*)")?\s*\)')
+ENTITY_RE = re.compile(r'&(?:#\d+|#x[0-9a-fA-F]+|[a-zA-Z][a-zA-Z0-9]*);')
+STRONG_RE = re.compile(r'(\*\*|__)(?=\S)(.+?)(?<=\S)\1')
+EM_STAR_RE = re.compile(r'\*(?=[^\s*])(.+?)(?<=[^\s*])\*')
+EM_UNDERSCORE_RE = re.compile(r'(?<![A-Za-z0-9])_(?=\S)(.+?)(?<=\S)_(?![A-Za-z0-9])')
+STRIKE_RE = re.compile(r'~~(?=\S)(.+?)(?<=\S)~~')
+
+# Entities kramdown keeps as entities even when outputting characters
+KEPT_ENTITIES = {'&amp;', '&lt;', '&gt;', '&quot;'}
+
+def escape_text(text):
+    """Escape text content as kramdown does (&, < and >)."""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def escape_attribute(text):
+    """Escape an attribute value."""
+    return escape_text(text).replace('"', '&quot;')
+
+def gfm_header_id(text, counts):
+    """
+    Generate a header id from its source text, numbering repeats like GitHub.
+
+    :param counts: Ids generated so far in the document, updated in place
+    """
+    base = GFM_ID_STRIP_RE.sub('', text.lower()).replace(' ', '-').replace('\t', '-')
+    count = counts.get(base, 0)
+    counts[base] = count + 1
+    return base if count == 0 else f"{base}-{count}"
+
+def _smart_quotes(text):
+    """Turn straight quotes into typographic ones, roughly following kramdown's rules."""
+    out = []
+    for i, char in enumerate(text):
+        if char not in '\'"':
+            out.append(char)
+            continue
+        before = text[i - 1] if i > 0 else ' '
+        after = text[i + 1] if i + 1 < len(text) else ' '
+        opening = (before.isspace() or before in '([{-—–') and not after.isspace()
+        if char == '"':
+            out.append('“' if opening else '”')
+        elif before.isalnum() or not opening:
+            out.append('’')
+        else:
+            out.append('‘')
+    return ''.join(out)
+
+def _typographic(text):
+    """kramdown's typographic symbols, output as characters."""
+    text = text.replace('---', '—').replace('--', '–').replace('...', '…')
+    text = text.replace('&lt;&lt; ', '« ').replace(' &gt;&gt;', ' »')
+    return _smart_quotes(text)
+
+def convert_inline(text):
+    """Convert the inline markdown of a paragraph, header or list item to HTML."""
+    pieces = []
+
+    def protect(fragment):
+        pieces.append(fragment)
+        return f"\x00{len(pieces) - 1}\x00"
+
+    def code_span(match):
+        code = match.group(2)
+        if code.startswith(' ') and code.endswith(' ') and code.strip():
+            code = code[1:-1]
+        return protect(f"<code>{escape_text(code)}</code>")
+
+    def link(match):
+        image, label, url, title = match.groups()
+        title_attr = f' title="{escape_attribute(title)}"' if title else ''
+        if image:
+            return protect(f'<img src="{escape_attribute(url)}" alt="{escape_attribute(label)}"{title_attr} />')
+        return protect(f'<a href="{escape_attribute(url)}"{title_attr}>') + label + protect('</a>')
+
+    def entity(match):
+        if match.group(0) in KEPT_ENTITIES:
+            return protect(match.group(0))
+        return protect(escape_text(html.unescape(match.group(0))))
+
+    text = CODE_SPAN_RE.sub(code_span, text)
+    text = ESCAPE_RE.sub(lambda match: protect(escape_text(match.group(1))), text)
+    text = AUTOLINK_RE.sub(lambda match: protect(
+        f'<a href="{escape_attribute(match.group(1))}">{escape_text(match.group(1))}</a>'), text)
+    text = INLINE_HTML_RE.sub(lambda match: protect(match.group(0)), text)
+    text = LINK_RE.sub(link, text)
+    text = ENTITY_RE.sub(entity, text)
+
+    # Hard line breaks: two or more spaces at the end of a line
+    text = re.sub(r' {2,}\n', lambda match: protect('<br />') + '\n', text)
+    text = _typographic(escape_text(text))
+    text = STRONG_RE.sub(r'<strong>\2</strong>', text)
+    text = EM_STAR_RE.sub(r'<em>\1</em>', text)
+    text = EM_UNDERSCORE_RE.sub(r'<em>\1</em>', text)
+    text = STRIKE_RE.sub(r'<del>\1</del>', text)
+
+    # Placeholders may hold other placeholders (link labels), so restore until stable
+    while PLACEHOLDER_RE.search(text):
+        text = PLACEHOLDER_RE.sub(lambda match: pieces[int(match.group(1))], text)
+    return text
+
+class _Parser:
+    """Split markdown lines into kramdown-like block elements."""
+
+    def parse(self, lines):
+        """
+        :return: List of blocks: ('blank',), ('header', level, text), ('p', text),
+                 ('code', lang or None, text), ('html', text), ('hr',),
+                 ('blockquote', blocks) and ('list', tag, [(loose, blocks)])
+        """
+        blocks = []
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            if not line.strip():
+                while i < len(lines) and not lines[i].strip():
+                    i += 1
+                blocks.append(('blank',))
+                continue
+
+            fence = FENCE_RE.match(line)
+            if fence:
+                marker = fence.group(1)
+                body = []
+                i += 1
+                while i < len(lines) and not (lines[i].strip().startswith(marker[0] * len(marker))
+                                              and not lines[i].strip().strip(marker[0])):
+                    body.append(lines[i])
+                    i += 1
+                i += 1
+                blocks.append(('code', fence.group(2) or None, ''.join(row + '\n' for row in body)))
+                continue
+
+            header = ATX_HEADER_RE.match(line)
+            if header:
+                blocks.append(('header', len(header.group(1)), (header.group(2) or '').strip()))
+                i += 1
+                continue
+
+            if HR_RE.match(line):
+                blocks.append(('hr',))
+                i += 1
+                continue
+
+            if line.startswith('    ') or line.startswith('\t'):
+                i = self._code_block(lines, i, blocks)
+                continue
+
+            if HTML_BLOCK_RE.match(line):
+                i = self._html_block(lines, i, blocks)
+                continue
+
+            if line.lstrip().startswith('>'):
+                quoted = []
+                while i < len(lines) and lines[i].strip() and (lines[i].lstrip().startswith('>') or quoted):
+                    stripped = lines[i].lstrip()
+                    if stripped.startswith('>'):
+                        stripped = stripped[1:]
+                        if stripped.startswith(' '):
+                            stripped = stripped[1:]
+                    quoted.append(stripped)
+                    i += 1
+                blocks.append(('blockquote', self.parse(quoted)))
+                continue
+
+            if LIST_ITEM_RE.match(line):
+                i = self._list(lines, i, blocks)
+                continue
+
+            i = self._paragraph(lines, i, blocks)
+        return blocks
+
+    def _starts_block(self, line):
+        # GFM lets headers, fences, quotes, rules and lists interrupt a paragraph
+        return bool(ATX_HEADER_RE.match(line) or FENCE_RE.match(line) or HR_RE.match(line)
+                    or line.lstrip().startswith('>') or LIST_ITEM_RE.match(line)
+                    or (HTML_BLOCK_RE.match(line) and not line.lstrip().startswith('</')))
+
+    def _paragraph(self, lines, i, blocks):
+        text = [lines[i].strip()]
+        hard_break = [lines[i].endswith('  ')]
+        i += 1
+        while i < len(lines) and lines[i].strip() and not self._starts_block(lines[i]):
+            if SETEXT_RE.match(lines[i]) and len(text) == 1:
+                level = 1 if lines[i].strip()[0] == '=' else 2
+                blocks.append(('header', level, text[0]))
+                return i + 1
+            text.append(lines[i].strip())
+            hard_break.append(lines[i].endswith('  '))
+            i += 1
+        if len(text) == 1 and i < len(lines) and SETEXT_RE.match(lines[i]) and lines[i].strip()[0] == '=':
+            blocks.append(('header', 1, text[0]))
+            return i + 1
+        # Keep the trailing spaces that mark hard line breaks, except on the last line
+        joined = '\n'.join(row + ('  ' if brk and n < len(text) - 1 else '')
+                           for n, (row, brk) in enumerate(zip(text, hard_break)))
+        blocks.append(('p', joined))
+        return i
+
+    def _code_block(self, lines, i, blocks):
+        body = []
+        while i < len(lines):
+            line = lines[i]
+            if line.startswith('    '):
+                body.append(line[4:])
+            elif line.startswith('\t'):
+                body.append(line[1:])
+            elif not line.strip():
+                body.append('')
+            else:
+                break
+            i += 1
+        # Trailing blank lines belong to the document, not the code
+        while body and not body[-1].strip():
+            body.pop()
+            i -= 1
+        blocks.append(('code', None, ''.join(row + '\n' for row in body)))
+        return i
+
+    def _html_block(self, lines, i, blocks):
+        match = HTML_BLOCK_RE.match(lines[i])
+        tag = match.group(2)
+        if tag is None:
+            # Comment: up to the closing -->
+            end = i
+            while end < len(lines) and '-->' not in lines[end]:
+                end += 1
+        elif tag.lower() not in HTML_BLOCK_TAGS:
+            return self._paragraph(lines, i, blocks)
+        else:
+            # Up to the line closing the element, counting nested elements of the same name
+            open_re = re.compile(rf'<{tag}(?=[\s>/])', re.IGNORECASE)
+            close_re = re.compile(rf'</{tag}\s*>', re.IGNORECASE)
+            depth = 0
+            end = i
+            while end < len(lines):
+                depth += len(open_re.findall(lines[end])) - len(close_re.findall(lines[end]))
+                if depth <= 0:
+                    break
+                end += 1
+        end = min(end, len(lines) - 1)
+        blocks.append(('html', '\n'.join(lines[i:end + 1]) + '\n'))
+        return end + 1
+
+    def _list(self, lines, i, blocks):
+        first = LIST_ITEM_RE.match(lines[i])
+        ordered = first.group(2)[0].isdigit()
+        items = []
+        previous_blank = False
+        while i < len(lines):
+            match = LIST_ITEM_RE.match(lines[i])
+            if not match or match.group(2)[0].isdigit() != ordered:
+                break
+            offset = len(match.group(1)) + len(match.group(2)) + max(1, min(len(match.group(3)), 4))
+            body = [match.group(4)]
+            i += 1
+            blank_inside = False
+            while i < len(lines):
+                line = lines[i]
+                if not line.strip():
+                    # A blank line continues the item only if indented content follows
+                    j = i
+                    while j < len(lines) and not lines[j].strip():
+                        j += 1
+                    if j < len(lines) and lines[j].startswith(' ' * offset):
+                        body.extend([''] * (j - i))
+                        blank_inside = True
+                        i = j
+                        continue
+                    break
+                if line.startswith(' ' * offset):
+                    body.append(line[offset:])
+                elif LIST_ITEM_RE.match(line) or self._starts_block(line):
+                    break
+                else:
+                    # Lazy continuation of the item's paragraph
+                    body.append(line.strip())
+                i += 1
+            followed_by_blank = False
+            if i < len(lines) and not lines[i].strip():
+                j = i
+                while j < len(lines) and not lines[j].strip():
+                    j += 1
+                next_item = j < len(lines) and LIST_ITEM_RE.match(lines[j])
+                if next_item and next_item.group(2)[0].isdigit() == ordered:
+                    followed_by_blank = True
+                    i = j
+            items.append([previous_blank or followed_by_blank or blank_inside, self.parse(body)])
+            previous_blank = followed_by_blank
+        blocks.append(('list', 'ol' if ordered else 'ul', [tuple(item) for item in items]))
+        return i
+
+def _render(blocks, indent, header_ids, out):
+    pad = ' ' * indent
+    for block in blocks:
+        kind = block[0]
+        if kind == 'blank':
+            out.append('\n')
+        elif kind == 'header':
+            _, level, text = block
+            out.append(f'{pad}<h{level} id="{gfm_header_id(text, header_ids)}">'
+                       f'{convert_inline(text)}</h{level}>\n')
+        elif kind == 'p':
+            out.append(f'{pad}<p>{convert_inline(block[1])}</p>\n')
+        elif kind == 'code':
+            _, lang, text = block
+            # Rouge's markup, without its token spans: Prism highlights in the browser,
+            # so pages with code blocks are not byte-identical to Jekyll's (see render_site.normalize_html)
+            css = f"language-{lang}" if lang else 'language-plaintext'
+            out.append(f'{pad}<div class="{css} highlighter-rouge"><div class="highlight"><pre class="highlight">'
+                       f'<code>{escape_text(text)}</code></pre></div></div>\n')
+        elif kind == 'html':
+            # Verbatim, where kramdown re-serializes: another byte difference from Jekyll
+            out.append(block[1])
+        elif kind == 'hr':
+            out.append(f'{pad}<hr />\n')
+        elif kind == 'blockquote':
+            out.append(f'{pad}<blockquote>\n')
+            _render(block[1], indent + 2, header_ids, out)
+            out.append(f'{pad}</blockquote>\n')
+        elif kind == 'list':
+            _, tag, items = block
+            out.append(f'{pad}<{tag}>\n')
+            for loose, children in items:
+                while children and children[-1][0] == 'blank':
+                    children = children[:-1]
+                out.append(f'{pad}  <li>')
+                if children and children[0][0] == 'p' and not loose:
+                    # Tight item: its first paragraph is written without <p>
+                    out.append(convert_inline(children[0][1]))
+                    if len(children) > 1:
+                        out.append('\n')
+                        _render(children[1:], indent + 4, header_ids, out)
+                        out.append(f'{pad}  ')
+                elif children:
+                    out.append('\n')
+                    _render(children, indent + 4, header_ids, out)
+                    out.append(f'{pad}  ')
+                out.append('</li>\n')
+            out.append(f'{pad}</{tag}>\n')
+
+def markdown_to_html(text):
+    """
+    Convert markdown to HTML, following the output of Jekyll's kramdown (GFM input).
+
+    Covers the markdown the course generators write: headers with GitHub-style
+    ids, paragraphs, lists, fenced and indented code, block quotes, rules and
+    raw HTML blocks, with code spans, emphasis, links and typographic quotes
+    inline. Code blocks get Rouge's wrapper markup but no token spans.
+    """
+    lines = text.replace('\r\n', '\n').split('\n')
+    blocks = _Parser().parse(lines)
+    # A single trailing newline in the source is not a blank element
+    if blocks and blocks[-1][0] == 'blank' and text.endswith('\n') and not text.endswith('\n\n'):
+        blocks.pop()
+    out = []
+    _render(blocks, 0, {}, out)
+    return ''.join(out)
+
+def code_blocks(text):
+    """
+    Find the code blocks of a markdown document, including those inside lists and quotes.
+
+    :return: List of (language or None, code, line number of the code's first line)
+    """
+    lines = text.replace('\r\n', '\n').split('\n')
+    found = []
+
+    def walk(blocks):
+        for block in blocks:
+            if block[0] == 'code':
+                found.append((block[1], block[2]))
+            elif block[0] == 'blockquote':
+                walk(block[1])
+            elif block[0] == 'list':
+                for _, children in block[2]:
+                    walk(children)
+
+    walk(_Parser().parse(lines))
+
+    # The parser does not keep positions, so find each block's first line in order
+    results = []
+    cursor = 0
+    for lang, code in found:
+        first = code.split('\n', 1)[0].strip()
+        line = cursor
+        while line < len(lines) and (lines[line].strip() != first if first else lines[line].strip()):
+            line += 1
+        if line >= len(lines):
+            line = cursor
+        cursor = line + code.count('\n')
+        results.append((lang, code, line + 1))
+    return results
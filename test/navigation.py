@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import argparse
+
+from docwriter import DocWriter
+
+# Extensions Jekyll renders as pages when they have front matter
+PAGE_EXTENSIONS = ('.md', '.markdown', '.html')
+
+# Directories Jekyll never reads pages from, besides _* and .* ones
+EXCLUDED_DIRS = {'node_modules', 'vendor'}
+
+def read_front_matter(path):
+    """
+    Read the simple 'key: value' pairs of a file's YAML front matter.
+
+    Only top-level scalars are needed (title, permalink), so nested values
+    are skipped rather than parsed.
+
+    :return: Dictionary of front matter values, or None if the file has no front matter
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if f.readline().rstrip('\r\n') != '---':
+            return None
+        values = {}
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line in ('---', '...'):
+                return values
+            if not line or line[0] in ' \t#-' or ':' not in line:
+                continue
+            key, _, value = line.partition(':')
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+                value = value[1:-1]
+            values[key.strip()] = value
+    return None
+
+def page_url(relative_path, front_matter):
+    """
+    Compute a page's URL the way Jekyll does with `permalink: pretty`.
+
+    :param relative_path: Path of the page below the site directory
+    :param front_matter: The page's front matter; a 'permalink' overrides the path
+    :return: URL such as '/cpp-intro/arrays/'
+    """
+    if front_matter.get('permalink'):
+        permalink = front_matter['permalink']
+        return permalink if permalink.startswith('/') else '/' + permalink
+    directory, name = os.path.split(relative_path.replace(os.sep, '/'))
+    basename = os.path.splitext(name)[0]
+    parts = [part for part in directory.split('/') if part]
+    if basename != 'index':
+        parts.append(basename)
+    return '/' + ''.join(part + '/' for part in parts)
+
+def collect_pages(site_dir):
+    """
+    Find the pages of a Jekyll site.
+
+    :param site_dir: Jekyll source directory (holding _config.yml)
+    :return: List of {'url', 'title', 'path'} dictionaries sorted by URL; title is None
+             when missing, path is relative to the site directory with '/' separators
+    """
+    pages = []
+    for root, dirs, files in os.walk(site_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(('_', '.')) and d not in EXCLUDED_DIRS]
+        for name in files:
+            if name.startswith(('_', '.')) or not name.endswith(PAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            try:
+                front_matter = read_front_matter(path)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Skipping {path}: {e}", file=sys.stderr)
+                continue
+            if front_matter is None:
+                continue
+            relative_path = os.path.relpath(path, site_dir).replace(os.sep, '/')
+            pages.append({
+                'url': page_url(relative_path, front_matter),
+                'title': front_matter.get('title') or None,
+                'path': relative_path
+            })
+    pages.sort(key=lambda page: page['url'])
+    return pages
+
+def parent_url(url):
+    """
+    Return the URL of a page's parent, as subtopics.html used to compute it
+    with `split: '/' | pop | join: '/' | append: '/'`.
+    """
+    # Liquid's split drops trailing empty fields
+    parts = url.split('/')
+    while parts and parts[-1] == '':
+        parts.pop()
+    return '/'.join(parts[:-1]) + '/'
+
+def build_navigation(pages):
+    """
+    Precompute the navigation of every page, so templates look it up by URL.
+
+    :param pages: Pages from collect_pages
+    :return: Dictionary with:
+             'pages': URL -> {'title', 'section', 'subsection', 'section_title',
+             'subsection_title'}, where section and subsection are the URLs of
+             the page's first- and second-level ancestors (or itself), or None;
+             'children': URL -> titled child pages [{'url', 'title'}] sorted by URL.
+             The top-level sections are the children of '/'.
+    """
+    titles = {page['url']: page['title'] for page in pages}
+    navigation = {'pages': {}, 'children': {}}
+    for page in pages:
+        url = page['url']
+        segments = [part for part in url.split('/') if part]
+        section = '/' + segments[0] + '/' if segments else None
+        subsection = section + segments[1] + '/' if len(segments) > 1 else None
+        navigation['pages'][url] = {
+            'title': page['title'],
+            'section': section,
+            'subsection': subsection,
+            'section_title': titles.get(section) or '',
+            'subsection_title': titles.get(subsection) or ''
+        }
+        if page['title'] and url != '/':
+            navigation['children'].setdefault(parent_url(url), []).append({'url': url, 'title': page['title']})
+    return navigation
+
+def write_navigation(site_dir):
+    """
+    Rebuild _data/navigation.json for a site, leaving it alone if nothing changed.
+
+    :return: (number of pages, whether the file was written)
+    """
+    count, content = navigation_json(site_dir)
+    data_dir = os.path.join(site_dir, '_data')
+    with DocWriter(data_dir) as writer:
+        written = writer.write(os.path.join(data_dir, 'navigation.json'), content)
+    return count, written
+
+def navigation_json(site_dir):
+    """
+    Build the contents of _data/navigation.json for a site.
+
+    :return: (number of pages, JSON text)
+    """
+    pages = collect_pages(site_dir)
+    return len(pages), json.dumps(build_navigation(pages), indent=1, ensure_ascii=False) + '\n'
+
+def navigation_is_current(site_dir):
+    """Tell whether the committed _data/navigation.json matches the site's pages."""
+    try:
+        with open(os.path.join(site_dir, '_data', 'navigation.json'), 'r', encoding='utf-8') as f:
+            current = f.read()
+    except OSError:
+        return False
+    return current == navigation_json(site_dir)[1]
+
+def main():
+    """Rebuild the navigation data of a Jekyll site."""
+    parser = argparse.ArgumentParser(description="Precompute the navigation data of a Jekyll site.")
+    parser.add_argument('site_dir', nargs='?', default='docs',
+                        help="Jekyll source directory (default: docs)")
+    parser.add_argument('--check', action='store_true',
+                        help="Only check that _data/navigation.json is up to date; exit 1 if it is not")
+    args = parser.parse_args()
+    if args.check:
+        if not navigation_is_current(args.site_dir):
+            print(f"{os.path.join(args.site_dir, '_data', 'navigation.json')} is out of date; "
+                  f"rerun navigation.py or generate_docs.py", file=sys.stderr)
+            sys.exit(1)
+        return
+    count, written = write_navigation(args.site_dir)
+    print(f"Navigation for {count} pages {'written' if written else 'unchanged'} "
+          f"in {os.path.join(args.site_dir, '_data', 'navigation.json')}")
+
+if __name__ == "__main__":
+    main()
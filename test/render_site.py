@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from docwriter import DocWriter, atomic_write
+from navigation import collect_pages, page_url, write_navigation
+from liquid_lite import Context, Template, LiquidError
+from markdown_lite import markdown_to_html
+
+# Render cache kept in the output directory, next to DocWriter's manifest
+CACHE_NAME = '.render-cache.json'
+CACHE_VERSION = 1
+
+# Pages handed to a worker at a time (see generate_docs.PAGES_PER_TASK)
+PAGES_PER_TASK = 32
+
+# Source extensions converted from markdown before the layout is applied
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+
+# Known differences from Jekyll's pages that --compare --normalize looks past (see normalize_html)
+PRE_RE = re.compile(r'(<pre\b[^>]*>.*?</pre>)', re.DOTALL | re.IGNORECASE)
+TOKEN_SPAN_RE = re.compile(r'</?span\b[^>]*>')
+HTML_TAG_RE = re.compile(r'<([a-zA-Z][\w-]*)(\s[^<>]*?)?\s*(/?)>')
+HTML_ATTRIBUTE_RE = re.compile(r'([^\s=/"\']+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+)))?')
+LINE_BREAK_RE = re.compile(r'[ \t]*\n\s*')
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+# Front matter the way Jekyll finds it: between two --- lines at the top
+FRONT_MATTER_RE = re.compile(r'---[ \t]*\r?\n(.*?\r?\n)?(?:---|\.\.\.)[ \t]*(?:\r?\n|$)', re.DOTALL)
+
+def parse_yaml(text):
+    """
+    Parse the YAML subset used by _config.yml and front matter: nested
+    mappings, block lists ('- item' and '- key: value'), quoted and plain
+    scalars and inline [a, b] lists.
+    """
+    lines = []
+    for raw in text.splitlines():
+        stripped = re.sub(r'\s+#.*$', '', raw) if '#' in raw and not re.search(r'["\'].*#.*["\']', raw) else raw
+        if not stripped.strip() or stripped.lstrip().startswith('#'):
+            continue
+        lines.append([len(stripped) - len(stripped.lstrip()), stripped.strip()])
+    if not lines:
+        return {}
+    value, _ = _parse_yaml_node(lines, 0, lines[0][0])
+    return value
+
+def _parse_yaml_node(lines, i, indent):
+    if lines[i][1] == '-' or lines[i][1].startswith('- '):
+        items = []
+        while i < len(lines) and lines[i][0] == indent and (lines[i][1] == '-' or lines[i][1].startswith('- ')):
+            rest = lines[i][1][1:].strip()
+            if not rest:
+                if i + 1 < len(lines) and lines[i + 1][0] > indent:
+                    item, i = _parse_yaml_node(lines, i + 1, lines[i + 1][0])
+                else:
+                    item, i = None, i + 1
+            elif re.match(r'[^\'"\[{][^:]*:(\s|$)', rest):
+                # '- key: value' starts a mapping indented past the dash
+                lines[i] = [indent + 2, rest]
+                item, i = _parse_yaml_node(lines, i, indent + 2)
+            else:
+                item, i = _yaml_scalar(rest), i + 1
+            items.append(item)
+        return items, i
+
+    mapping = {}
+    while i < len(lines) and lines[i][0] == indent:
+        key, sep, rest = lines[i][1].partition(':')
+        if not sep:
+            raise ValueError(f"expected 'key: value', got {lines[i][1]!r}")
+        key = _yaml_scalar(key.strip())
+        rest = rest.strip()
+        i += 1
+        if rest:
+            mapping[key] = _yaml_scalar(rest)
+        elif i < len(lines) and (lines[i][0] > indent or (lines[i][0] == indent and lines[i][1].startswith('-'))):
+            mapping[key], i = _parse_yaml_node(lines, i, lines[i][0])
+        else:
+            mapping[key] = None
+    return mapping, i
+
+def _yaml_scalar(text):
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '"\'':
+        return text[1:-1]
+    if text.startswith('[') and text.endswith(']'):
+        return [_yaml_scalar(part.strip()) for part in text[1:-1].split(',') if part.strip()]
+    if text in ('true', 'True', 'yes'):
+        return True
+    if text in ('false', 'False', 'no'):
+        return False
+    if text in ('null', '~', 'Null'):
+        return None
+    if re.fullmatch(r'-?\d+', text):
+        return int(text)
+    if re.fullmatch(r'-?\d+\.\d+', text):
+        return float(text)
+    return text
+
+def split_front_matter(text):
+    """
+    Split a file into its front matter and content.
+
+    :return: (front matter dictionary or None, content after the front matter)
+    """
+    match = FRONT_MATTER_RE.match(text)
+    if not match:
+        return None, text
+    return parse_yaml(match.group(1) or '') or {}, text[match.end():]
+
+def file_digest(data):
+    """Return a short digest of some bytes, for the render cache."""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def value_digest(value):
+    """Return a short digest of a JSON-like value, for the render cache."""
+    return file_digest(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+
+def resolve_path(value, path):
+    """Follow a path of keys into nested dictionaries; a trailing '*' means the value itself."""
+    for key in path:
+        if key == '*':
+            break
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+class TrackedMapping:
+    """
+    Read-only view of a dictionary that logs the key paths templates read.
+
+    Nested dictionaries are wrapped too; other values are returned as they
+    are, so reading a list depends on the whole list. Iterating a mapping
+    logs its path with a trailing '*', a dependency on all of it.
+    """
+
+    def __init__(self, value, path, log):
+        self.value = value
+        self.path = path
+        self.log = log
+
+    def get(self, key):
+        path = self.path + (key,)
+        self.log.add(path)
+        found = self.value.get(key) if isinstance(key, str) else None
+        return TrackedMapping(found, path, self.log) if isinstance(found, dict) else found
+
+    def keys(self):
+        self.log.add(self.path + ('*',))
+        return self.value.keys()
+
+    def items(self):
+        self.log.add(self.path + ('*',))
+        return self.value.items()
+
+    def values(self):
+        self.log.add(self.path + ('*',))
+        return self.value.values()
+
+    def __eq__(self, other):
+        self.log.add(self.path + ('*',))
+        return self.value == (other.value if isinstance(other, TrackedMapping) else other)
+
+    __hash__ = None
+
+def site_dependencies(log, variables):
+    """
+    Turn the key paths a page read into (path, digest) pairs.
+
+    A path that was only read on the way to a deeper key is skipped, so a page
+    depends on nav.pages[its url], not on every page's entry.
+    """
+    prefixes = {path[:n] for path in log for n in range(len(path))}
+    return [[list(path), value_digest(resolve_path(variables, path))]
+            for path in sorted(log, key=lambda path: [str(key) for key in path]) if path not in prefixes]
+
+class Site:
+    """The parts of a Jekyll site a page render reads: config, data, pages, layouts and includes."""
+
+    def __init__(self, site_dir):
+        self.dir = site_dir
+        config_path = os.path.join(site_dir, '_config.yml')
+        with open(config_path, 'rb') as f:
+            config_data = f.read()
+        self.config = parse_yaml(config_data.decode('utf-8')) or {}
+        self.config_digest = file_digest(config_data)
+        self.pages = collect_pages(site_dir)
+        self.variables = dict(self.config)
+        self.variables['data'] = self._load_data(os.path.join(site_dir, '_data'))
+        self.variables['pages'] = self.pages
+        self._templates = {}
+
+    @staticmethod
+    def _load_data(data_dir):
+        data = {}
+        for root, dirs, files in os.walk(data_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            relative = os.path.relpath(root, data_dir)
+            target = data
+            if relative != '.':
+                for part in relative.split(os.sep):
+                    target = target.setdefault(part, {})
+            for name in sorted(files):
+                base, ext = os.path.splitext(name)
+                if name.startswith('.') or ext not in ('.json', '.yml', '.yaml'):
+                    continue
+                with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+                    target[base] = json.load(f) if ext == '.json' else parse_yaml(f.read())
+        return data
+
+    def template(self, folder, name):
+        """
+        Load a layout or include, cached per process.
+
+        :param folder: '_layouts' or '_includes'
+        :return: (Template, front matter dictionary, path below the site, digest)
+        """
+        key = (folder, name)
+        if key not in self._templates:
+            relative = f"{folder}/{name}"
+            path = os.path.join(self.dir, folder, *name.split('/'))
+            if folder == '_layouts' and not os.path.exists(path):
+                path += '.html'
+                relative += '.html'
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                raise LiquidError(f"{relative} not found (theme layouts and includes are not supported)") from None
+            front_matter, body = split_front_matter(data.decode('utf-8'))
+            self._templates[key] = (Template(body, relative), front_matter or {}, relative, file_digest(data))
+        return self._templates[key]
+
+    def default_values(self, relative_path):
+        """Front matter defaults from _config.yml that apply to a page, most specific last."""
+        scopes = []
+        for default in self.config.get('defaults') or []:
+            scope = default.get('scope') or {}
+            scope_path = (scope.get('path') or '').strip('/')
+            if scope.get('type') not in (None, 'pages'):
+                continue
+            if scope_path and not (relative_path == scope_path or relative_path.startswith(scope_path + '/')):
+                continue
+            scopes.append((len(scope_path), default.get('values') or {}))
+        values = {}
+        for _, scope_values in sorted(scopes, key=lambda scope: scope[0]):
+            values.update(scope_values)
+        return values
+
+@functools.lru_cache(maxsize=None)
+def load_site(site_dir):
+    """Return the (per-process cached) site of a directory."""
+    return Site(site_dir)
+
+def output_path(url):
+    """Path of a page's output below the destination, e.g. '/a/b/' -> 'a/b/index.html'."""
+    path = url.lstrip('/')
+    if not path or path.endswith('/'):
+        return path + 'index.html'
+    return path if os.path.splitext(path)[1] else path + '.html'
+
+def render_page(site, relative_path):
+    """
+    Render one page through Liquid, markdown and its layouts, as Jekyll does.
+
+    :param site: Site from load_site
+    :param relative_path: Path of the page below the site directory, with '/' separators
+    :return: (output path below the destination, HTML, dependencies) where the
+             dependencies are {'files': {path: digest}, 'site': [[key path, digest]]}
+    """
+    with open(os.path.join(site.dir, *relative_path.split('/')), 'rb') as f:
+        data = f.read()
+    front_matter, content = split_front_matter(data.decode('utf-8'))
+    files = {relative_path: file_digest(data), '_config.yml': site.config_digest}
+
+    page = site.default_values(relative_path)
+    page.update(front_matter or {})
+    page['url'] = page_url(relative_path, {'permalink': page.get('permalink')})
+    page['path'] = relative_path
+
+    log = set()
+    site_variable = TrackedMapping(site.variables, (), log)
+
+    def include(name):
+        template, _, relative, digest = site.template('_includes', name)
+        files[relative] = digest
+        return template
+
+    content = Template(content, relative_path).render(Context({'site': site_variable, 'page': page}, include))
+    if relative_path.endswith(MARKDOWN_EXTENSIONS):
+        content = markdown_to_html(content)
+
+    layout_name = page.get('layout')
+    while layout_name and layout_name != 'none':
+        template, layout, relative, digest = site.template('_layouts', layout_name)
+        files[relative] = digest
+        variables = {'site': site_variable, 'page': page, 'layout': layout, 'content': content}
+        content = template.render(Context(variables, include))
+        layout_name = layout.get('layout')
+
+    dependencies = {'files': dict(sorted(files.items())), 'site': site_dependencies(log, site.variables)}
+    return output_path(page['url']), content, dependencies
+
+def render_pages(site_dir, relative_paths):
+    """
+    Render some pages of a site; the unit of work of the pool.
+
+    :return: List of (page path, output path, HTML, dependencies)
+    """
+    site = load_site(site_dir)
+    results = []
+    for relative_path in relative_paths:
+        try:
+            results.append((relative_path,) + render_page(site, relative_path))
+        except (LiquidError, OSError, UnicodeDecodeError, ValueError) as e:
+            raise LiquidError(f"{relative_path}: {e}") from None
+    return results
+
+def load_cache(path):
+    """Load the render cache: page path -> {'output', 'files', 'site'}."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('pages', {})
+
+def is_fresh(entry, site, dest, file_digests):
+    """
+    Tell whether a page's last render is still valid: its output exists and
+    none of the files or site values it read have changed.
+
+    :param file_digests: Digests of files hashed so far in this build, filled in as needed
+    """
+    if entry is None or not os.path.exists(os.path.join(dest, *entry['output'].split('/'))):
+        return False
+    for relative, digest in entry['files'].items():
+        if relative not in file_digests:
+            try:
+                with open(os.path.join(site.dir, *relative.split('/')), 'rb') as f:
+                    file_digests[relative] = file_digest(f.read())
+            except OSError:
+                file_digests[relative] = None
+        if file_digests[relative] != digest:
+            return False
+    return all(value_digest(resolve_path(site.variables, path)) == digest for path, digest in entry['site'])
+
+def build_site(site_dir, dest, jobs=None, prune=False, force=False):
+    """
+    Render every page of a Jekyll site into a destination directory.
+
+    Pages whose source, layouts, includes, config and the site values they
+    read are unchanged since the last build are not rendered again. Rendered
+    pages are spread over a process pool and written through DocWriter, so
+    unchanged output keeps its mtime.
+
+    :param site_dir: Jekyll source directory
+    :param dest: Output directory (Jekyll's is <site_dir>/_site)
+    :param jobs: Number of worker processes (default: number of CPUs); 1 renders inline
+    :param prune: Remove output of pages that no longer exist
+    :param force: Render every page, ignoring the cache
+    :return: Dictionary of counts and timings
+    """
+    start = time.perf_counter()
+    site = Site(site_dir)
+    cache_path = os.path.join(dest, CACHE_NAME)
+    cache = {} if force else load_cache(cache_path)
+    paths = [page['path'] for page in site.pages]
+    file_digests = {}
+    stale = [path for path in paths if not is_fresh(cache.get(path), site, dest, file_digests)]
+    checked = time.perf_counter()
+
+    results = []
+    tasks = [stale[i:i + PAGES_PER_TASK] for i in range(0, len(stale), PAGES_PER_TASK)]
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            results.extend(render_pages(site_dir, task))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for future in as_completed([pool.submit(render_pages, site_dir, task) for task in tasks]):
+                results.extend(future.result())
+    rendered = time.perf_counter()
+
+    pages = {}
+    with DocWriter(dest) as writer:
+        for relative_path, output, content, dependencies in sorted(results):
+            writer.write(os.path.join(dest, *output.split('/')), content)
+            pages[relative_path] = dict(dependencies, output=output)
+        for relative_path in paths:
+            if relative_path not in pages:
+                pages[relative_path] = cache[relative_path]
+                writer.keep(os.path.join(dest, *cache[relative_path]['output'].split('/')))
+        if prune:
+            writer.prune()
+    cache_data = {'version': CACHE_VERSION, 'pages': dict(sorted(pages.items()))}
+    atomic_write(cache_path, (json.dumps(cache_data, indent=1, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    return {
+        'pages': len(paths),
+        'rendered': len(results),
+        'cached': len(paths) - len(results),
+        'written': writer.written,
+        'unchanged': writer.unchanged,
+        'removed': writer.removed,
+        'check_seconds': checked - start,
+        'render_seconds': rendered - checked,
+        'seconds': time.perf_counter() - start,
+        'outputs': sorted(page['output'] for page in pages.values())
+    }
+
+def normalize_html(text):
+    """
+    Remove the known differences between a page of this renderer and Jekyll's.
+
+    This is a diagnostic for --compare --normalize, not an equality check:
+    a page that only matches after it is not byte-identical to Jekyll's.
+
+    - Code blocks: Rouge wraps every token in a <span class="...">, while
+      markdown_lite leaves highlighting to Prism in the browser. Spans are
+      dropped inside <pre> elements, so token classes are not compared.
+    - Raw HTML blocks: kramdown parses and re-serializes them, markdown_lite
+      passes them through. Tags are rewritten with lowercase names, double
+      quoted attributes and void elements closed as <br />, and outside <pre>
+      a run of whitespace holding a line break becomes a single line break.
+      Whitespace is never removed, so text still renders the same.
+    """
+    parts = PRE_RE.split(text)
+    for i, part in enumerate(parts):
+        if i % 2:
+            part = TOKEN_SPAN_RE.sub('', part)
+        else:
+            part = LINE_BREAK_RE.sub('\n', part)
+        parts[i] = HTML_TAG_RE.sub(_canonical_tag, part)
+    return ''.join(parts)
+
+def _canonical_tag(match):
+    name, attributes, slash = match.groups()
+    name = name.lower()
+    tag = ['<', name]
+    for attribute in HTML_ATTRIBUTE_RE.finditer(attributes or ''):
+        key, double, single, bare = attribute.groups()
+        value = next((v for v in (double, single, bare) if v is not None), None)
+        tag.append(f' {key.lower()}' if value is None else f' {key.lower()}="{value.replace(chr(34), "&quot;")}"')
+    if slash or name in VOID_ELEMENTS:
+        tag.append(' /')
+    tag.append('>')
+    return ''.join(tag)
+
+def compare_outputs(dest, reference, outputs, normalize=False, f=sys.stdout):
+    """
+    Compare rendered pages byte for byte with another build (e.g. Jekyll's _site).
+
+    :param outputs: Output paths below both directories
+    :param normalize: Also tell which differing pages match after normalize_html,
+                      i.e. only differ in Rouge highlighting or raw HTML formatting
+    :return: Number of pages that are not byte-identical or are missing from the reference
+    """
+    different = 0
+    normalized = 0
+    for output in outputs:
+        with open(os.path.join(dest, *output.split('/')), 'rb') as ours:
+            mine = ours.read()
+        try:
+            with open(os.path.join(reference, *output.split('/')), 'rb') as theirs:
+                other = theirs.read()
+        except OSError:
+            f.write(f"missing  {output}\n")
+            different += 1
+            continue
+        if mine == other:
+            continue
+        different += 1
+        note = f"from line {_first_different_line(mine, other)}"
+        if normalize:
+            mine = normalize_html(mine.decode('utf-8', 'replace')).encode('utf-8')
+            other = normalize_html(other.decode('utf-8', 'replace')).encode('utf-8')
+            if mine == other:
+                normalized += 1
+                note += "; equal after normalization"
+            else:
+                note += f"; normalized from line {_first_different_line(mine, other)}"
+        f.write(f"differs  {output} ({note})\n")
+    f.write(f"{len(outputs) - different} of {len(outputs)} pages identical to {reference}")
+    f.write(f"; {normalized} of the other {different} equal after normalization\n" if normalize else "\n")
+    return different
+
+def _first_different_line(mine, other):
+    mine_lines = mine.split(b'\n')
+    other_lines = other.split(b'\n')
+    return next((n for n, (a, b) in enumerate(zip(mine_lines, other_lines)) if a != b),
+                min(len(mine_lines), len(other_lines))) + 1
+
+def main():
+    """Render a Jekyll site with the Python renderer."""
+    parser = argparse.ArgumentParser(description="Render the pages of a Jekyll site without Jekyll.")
+    parser.add_argument('site_dir', nargs='?', default='docs',
+                        help="Jekyll source directory (default: docs)")
+    parser.add_argument('-d', '--dest', help="Output directory (default: SITE_DIR/_site)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs; 1 renders inline)")
+    parser.add_argument('--prune', action='store_true',
+                        help="Remove output of pages that no longer exist")
+    parser.add_argument('--force', action='store_true',
+                        help="Render every page, ignoring the render cache")
+    parser.add_argument('--compare', metavar='DIR',
+                        help="Compare the output byte for byte with another build (e.g. Jekyll's) "
+                             "and exit 1 if any page differs")
+    parser.add_argument('--normalize', action='store_true',
+                        help="With --compare, also report which differing pages only differ in Rouge "
+                             "highlighting or raw HTML formatting (diagnostic; the exit status stays byte-exact)")
+    args = parser.parse_args()
+    dest = args.dest or os.path.join(args.site_dir, '_site')
+
+    # The layout reads the precomputed navigation, so bring it up to date first
+    write_navigation(args.site_dir)
+    try:
+        result = build_site(args.site_dir, dest, args.jobs, args.prune, args.force)
+    except (LiquidError, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{result['pages']} pages: {result['rendered']} rendered, {result['cached']} cached; "
+          f"{result['written']} written, {result['unchanged']} unchanged, {result['removed']} removed "
+          f"in {result['seconds']:.2f}s (check {result['check_seconds']:.3f}s, "
+          f"render {result['render_seconds']:.3f}s)")
+    if args.compare and compare_outputs(dest, args.compare, result['outputs'], args.normalize):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
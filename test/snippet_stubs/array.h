@@ -0,0 +1,3 @@
+// The lessons include "array.h" or "mssm.h"; both get the same stand-ins
+#pragma once
+#include "mssm.h"
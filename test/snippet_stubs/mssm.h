@@ -0,0 +1,57 @@
+// Declarations of the course library helpers used in the lessons, so that
+// check_snippets.py can syntax-check lesson code without the real library.
+// Only declarations: snippets are compiled with -fsyntax-only, never linked.
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdlib>
+#include <initializer_list>
+#include <iostream>
+#include <string>
+#include <vector>
+
+using namespace std;
+
+template <typename T>
+class Array {
+public:
+    Array();
+    Array(std::initializer_list<T> values);
+    explicit Array(int size, const T& value = T());
+
+    int size() const;
+    bool empty() const;
+
+    T& operator[](int index);
+    const T& operator[](int index) const;
+    T& at(int index);
+    const T& at(int index) const;
+    T& front();
+    T& back();
+
+    void append(const T& value);
+    void push_back(const T& value);
+    void insertAtIndex(int index, const T& value);
+    void removeAtIndex(int index);
+    void resize(int size, const T& value = T());
+    void clear();
+
+    bool operator==(const Array& other) const;
+    bool operator!=(const Array& other) const;
+
+    typename std::vector<T>::iterator begin();
+    typename std::vector<T>::iterator end();
+    typename std::vector<T>::const_iterator begin() const;
+    typename std::vector<T>::const_iterator end() const;
+};
+
+template <typename T>
+std::ostream& operator<<(std::ostream& out, const Array<T>& array);
+
+// Prints its arguments separated by spaces, with (println) or without (print) a newline
+template <typename... Args>
+void println(const Args&... args);
+
+template <typename... Args>
+void print(const Args&... args);
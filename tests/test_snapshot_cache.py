@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the snapshot cache and the probe rules of github-repo-explorer.py.
+
+Every test scans a temporary tree, changes it, and checks that a scan
+reusing the cache reports exactly what a scan without it does. Directory
+mtimes are set explicitly (older than RACY_WINDOW_NS) so the cache stores
+entries and a change is never hidden by timestamp granularity.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+import importlib.util
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPLORER_PATH = os.path.join(os.path.dirname(TESTS_DIR), 'github-repo-explorer.py')
+
+spec = importlib.util.spec_from_file_location('github_repo_explorer', EXPLORER_PATH)
+explorer = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = explorer
+spec.loader.exec_module(explorer)
+
+def snapshot(repo_info):
+    """The parts of an explore_repository result that a report is made from."""
+    return {
+        'summary': repo_info['summary'],
+        'directory_tree': repo_info['directory_tree'],
+        'file_types': repo_info['file_types'],
+        'special_configs': repo_info['special_configs'],
+        'github_workflows': repo_info['github_workflows'],
+        'index_files': sorted((entry['path'], entry.get('preview')) for entry in repo_info['index_files'])
+    }
+
+class SnapshotCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='explorer-test-')
+        self.repo = os.path.join(self.tmp, 'repo')
+        self.cache_dir = os.path.join(self.tmp, 'cache')
+        # Distinct past mtimes, one per call to age()
+        self.clock = int(time.time()) - 3600
+        self.write('README.md', '# Project\n')
+        self.write('src/main.py', 'print("hello")\n')
+        self.write('src/app.py', 'print("no framework yet")\n')
+        self.write('docs/guide/index.md', '# Guide\n')
+        os.makedirs(os.path.join(self.repo, '.circleci'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, relative_path, content):
+        path = os.path.join(self.repo, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def age(self, *relative_dirs):
+        """Give directories (default: all of them) a new mtime outside the racy window."""
+        self.clock += 10
+        if not relative_dirs:
+            relative_dirs = [os.path.relpath(root, self.repo) for root, _, _ in os.walk(self.repo)]
+        for relative_dir in relative_dirs:
+            os.utime(os.path.join(self.repo, relative_dir), (self.clock, self.clock))
+
+    def scan(self):
+        """Scan with the on-disk cache, as the CLI does; return (snapshot, cache)."""
+        cache = explorer.SnapshotCache.open(self.repo, cache_dir=self.cache_dir)
+        result = snapshot(explorer.explore_repository(self.repo, jobs=2, cache=cache))
+        cache.save()
+        return result, cache
+
+    def assert_matches_uncached(self):
+        cached, cache = self.scan()
+        self.assertEqual(cached, snapshot(explorer.explore_repository(self.repo, jobs=2)))
+        return cached, cache
+
+    def test_unchanged_tree_is_served_from_cache(self):
+        self.age()
+        first, cache = self.assert_matches_uncached()
+        self.assertEqual(cache.hits, 0)
+        second, cache = self.assert_matches_uncached()
+        self.assertEqual(second, first)
+        self.assertEqual(cache.misses, 0)
+
+    def test_recently_modified_directories_are_not_stored(self):
+        self.age()
+        self.write('src/new.py', 'x = 1\n')
+        _, cache = self.assert_matches_uncached()
+        self.assertNotIn('src', cache.entries)
+        self.assertIn('docs', cache.entries)
+
+    def test_added_and_removed_files(self):
+        self.age()
+        self.assert_matches_uncached()
+        self.write('src/extra.py', 'x = 1\n')
+        os.remove(os.path.join(self.repo, 'docs', 'guide', 'index.md'))
+        self.age('src', 'docs/guide')
+        cached, _ = self.assert_matches_uncached()
+        self.assertIn('extra.py', cached['directory_tree']['src'])
+
+    def test_replaced_directory_with_same_mtime(self):
+        self.age()
+        self.assert_matches_uncached()
+        # Same name and mtime, different inode and contents
+        guide = os.path.join(self.repo, 'docs', 'guide')
+        os.rename(guide, os.path.join(self.tmp, 'old-guide'))
+        self.write('docs/guide/other.md', 'Other\n')
+        os.utime(guide, (self.clock, self.clock))
+        os.utime(os.path.join(self.repo, 'docs'), (self.clock, self.clock))
+        cached, _ = self.assert_matches_uncached()
+        self.assertIn('other.md', cached['directory_tree']['docs']['guide'])
+
+    def test_sniffed_file_rewritten_in_place(self):
+        self.age()
+        first, _ = self.assert_matches_uncached()
+        self.assertEqual(first['special_configs']['frameworks'], [])
+        # Rewriting a file does not touch its directory's mtime; the stamp of the sniffed file does change
+        self.write('src/app.py', 'from flask import Flask\n')
+        os.utime(os.path.join(self.repo, 'src', 'app.py'), (self.clock + 5, self.clock + 5))
+        cached, _ = self.assert_matches_uncached()
+        self.assertEqual([hit['framework'] for hit in cached['special_configs']['frameworks']], ['flask'])
+
+    def test_file_added_to_probed_directory(self):
+        self.age()
+        first, _ = self.assert_matches_uncached()
+        self.assertEqual(first['special_configs']['ci_cd_configs'], [])
+        # .circleci is pruned, so only the root record (whose mtime is unchanged) answers for it
+        self.write('.circleci/config.yml', 'version: 2\n')
+        self.age('.circleci')
+        cached, _ = self.assert_matches_uncached()
+        self.assertEqual([hit['type'] for hit in cached['special_configs']['ci_cd_configs']], ['circleci'])
+
+        os.remove(os.path.join(self.repo, '.circleci', 'config.yml'))
+        self.age('.circleci')
+        cached, _ = self.assert_matches_uncached()
+        self.assertEqual(cached['special_configs']['ci_cd_configs'], [])
+
+class ProbeRulesTest(unittest.TestCase):
+
+    def match(self, dirs, existing):
+        probed = []
+
+        def probe(path, is_dir):
+            probed.append(path.replace(os.sep, '/'))
+            return path.replace(os.sep, '/') in existing
+
+        hits = explorer.DEFAULT_RULE_ENGINE.match_directory('.', [], dirs, lambda name: b'', probe)
+        return hits, probed
+
+    def test_pruned_directory_is_probed(self):
+        hits, probed = self.match(['.circleci'], {'.circleci/config.yml'})
+        self.assertEqual(probed, ['.circleci/config.yml'])
+        self.assertEqual(hits['ci_cd_configs'], [{'type': 'circleci', 'path': './.circleci/config.yml'}])
+
+    def test_missing_probe_target_is_not_a_hit(self):
+        hits, probed = self.match(['.circleci'], set())
+        self.assertEqual(probed, ['.circleci/config.yml'])
+        self.assertEqual(hits['ci_cd_configs'], [])
+
+    def test_walked_directory_is_not_probed(self):
+        # .github is descended into, so its record matches .github/workflows/ itself
+        _, probed = self.match(['.github', 'src'], set())
+        self.assertEqual(probed, [])
+
+if __name__ == '__main__':
+    unittest.main()